@@ -6,6 +6,7 @@ from sqlalchemy import text
 
 from app.config import settings
 from app.logging import get_logger
+from app.services.recipe_index import recipe_index_cache
 from app.storage.db import engine
 
 router = APIRouter()
@@ -21,11 +22,12 @@ def clear_all() -> dict:
     with engine.connect() as conn:
         conn.execute(
             text(
-                "TRUNCATE TABLE sku, recipeingredient, menuplan, llmcalllog, recipe, ingredient "
+                "TRUNCATE TABLE sku, product, ingredientalias, recipeingredient, menuplan, llmcalllog, promptblob, recipe, ingredient "
                 "RESTART IDENTITY CASCADE"
             )
         )
         conn.commit()
+    recipe_index_cache.invalidate()
     logger.info("clear_all.postgres_done")
 
     # Redis: flush all (Celery queue, caches, locks)
@@ -0,0 +1,38 @@
+"""Read access to logged LLM calls, reconstructing deduplicated/compressed inputs on demand."""
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+
+from app.storage.db import request_session
+from app.storage.models import LLMCallLog
+from app.storage.prompt_payloads import MissingPromptBlobError
+from app.storage.repositories import get_llm_call_input
+
+router = APIRouter()
+
+
+@router.get("/llm-calls/{log_id}")
+def get_llm_call(log_id: int, session: Session = Depends(request_session)) -> dict:
+    """
+    Return one LLMCallLog row with its full input payload (static prompt context re-inlined). If that context
+    is gone (promptblob cleared), input is null and missing_blobs lists the hashes.
+    """
+    log = session.get(LLMCallLog, log_id)
+    if log is None:
+        raise HTTPException(status_code=404, detail="LLM call not found")
+    missing_blobs: list[str] = []
+    try:
+        call_input = get_llm_call_input(session, log_id)
+    except MissingPromptBlobError as e:
+        call_input, missing_blobs = None, e.hashes
+    return {
+        "id": log.id,
+        "prompt_name": log.prompt_name,
+        "prompt_version": log.prompt_version,
+        "model": log.model,
+        "input": call_input,
+        "missing_blobs": missing_blobs,
+        "output": log.output_payload,
+        "latency_ms": log.latency_ms,
+        "created_at": log.created_at.isoformat(),
+    }
@@ -1,21 +1,38 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Body
-from sqlmodel import select
+from fastapi import APIRouter, Body, Depends, Query
+from sqlmodel import Session, select
 
 from app.config import settings
 from app.logging import get_logger
 from app.schemas.plan import PlanRequest, PlanResponse
-from app.utils.timing import time_span
+from app.schemas.recipe import CookWithRequest
+from app.utils.timing import TimingTracker, time_span
+from app.services.optimization.fingerprint import normalize_plan_request, plan_request_fingerprint
 from app.services.optimization.ilp_solver import ILPSolverOptions, IngredientOption, RecipeOption, solve_ilp
 from app.services.sku.instacart_client import instacart_client
-from app.storage.db import get_session
-from app.storage.models import Ingredient, Recipe, RecipeIngredient, SKU
+from app.storage.db import get_read_session, get_session, request_read_session, request_session
+from app.storage.models import Ingredient, Recipe, SKU
+from app.storage.recipe_search import exclude_allergens_clause, search_recipes
 from app.services.allergens import get_all_allergen_codes
+from app.services.recipe_index import recipe_index_cache
 from app.services.llm.dspy_client import configure_dspy
 from app.services.llm.sku_size_converter import convert_sku_size
 from app.services.overseer import apply_corrections, detect_anomalies, run_overseer_correction
-from app.storage.repositories import create_menu_plan
+from app.storage.repositories import (
+    count_rows,
+    create_menu_plan,
+    delete_skus_for_ingredients,
+    get_catalog_version,
+    get_ingredients_needing_sku_refresh,
+    get_ingredient_ids_with_active_skus,
+    get_price_summaries,
+    get_unavailable_ingredient_ids,
+    iter_active_sku_rows,
+    iter_ingredient_rows,
+    iter_recipe_ingredient_links,
+)
+from app.workers.tasks import refresh_expired_skus
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -57,91 +74,155 @@ PLACEHOLDER_QTY = 999999.0
 
 
 @router.get("/recipes")
-def list_recipes(exclude_allergens: str | None = None):
+def list_recipes(exclude_allergens: str | None = None, session: Session = Depends(request_read_session)):
     """
     Return all recipes for display.
     exclude_allergens: comma-separated allergen codes to filter out (e.g. nuts,milk).
     Recipes with ingredients marked sku_unavailable get has_unavailable_ingredients=True
     and unavailable_ingredient_names=[...]; display them greyed out, exclude from plan.
     """
-    with get_session() as session:
-        recipes = list(session.exec(select(Recipe)))
-        recipe_ingredients = list(session.exec(select(RecipeIngredient)))
-        ingredients = {i.id: i for i in session.exec(select(Ingredient))}
-        # Map recipe_id -> set of ingredient canonical_names that are sku_unavailable
-        unavailable_by_recipe: dict[int, list[str]] = {}
-        for ri in recipe_ingredients:
-            ing = ingredients.get(ri.ingredient_id)
-            if ing and getattr(ing, "sku_unavailable", False):
-                unavailable_by_recipe.setdefault(ri.recipe_id, []).append(
+    stmt = select(Recipe)
+    if exclude_allergens:
+        excluded = [a.strip().lower() for a in exclude_allergens.split(",") if a.strip()]
+        if excluded:
+            stmt = stmt.where(exclude_allergens_clause(session, excluded))
+    recipes = list(session.exec(stmt))
+    unavailable = {
+        i.id: i
+        for i in iter_ingredient_rows(session, ingredient_ids=get_unavailable_ingredient_ids(session))
+    }
+    # Map recipe_id -> set of ingredient canonical_names that are sku_unavailable
+    unavailable_by_recipe: dict[int, list[str]] = {}
+    if unavailable:
+        for link in iter_recipe_ingredient_links(session):
+            ing = unavailable.get(link.ingredient_id)
+            if ing:
+                unavailable_by_recipe.setdefault(link.recipe_id, []).append(
                     ing.canonical_name or ing.name
                 )
-        exclude_set = set()
-        if exclude_allergens:
-            exclude_set = {a.strip().lower() for a in exclude_allergens.split(",") if a.strip()}
-        result = []
-        for r in recipes:
-            allergens = (r.allergens or []) if hasattr(r, "allergens") else []
-            if exclude_set and set(allergens) & exclude_set:
-                continue
-            unavailable_names = list(dict.fromkeys(unavailable_by_recipe.get(r.id, [])))
-            result.append({
-                "id": r.id,
-                "name": r.name,
-                "servings": r.servings,
-                "instructions": r.instructions,
-                "source_file": r.source_file,
-                "meal_type": getattr(r, "meal_type", "entree"),
-                "allergens": allergens,
-                "has_unavailable_ingredients": len(unavailable_names) > 0,
-                "unavailable_ingredient_names": unavailable_names,
-            })
-        return result
+    result = []
+    for r in recipes:
+        allergens = r.allergens or []
+        unavailable_names = list(dict.fromkeys(unavailable_by_recipe.get(r.id, [])))
+        result.append({
+            "id": r.id,
+            "name": r.name,
+            "servings": r.servings,
+            "instructions": r.instructions,
+            "source_file": r.source_file,
+            "meal_type": getattr(r, "meal_type", "entree"),
+            "allergens": allergens,
+            "has_unavailable_ingredients": len(unavailable_names) > 0,
+            "unavailable_ingredient_names": unavailable_names,
+        })
+    return result
+
+
+@router.get("/recipes/search")
+def recipes_search(
+    q: str = Query(min_length=1),
+    meal_type: str | None = None,
+    exclude_allergens: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    session: Session = Depends(request_read_session),
+) -> dict:
+    """
+    Ranked search over recipe names, ingredient names and instructions (fuzzy on names).
+    exclude_allergens: comma-separated allergen codes. Results omit instructions; page with offset.
+    """
+    excluded = [a.strip().lower() for a in (exclude_allergens or "").split(",") if a.strip()]
+    results, total = search_recipes(
+        session, q, meal_type=meal_type, exclude_allergens=excluded, limit=limit, offset=offset
+    )
+    return {"results": results, "total": total, "limit": limit, "offset": offset}
 
 
-@router.get("/ingredients-with-skus")
-def ingredients_with_skus():
-    """Return all ingredients with their attached SKUs for display."""
-    with get_session() as session:
-        ingredients = list(session.exec(select(Ingredient)))
-        skus = list(session.exec(select(SKU)))
-        now = datetime.utcnow()
-        valid_skus = [s for s in skus if s.expires_at > now]
-        skus_by_ingredient: dict[int, list] = {}
-        for s in valid_skus:
-            skus_by_ingredient.setdefault(s.ingredient_id, []).append(s)
-        def _sku_row(s) -> dict:
-            size = getattr(s, "size_display", None) or s.size or ""
-            qty = getattr(s, "quantity_in_base_unit", None)
-            price = s.price
-            ppu = None
-            if price is not None and qty and qty > 0:
-                ppu = round(price / qty, 6)
-            out = {
-                "id": s.id,
-                "name": s.name,
-                "brand": s.brand,
-                "size": size,
-                "price": price,
-                "retailer_slug": s.retailer_slug,
-            }
-            if ppu is not None:
-                out["price_per_base_unit"] = ppu
-            return out
-        return [
+@router.post("/recipes/cook-with")
+def recipes_cook_with(body: CookWithRequest, session: Session = Depends(request_read_session)) -> dict:
+    """
+    Recipes ranked by how much of their ingredient list is covered by the given ingredients (a pantry).
+    Uses the inverted ingredient->recipe index, so only recipes sharing an ingredient are examined.
+    """
+    have = set(body.ingredient_ids)
+    names = {n.strip().lower() for n in body.ingredient_names if n.strip()}
+    by_name = {}
+    if names:
+        by_name = dict(session.exec(select(Ingredient.canonical_name, Ingredient.id).where(Ingredient.canonical_name.in_(names))).all())
+        have.update(by_name.values())
+    ranked = recipe_index_cache.get(session).cook_with(have, max_missing=body.max_missing, limit=body.limit)
+    recipe_ids = [r["recipe_id"] for r in ranked]
+    missing_ids = {i for r in ranked for i in r["missing_ingredient_ids"]}
+    recipes = {r.id: r for r in session.exec(select(Recipe.id, Recipe.name, Recipe.meal_type).where(Recipe.id.in_(recipe_ids)))}
+    missing_names = dict(session.exec(select(Ingredient.id, Ingredient.canonical_name).where(Ingredient.id.in_(missing_ids))).all())
+    return {
+        "results": [
             {
-                "id": i.id,
-                "name": i.canonical_name,
-                "base_unit": _sanitize_base_unit(i.base_unit) or "units",
-                "skus": [_sku_row(sk) for sk in skus_by_ingredient.get(i.id, [])],
-                "sku_unavailable": getattr(i, "sku_unavailable", False),
+                **r,
+                "name": recipes[r["recipe_id"]].name,
+                "meal_type": recipes[r["recipe_id"]].meal_type,
+                "missing_ingredients": [missing_names.get(i) for i in r["missing_ingredient_ids"]],
             }
-            for i in ingredients
-        ]
+            for r in ranked
+            if r["recipe_id"] in recipes
+        ],
+        "unknown_names": sorted(names - set(by_name)),
+    }
+
+
+@router.get("/ingredients-with-skus")
+def ingredients_with_skus(session: Session = Depends(request_read_session)):
+    """
+    Return all ingredients with their attached SKUs for display.
+    price_summary: cheapest price per base unit and SKU count per retailer/postal (ingredient_price_summary).
+    """
+    ingredients = list(iter_ingredient_rows(session))
+    summaries_by_ingredient: dict[int, list[dict]] = {}
+    for ps in get_price_summaries(session):
+        summaries_by_ingredient.setdefault(ps.ingredient_id, []).append({
+            "retailer_slug": ps.retailer_slug or None,
+            "postal_code": ps.postal_code or None,
+            "min_price_per_base_unit": ps.min_price_per_base_unit,
+            "min_price_sku_id": ps.min_price_sku_id,
+            "sku_count": ps.sku_count,
+            "fetched_at": ps.fetched_at.isoformat(),
+        })
+    skus_by_ingredient: dict[int, list] = {}
+    for s in iter_active_sku_rows(session):
+        skus_by_ingredient.setdefault(s.ingredient_id, []).append(s)
+    def _sku_row(s) -> dict:
+        size = s.size_display or s.size or ""
+        qty = s.quantity_in_base_unit
+        price = s.price
+        ppu = None
+        if price is not None and qty and qty > 0:
+            ppu = round(price / qty, 6)
+        out = {
+            "id": s.id,
+            "name": s.name,
+            "brand": s.brand,
+            "size": size,
+            "price": price,
+            "retailer_slug": s.retailer_slug,
+        }
+        if ppu is not None:
+            out["price_per_base_unit"] = ppu
+        return out
+    return [
+        {
+            "id": i.id,
+            "name": i.canonical_name,
+            "base_unit": _sanitize_base_unit(i.base_unit) or "units",
+            "skus": [_sku_row(sk) for sk in skus_by_ingredient.get(i.id, [])],
+            "price_summary": summaries_by_ingredient.get(i.id, []),
+            "sku_unavailable": i.sku_unavailable,
+        }
+        for i in ingredients
+    ]
 
 
 @router.post("/sku/refresh")
-def refresh_skus(body: dict | None = Body(default=None)) -> dict:
+def refresh_skus(body: dict | None = Body(default=None), session: Session = Depends(request_session)) -> dict:
     """
     Manually trigger SKU refresh for ingredients with no valid (non-expired) prices.
     Body: { "ingredient_ids": [1,2,3], "postal_code": "10001" } — both optional.
@@ -151,8 +232,7 @@ def refresh_skus(body: dict | None = Body(default=None)) -> dict:
     ingredient_ids = body.get("ingredient_ids")
     postal_code = body.get("postal_code")
     refresh_expired_skus.delay(ingredient_ids=ingredient_ids, postal_code=postal_code)
-    with get_session() as session:
-        ingredients = get_ingredients_needing_sku_refresh(session, ingredient_ids)
+    ingredients = get_ingredients_needing_sku_refresh(session, ingredient_ids)
     return {
         "queued": len(ingredients),
         "ingredient_ids": [i.id for i in ingredients],
@@ -161,7 +241,7 @@ def refresh_skus(body: dict | None = Body(default=None)) -> dict:
 
 
 @router.post("/sku/reset")
-def reset_skus(body: dict | None = Body(default=None)) -> dict:
+def reset_skus(body: dict | None = Body(default=None), session: Session = Depends(request_session)) -> dict:
     """
     Delete all SKU rows for given ingredient_ids, then enqueue refresh.
     Body: { "ingredient_ids": [1,2,3], "postal_code": "10001" }. ingredient_ids required.
@@ -172,11 +252,9 @@ def reset_skus(body: dict | None = Body(default=None)) -> dict:
     if not ingredient_ids:
         return {"deleted": 0, "queued": 0, "message": "ingredient_ids required"}
     postal_code = body.get("postal_code")
-    with get_session() as session:
-        deleted = delete_skus_for_ingredients(session, ingredient_ids)
+    deleted = delete_skus_for_ingredients(session, ingredient_ids)
     refresh_expired_skus.delay(ingredient_ids=ingredient_ids, postal_code=postal_code)
-    with get_session() as session:
-        ingredients = get_ingredients_needing_sku_refresh(session, ingredient_ids)
+    ingredients = get_ingredients_needing_sku_refresh(session, ingredient_ids)
     return {
         "deleted": deleted,
         "queued": len(ingredients),
@@ -186,56 +264,64 @@ def reset_skus(body: dict | None = Body(default=None)) -> dict:
 
 
 @router.get("/sku-status")
-def sku_status() -> dict:
+def sku_status(session: Session = Depends(request_read_session)) -> dict:
     """Report which ingredients have SKUs and which are still pending (worker not done)."""
-    with get_session() as session:
-        ingredients = list(session.exec(select(Ingredient)))
-        skus = list(session.exec(select(SKU)))
-        now = datetime.utcnow()
-        ingredient_ids_with_skus = {s.ingredient_id for s in skus if s.expires_at > now}
-        with_skus = [i.canonical_name for i in ingredients if i.id in ingredient_ids_with_skus]
-        without_skus = [i.canonical_name for i in ingredients if i.id not in ingredient_ids_with_skus]
+    ingredients = list(iter_ingredient_rows(session))
+    ingredient_ids_with_skus = get_ingredient_ids_with_active_skus(session)
+    with_skus = [i.canonical_name for i in ingredients if i.id in ingredient_ids_with_skus]
+    without_skus = [i.canonical_name for i in ingredients if i.id not in ingredient_ids_with_skus]
     return {
         "ingredients_with_skus": with_skus,
         "ingredients_without_skus": without_skus,
-        "total_skus": len(skus),
+        "total_skus": count_rows(session, SKU),
     }
 
 
 @router.post("/plan", response_model=PlanResponse)
 def plan(request: PlanRequest) -> PlanResponse:
-    with time_span("plan.total", servings=request.target_servings):
+    with time_span("plan.total", servings=request.target_servings) as plan_timer:
         logger.info("plan.start servings=%s", request.target_servings)
         configure_dspy()
-        with get_session() as session:
-            recipes = list(session.exec(select(Recipe)))
-            if request.exclude_allergens:
-                exclude_set = {a.strip().lower() for a in request.exclude_allergens if a.strip()}
-                recipes = [
-                    r for r in recipes
-                    if not (set(r.allergens or []) & exclude_set)
-                ]
-            recipe_ingredients = list(session.exec(select(RecipeIngredient)))
-            ingredients = {i.id: i for i in session.exec(select(Ingredient))}
+        fingerprint = plan_request_fingerprint(request)
+        solve_timer = TimingTracker("plan.solve", log_on_exit=False)
+        solve_ms = 0
+        with get_session() as session, get_read_session() as read_session:
+            catalog_version = get_catalog_version(read_session)
+
+            def _record_plan(result: dict, plan_payload: dict) -> None:
+                create_menu_plan(
+                    session,
+                    request.target_servings,
+                    plan_payload,
+                    request_fingerprint=fingerprint,
+                    request=normalize_plan_request(request),
+                    status=result.get("status"),
+                    objective=result.get("objective"),
+                    solve_ms=solve_ms,
+                    total_ms=plan_timer.elapsed_ms,
+                    catalog_version=catalog_version,
+                )
+
+            recipe_stmt = select(Recipe)
+            excluded = [a.strip().lower() for a in request.exclude_allergens or [] if a.strip()]
+            if excluded:
+                recipe_stmt = recipe_stmt.where(exclude_allergens_clause(read_session, excluded))
+            recipes = list(read_session.exec(recipe_stmt))
+            ri_index = recipe_index_cache.get(read_session)
+            ingredients = {i.id: i for i in read_session.exec(select(Ingredient))}
             # Exclude recipes that contain any ingredient with sku_unavailable
-            recipe_ids_with_unavailable = {
-                ri.recipe_id
-                for ri in recipe_ingredients
-                if ingredients.get(ri.ingredient_id) and getattr(ingredients[ri.ingredient_id], "sku_unavailable", False)
-            }
+            recipe_ids_with_unavailable = ri_index.recipes_using_any(
+                i.id for i in ingredients.values() if getattr(i, "sku_unavailable", False)
+            )
             recipes = [r for r in recipes if r.id not in recipe_ids_with_unavailable]
-            skus = list(session.exec(select(SKU)))
+            skus = list(read_session.exec(select(SKU)))
             now = datetime.utcnow()
             valid_skus = [s for s in skus if s.expires_at > now]
 
             recipe_options = []
             all_required_ingredient_ids = set()
             for recipe in recipes:
-                requirements = {
-                    ri.ingredient_id: ri.quantity
-                    for ri in recipe_ingredients
-                    if ri.recipe_id == recipe.id
-                }
+                requirements = ri_index.requirements(recipe.id)
                 all_required_ingredient_ids.update(requirements)
                 recipe_options.append(
                     RecipeOption(
@@ -249,7 +335,7 @@ def plan(request: PlanRequest) -> PlanResponse:
             if request.store_slugs:
                 store_slugs = [s.lower().strip().replace(" ", "-") for s in request.store_slugs if s]
 
-            ingredients_by_id = {i.id: i for i in session.exec(select(Ingredient))}
+            ingredients_by_id = {i.id: i for i in read_session.exec(select(Ingredient))}
             sku_options = []
             ingredient_ids_with_options = set()
             for sku in valid_skus:
@@ -320,22 +406,24 @@ def plan(request: PlanRequest) -> PlanResponse:
                     time_limit_seconds=request.time_limit_seconds if request.time_limit_seconds is not None else 10,
                     batch_penalty=request.batch_penalty if request.batch_penalty is not None else 0.0001,
                 )
-            result = solve_ilp(
-                request.target_servings,
-                recipe_options,
-                sku_options,
-                solver_opts,
-                recipe_meal_types=recipe_meal_types,
-                meal_config=meal_config,
-                include_every_recipe_ids=request.include_every_recipe_ids,
-                required_recipe_ids=request.required_recipe_ids,
-            )
+            with solve_timer:
+                result = solve_ilp(
+                    request.target_servings,
+                    recipe_options,
+                    sku_options,
+                    solver_opts,
+                    recipe_meal_types=recipe_meal_types,
+                    meal_config=meal_config,
+                    include_every_recipe_ids=request.include_every_recipe_ids,
+                    required_recipe_ids=request.required_recipe_ids,
+                )
+            solve_ms += solve_timer.elapsed_ms or 0
             plan_payload = {
                 "recipes": {str(k): int(v) if v is not None else 0 for k, v in (result["recipes"] or {}).items()},
                 "skus": {str(k): int(v) if v is not None else 0 for k, v in (result["skus"] or {}).items()},
             }
             if result.get("status") != "Infeasible":
-                create_menu_plan(session, request.target_servings, str(plan_payload))
+                _record_plan(result, plan_payload)
 
             # Build sku_details for display (name, brand, retailer)
             sku_by_id = {str(s.id): s for s in valid_skus}
@@ -374,9 +462,7 @@ def plan(request: PlanRequest) -> PlanResponse:
                     "total_servings": int(batches) * recipe.servings,
                 })
                 scale = int(batches)
-                for ri in recipe_ingredients:
-                    if ri.recipe_id != bid:
-                        continue
+                for ri in ri_index.by_recipe.get(bid, []):
                     ingredient_totals[ri.ingredient_id] = ingredient_totals.get(ri.ingredient_id, 0) + ri.quantity * scale
                     unit_by_ingredient[ri.ingredient_id] = ri.unit
                 first_line = (recipe.instructions or "").split(".")[0].strip()
@@ -387,10 +473,7 @@ def plan(request: PlanRequest) -> PlanResponse:
                     "recipe_id": bid,
                     "meal_type": recipe.meal_type or "entree",
                     "allergens": recipe.allergens or [],
-                    "ingredients": [
-                        ri.original_text for ri in recipe_ingredients
-                        if ri.recipe_id == bid
-                    ],
+                    "ingredients": [ri.original_text for ri in ri_index.by_recipe.get(bid, [])],
                     "description": first_line or f"A delicious {recipe.name}.",
                     "instructions": recipe.instructions or "",
                 })
@@ -427,9 +510,7 @@ def plan(request: PlanRequest) -> PlanResponse:
                     if not ing or not s:
                         continue
                     ris = []
-                    for ri in recipe_ingredients:
-                        if ri.ingredient_id != ing_id:
-                            continue
+                    for ri in ri_index.by_ingredient.get(ing_id, []):
                         rec = recipe_by_id.get(ri.recipe_id)
                         ris.append({
                             "id": ri.id,
@@ -450,7 +531,8 @@ def plan(request: PlanRequest) -> PlanResponse:
                     break
                 # Refetch and re-solve
                 session.expire_all()
-                recipe_ingredients = list(session.exec(select(RecipeIngredient)))
+                recipe_index_cache.invalidate()
+                ri_index = recipe_index_cache.get(session)
                 ingredients_by_id = {i.id: i for i in session.exec(select(Ingredient))}
                 skus = list(session.exec(select(SKU)))
                 now = datetime.utcnow()
@@ -459,7 +541,7 @@ def plan(request: PlanRequest) -> PlanResponse:
                     valid_skus = [s for s in valid_skus if (s.retailer_slug or "").lower() in store_slugs]
                 recipe_options = []
                 for recipe in recipes:
-                    requirements = {ri.ingredient_id: ri.quantity for ri in recipe_ingredients if ri.recipe_id == recipe.id}
+                    requirements = ri_index.requirements(recipe.id)
                     recipe_options.append(RecipeOption(recipe_id=recipe.id, servings=recipe.servings, ingredient_requirements=requirements))
                 sku_options = []
                 sku_id_to_ingredient_id = {}
@@ -474,10 +556,12 @@ def plan(request: PlanRequest) -> PlanResponse:
                 missing = all_required_ingredient_ids - {o.ingredient_id for o in sku_options}
                 for ingredient_id in missing:
                     sku_options.append(IngredientOption(ingredient_id=ingredient_id, sku_id=PLACEHOLDER_ID_BASE + ingredient_id, quantity=PLACEHOLDER_QTY, cost=PLACEHOLDER_COST))
-                result = solve_ilp(request.target_servings, recipe_options, sku_options, solver_opts, recipe_meal_types=recipe_meal_types, meal_config=meal_config, include_every_recipe_ids=request.include_every_recipe_ids, required_recipe_ids=request.required_recipe_ids)
+                with solve_timer:
+                    result = solve_ilp(request.target_servings, recipe_options, sku_options, solver_opts, recipe_meal_types=recipe_meal_types, meal_config=meal_config, include_every_recipe_ids=request.include_every_recipe_ids, required_recipe_ids=request.required_recipe_ids)
+                solve_ms += solve_timer.elapsed_ms or 0
                 plan_payload = {"recipes": {str(k): int(v) if v is not None else 0 for k, v in (result.get("recipes") or {}).items()}, "skus": {str(k): int(v) if v is not None else 0 for k, v in (result.get("skus") or {}).items()}}
                 if result.get("status") != "Infeasible":
-                    create_menu_plan(session, request.target_servings, str(plan_payload))
+                    _record_plan(result, plan_payload)
                 sku_by_id = {str(s.id): s for s in valid_skus}
                 sku_details = {}
                 for sku_id_str, qty in (plan_payload.get("skus") or {}).items():
@@ -497,15 +581,13 @@ def plan(request: PlanRequest) -> PlanResponse:
                         continue
                     recipe_details_list.append({"recipe_id": bid, "name": recipe.name, "batches": int(batches), "servings_per_batch": recipe.servings, "total_servings": int(batches) * recipe.servings})
                     scale = int(batches)
-                    for ri in recipe_ingredients:
-                        if ri.recipe_id != bid:
-                            continue
+                    for ri in ri_index.by_recipe.get(bid, []):
                         ingredient_totals[ri.ingredient_id] = ingredient_totals.get(ri.ingredient_id, 0) + ri.quantity * scale
                         unit_by_ingredient[ri.ingredient_id] = ri.unit
                     first_line = (recipe.instructions or "").split(".")[0].strip()
                     if first_line:
                         first_line += "."
-                    menu_card_list.append({"name": recipe.name, "recipe_id": bid, "meal_type": recipe.meal_type or "entree", "allergens": recipe.allergens or [], "ingredients": [ri.original_text for ri in recipe_ingredients if ri.recipe_id == bid], "description": first_line or f"A delicious {recipe.name}.", "instructions": recipe.instructions or ""})
+                    menu_card_list.append({"name": recipe.name, "recipe_id": bid, "meal_type": recipe.meal_type or "entree", "allergens": recipe.allergens or [], "ingredients": [ri.original_text for ri in ri_index.by_recipe.get(bid, [])], "description": first_line or f"A delicious {recipe.name}.", "instructions": recipe.instructions or ""})
                 consolidated_shopping_list = []
                 for ing_id, total_qty in ingredient_totals.items():
                     ing = ingredients_by_id.get(ing_id)
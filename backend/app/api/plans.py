@@ -0,0 +1,56 @@
+"""Plan history: past /plan results with request fingerprint, objective and solve timings."""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session
+
+from app.storage.db import request_read_session
+from app.storage.models import MenuPlan
+from app.storage.repositories import list_menu_plans
+
+router = APIRouter()
+
+
+def _plan_row(plan: MenuPlan, include_payload: bool) -> dict:
+    out = {
+        "id": plan.id,
+        "created_at": plan.created_at.isoformat(),
+        "target_servings": plan.target_servings,
+        "request_fingerprint": plan.request_fingerprint,
+        "status": plan.status,
+        "objective": plan.objective,
+        "solve_ms": plan.solve_ms,
+        "total_ms": plan.total_ms,
+        "catalog_version": plan.catalog_version,
+    }
+    if include_payload:
+        out["request"] = plan.request
+        out["payload"] = plan.payload
+    return out
+
+
+@router.get("/plans")
+def list_plans(
+    limit: int = Query(default=20, ge=1, le=100),
+    before_id: int | None = None,
+    fingerprint: str | None = None,
+    include_payload: bool = False,
+    session: Session = Depends(request_read_session),
+) -> dict:
+    """
+    Newest-first plan history. Page with before_id=<next_before_id> from the previous response.
+    fingerprint: only plans for an identical (normalized) request.
+    """
+    plans = list_menu_plans(session, limit=limit, before_id=before_id, request_fingerprint=fingerprint)
+    rows = [_plan_row(p, include_payload) for p in plans]
+    return {
+        "plans": rows,
+        "next_before_id": rows[-1]["id"] if len(rows) == limit else None,
+    }
+
+
+@router.get("/plans/{plan_id}")
+def get_plan(plan_id: int, session: Session = Depends(request_read_session)) -> dict:
+    plan = session.get(MenuPlan, plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return _plan_row(plan, include_payload=True)
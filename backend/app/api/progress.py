@@ -2,59 +2,51 @@
 
 Clean architecture:
 - POST /recipes/upload: Accepts files, returns 202 + job_id immediately after reading body.
-  Spawns background task. Ingredient counts come from fast structural parse (no LLM).
-- GET /recipes/upload/stream/{job_id}: SSE stream. Yields events as they happen (per ingredient).
+  Stores the files in Redis and queues an ingest_upload Celery task on the ingestion queue, so uploads run on
+  ingestion workers rather than in the API process. Ingredient counts come from fast structural parse (no LLM).
+- GET /recipes/upload/stream/{job_id}: SSE stream of the job's events as the worker publishes them (per
+  ingredient), read from Redis (app.services.upload_jobs) so any API replica can serve it. Recipes stream
+  through the ingestion pipeline (app.services.ingestion_pipeline): distinct ingredient lines are resolved
+  once per upload (ingredients_resolved events) while earlier recipes are already being written
+  (ingredient_added events).
 """
 
 import asyncio
 import io
 import json
-import queue
-import threading
 import time
 import uuid
 import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
 
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, Header
 from fastapi.responses import JSONResponse, StreamingResponse
+from redis.exceptions import RedisError
 
 from app.config import settings
 from app.logging import get_logger
-from app.services.llm.ingredient_matcher import match_ingredient
-from app.services.llm.unit_normalizer import normalize_units
-from app.services.llm.dspy_client import configure_dspy
-from app.services.parsing.recipe_parser import count_ingredients_in_text, infer_meal_type, parse_recipe_text
-from app.services.allergens import infer_allergens_from_ingredients
-from app.storage.db import get_session
-from app.storage.models import Ingredient, Recipe, RecipeIngredient, SKU
-from app.storage.repositories import (
-    delete_skus_for_ingredients,
-    create_recipe,
-    create_recipe_ingredients,
-    get_ingredients,
-    get_or_create_ingredient,
-)
-from app.workers.tasks import fetch_skus_for_ingredient
+from app.services.llm.ingredient_matcher import match_metrics
+from app.services.llm.unit_normalizer import fast_path_metrics
+from app.services.parsing.recipe_parser import count_ingredients_in_text
+from app.services.ingestion import alias_metrics
+from app.services import upload_jobs
+from app.services.upload_jobs import UploadJobStore, job_status
+from app.storage import db as db_module
+from app.storage.llm_log_sink import llm_call_log_sink
 from app.workers.celery_app import celery_app
+from app.workers.sku_enqueue import sku_enqueue_metrics
+from app.workers.tasks import ingest_upload
 from redis import Redis
-from sqlmodel import select
 
 router = APIRouter()
 logger = get_logger(__name__)
 
-SKU_POLL_INTERVAL = 1.5
-SKU_POLL_TIMEOUT = 300
+# How often the SSE stream checks Redis for new job events
+STREAM_POLL_INTERVAL = 0.1
 
-# job_id -> thread-safe queue of (event, data) for SSE consumers
-job_event_queues: dict[str, queue.Queue] = {}
-# job_id -> latest progress dict (for GET /progress)
-job_progress_store: dict[str, dict] = {}
 
-
-def _emit_sse(event: str, data: dict) -> str:
-    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+def _emit_sse(event: str, data: dict, event_id: int | None = None) -> str:
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 def _expand_files(content: bytes, filename: str) -> list[tuple[bytes, str]]:
@@ -73,239 +65,26 @@ def _expand_files(content: bytes, filename: str) -> list[tuple[bytes, str]]:
     return [(content, filename)]
 
 
-def _get_sku_progress() -> dict:
-    with get_session() as session:
-        ingredients = list(session.exec(select(Ingredient)))
-        skus = list(session.exec(select(SKU)))
-        now = datetime.utcnow()
-        ids_with_skus = {s.ingredient_id for s in skus if s.expires_at > now}
-        with_skus = sum(1 for i in ingredients if i.id in ids_with_skus)
-    return {
-        "ingredients_total": len(ingredients),
-        "ingredients_with_skus": with_skus,
-    }
-
-
-def _get_ingredient_ids_with_skus() -> set:
-    with get_session() as session:
-        skus = list(session.exec(select(SKU)))
-        now = datetime.utcnow()
-        return {s.ingredient_id for s in skus if s.expires_at > now}
-
-
-def _get_ingredient_ids_unavailable() -> set:
-    """Ingredient IDs explicitly marked sku_unavailable (SKU fetch returned 0)."""
-    with get_session() as session:
-        ingredients = list(session.exec(select(Ingredient)))
-        return {i.id for i in ingredients if getattr(i, "sku_unavailable", False)}
-
-
-def _match_and_normalize(ingredient_text: str, existing_names: list[str]):
-    match = match_ingredient(ingredient_text, existing_names)
-    canonical_name = (match.get("canonical_name") or "").strip().lower() or "unknown"
-    normalized = normalize_units(ingredient_text, canonical_name=canonical_name)
-    return match, normalized
-
-
-def _run_processing(
-    job_id: str,
-    file_contents: list[tuple[bytes, str]],
-    ingredient_totals: dict[str, int],
-    effective_postal: str,
-    event_queue: queue.Queue,
-):
-    """Sync processing loop. Puts (event, data) on queue after each significant step."""
-    configure_dspy()
-    files_progress = [
-        {
-            "name": name,
-            "ingredients_added": 0,
-            "ingredients_total": ingredient_totals.get(name, 1),
-            "ingredients_with_skus": 0,
-            "ingredients_unavailable": 0,
-            "sku_total": 0,
-            "ingredient_ids": [],
-        }
-        for _, name in file_contents
-    ]
-
-    def _put(event: str, data: dict):
-        event_queue.put_nowait((event, data))
-        snap = [{"name": f["name"], "ingredients_added": f["ingredients_added"], "ingredients_total": f["ingredients_total"], "ingredients_with_skus": f["ingredients_with_skus"], "ingredients_unavailable": f.get("ingredients_unavailable", 0), "sku_total": len(set(f.get("ingredient_ids") or []))} for f in files_progress]
-        job_progress_store[job_id] = {"files": snap, "complete": event == "stream_complete"}
-
-    _put("upload_started", {"files": [{"name": f["name"], "ingredients_added": 0, "ingredients_total": f["ingredients_total"], "ingredients_with_skus": 0, "ingredients_unavailable": 0, "sku_total": 0} for f in files_progress]})
-
-    parsing_done = threading.Event()
-
-    def _sku_poll_loop():
-        last_job_with_skus = -1
-        last_job_unavailable = -1
-        last_heartbeat = 0
-        elapsed = 0
-        while elapsed < SKU_POLL_TIMEOUT:
-            time.sleep(SKU_POLL_INTERVAL)
-            elapsed += SKU_POLL_INTERVAL
-            job_ingredient_ids = set()
-            for f in files_progress:
-                job_ingredient_ids.update(f.get("ingredient_ids") or [])
-            job_sku_total = len(job_ingredient_ids)
-            for f in files_progress:
-                f["sku_total"] = len(set(f.get("ingredient_ids") or []))
-            ids_with_skus = _get_ingredient_ids_with_skus()
-            ids_unavailable = _get_ingredient_ids_unavailable()
-            for f in files_progress:
-                ing_ids = set(f.get("ingredient_ids") or [])
-                f["ingredients_with_skus"] = sum(1 for iid in ing_ids if iid in ids_with_skus)
-                f["ingredients_unavailable"] = sum(1 for iid in ing_ids if iid in ids_unavailable)
-            job_with_skus = sum(1 for iid in job_ingredient_ids if iid in ids_with_skus)
-            job_unavailable = sum(1 for iid in job_ingredient_ids if iid in ids_unavailable)
-            snap = [{"name": fp["name"], "ingredients_added": fp["ingredients_added"], "ingredients_total": fp["ingredients_total"], "ingredients_with_skus": fp["ingredients_with_skus"], "ingredients_unavailable": fp.get("ingredients_unavailable", 0), "sku_total": fp.get("sku_total", 0)} for fp in files_progress]
-            job_progress_store[job_id] = {"files": snap, "complete": False}
-            if job_with_skus != last_job_with_skus or job_unavailable != last_job_unavailable:
-                last_job_with_skus = job_with_skus
-                last_job_unavailable = job_unavailable
-                _put("sku_progress", {"job_ingredients_with_skus": job_with_skus, "job_ingredients_unavailable": job_unavailable, "job_sku_total": job_sku_total, "files": snap})
-            # Heartbeat every 15s to keep SSE connection alive during backoff/retries
-            if elapsed - last_heartbeat >= 15:
-                last_heartbeat = elapsed
-                _put("sku_progress", {"job_ingredients_with_skus": job_with_skus, "job_ingredients_unavailable": job_unavailable, "job_sku_total": job_sku_total, "files": snap})
-            done = parsing_done.is_set() and (job_sku_total == 0 or job_with_skus + job_unavailable >= job_sku_total)
-            if done:
-                break
-
-    sku_poll_thread = threading.Thread(target=_sku_poll_loop, daemon=True)
-    sku_poll_thread.start()
-
-    recipes_created = 0
-    ingredients_created = 0
-    sku_jobs = 0
-
-    with get_session() as session:
-        existing = get_ingredients(session)
-        existing_names = [ing.canonical_name for ing in existing]
-        existing_lookup = {ing.canonical_name: ing for ing in existing}
-
-        for file_idx, (content, source_filename) in enumerate(file_contents):
-            parsed_recipes = parse_recipe_text(content.decode("utf-8"))
-
-            for parsed in parsed_recipes:
-                meal_type = infer_meal_type(parsed.name, parsed.instructions)
-                recipe = create_recipe(
-                    session,
-                    Recipe(
-                        name=parsed.name,
-                        servings=parsed.servings,
-                        instructions=parsed.instructions,
-                        source_file=source_filename,
-                        meal_type=meal_type,
-                    ),
-                )
-                recipes_created += 1
-
-                recipe_ingredients = []
-                recipe_ingredient_names = []
-                current_existing = list(existing_names)
-                max_workers = min(settings.ingredient_batch_max_workers, max(1, len(parsed.ingredients)))
-
-                results = {}
-                with ThreadPoolExecutor(max_workers=max_workers) as ex:
-                    futures = {ex.submit(_match_and_normalize, it, current_existing): it for it in parsed.ingredients}
-                    for fut in as_completed(futures):
-                        it = futures[fut]
-                        try:
-                            results[it] = fut.result()
-                        except Exception as e:
-                            logger.warning("ingredient.parse_failed text=%s error=%s", it, e)
-
-                for ingredient_text in parsed.ingredients:
-                    if ingredient_text not in results:
-                        continue
-                    match, normalized = results[ingredient_text]
-                    canonical_name = (match.get("canonical_name") or "").strip().lower() or "unknown"
-                    ingredient = existing_lookup.get(canonical_name)
-                    new_base = (normalized.get("base_unit") or "count").strip().lower()
-                    if not ingredient:
-                        ingredient = get_or_create_ingredient(
-                            session,
-                            name=canonical_name,
-                            canonical_name=canonical_name,
-                            base_unit=new_base,
-                            base_unit_qty=normalized.get("base_unit_qty", 1.0),
-                        )
-                        existing_lookup[canonical_name] = ingredient
-                        existing_names.append(canonical_name)
-                        ingredients_created += 1
-                    else:
-                        cur = (ingredient.base_unit or "").strip().lower()
-                        if new_base in ("g", "ml", "count", "tbsp", "tsp") and cur != new_base:
-                            ingredient.base_unit = new_base
-                            session.add(ingredient)
-                            session.commit()
-                            session.refresh(ingredient)
-                            delete_skus_for_ingredients(session, [ingredient.id])
-                            session.commit()
-                    fetch_skus_for_ingredient.delay(ingredient.id, canonical_name, effective_postal)
-                    sku_jobs += 1
-                    files_progress[file_idx]["ingredients_added"] += 1
-                    files_progress[file_idx]["ingredient_ids"].append(ingredient.id)
-
-                    _put("ingredient_added", {
-                        "ingredients_added": ingredients_created,
-                        "name": canonical_name,
-                        "files": [{"name": f["name"], "ingredients_added": f["ingredients_added"], "ingredients_total": f["ingredients_total"], "ingredients_with_skus": f["ingredients_with_skus"], "ingredients_unavailable": f.get("ingredients_unavailable", 0), "sku_total": len(set(f.get("ingredient_ids") or []))} for f in files_progress],
-                    })
-
-                    recipe_ingredients.append(
-                        RecipeIngredient(
-                            recipe_id=recipe.id,
-                            ingredient_id=ingredient.id,
-                            quantity=normalized["normalized_qty"],
-                            unit=normalized["normalized_unit"],
-                            original_text=ingredient_text,
-                        )
-                    )
-                    recipe_ingredient_names.append(canonical_name)
-
-                create_recipe_ingredients(session, recipe_ingredients)
-                recipe.allergens = infer_allergens_from_ingredients(recipe_ingredient_names)
-                session.add(recipe)
-                session.commit()
-
-    for f in files_progress:
-        f["sku_total"] = len(set(f.get("ingredient_ids") or []))
-
-    _put("upload_complete", {
-        "recipes_created": recipes_created,
-        "ingredients_created": ingredients_created,
-        "sku_jobs_enqueued": sku_jobs,
-        "files": [{"name": fp["name"], "ingredients_added": fp["ingredients_added"], "ingredients_total": fp["ingredients_total"], "ingredients_with_skus": fp["ingredients_with_skus"], "ingredients_unavailable": fp.get("ingredients_unavailable", 0), "sku_total": fp["sku_total"]} for fp in files_progress],
-    })
-
-    parsing_done.set()
-    sku_poll_thread.join(timeout=SKU_POLL_TIMEOUT)
-
-    final_snap = [{"name": fp["name"], "ingredients_added": fp["ingredients_added"], "ingredients_total": fp["ingredients_total"], "ingredients_with_skus": fp["ingredients_with_skus"], "ingredients_unavailable": fp.get("ingredients_unavailable", 0), "sku_total": fp.get("sku_total", 0)} for fp in files_progress]
-    _put("stream_complete", {})
-    job_progress_store[job_id] = {"files": final_snap, "complete": True}
-    try:
-        del job_event_queues[job_id]
-    except KeyError:
-        pass
-
-
 @router.get("/progress/{job_id}")
 def get_progress(job_id: str) -> dict:
-    return job_progress_store.get(job_id, {"files": [], "complete": False})
+    return job_status(UploadJobStore(), job_id) or {"files": [], "complete": False}
 
 
 @router.get("/utilization")
 def get_utilization() -> dict:
     """
     Parallelization and utilization visibility.
-    - ingredient_workers: max parallelism for LLM ingredient matching (per recipe).
+    - ingredient_workers: max parallelism for LLM ingredient matching (per upload, over distinct lines).
     - sku_workers: Celery concurrency for SKU fetching.
     - sku_queue_length: pending SKU tasks in Redis (approximate).
+    - ingestion_queue_length: async uploads waiting for an ingestion worker.
+    - llm_log_sink: write-behind LLMCallLog queue depth, written/dropped counters.
+    - ingredient_aliases: persistent ingredient-line alias lookups, hits/stale and hit_rate since start.
+    - unit_fast_path: normalize_units lines answered by the rule-based parser vs the LLM since start.
+    - ingredient_match: match_ingredient decisions made by the lexical resolver (by rule) vs the LLM since start.
+    - sku_enqueue: SKU fetch requests vs jobs actually queued; coalesced = already pending for that ingredient.
+    - db_pool: connection pool usage and checkout wait times (wait_ms_max/timeouts rising = raise DB_POOL_SIZE).
+    - read_replica: whether read-only endpoints are currently served by the replica, and its lag.
     - timing_hint: grep '[TIMING]' in logs to see actual runtimes.
     """
     out = {
@@ -320,15 +99,30 @@ def get_utilization() -> dict:
             "tuning": "Increase if sku_queue_length stays high and active_tasks < concurrency. Each task does Instacart API + LLM filter. Rule of thumb: 10–20 for fast refresh.",
         },
         "batching": {
-            "ingredient_match": "ThreadPoolExecutor parallelizes match+normalize per recipe (no batch LLM calls)",
-            "sku_fetch": "One Celery task per ingredient; Instacart API is per-query (no batch endpoint)",
+            "ingredient_match": "Lines deduplicated across the upload; ThreadPoolExecutor parallelizes match+normalize per distinct line (no batch LLM calls)",
+            "ingestion_pipeline": {
+                "queue_size": settings.ingestion_queue_size,
+                "resolve_batch": settings.ingestion_resolve_batch,
+                "allergen_workers": settings.ingestion_allergen_workers,
+                "env_override": "INGESTION_QUEUE_SIZE, INGESTION_RESOLVE_BATCH, INGESTION_ALLERGEN_WORKERS",
+            },
+            "sku_fetch": "One Celery task per (ingredient, postal code), deduped via Redis and submitted as groups; Instacart API is per-query (no batch endpoint)",
         },
+        "llm_log_sink": llm_call_log_sink.stats(),
+        "ingredient_aliases": alias_metrics.stats(),
+        "unit_fast_path": fast_path_metrics.stats(),
+        "ingredient_match": match_metrics.stats(),
+        "sku_enqueue": sku_enqueue_metrics.stats(),
+        "db_pool": db_module.pool_stats(),
+        "read_replica": {"configured": db_module.replica_engine is not None, **db_module.replica_health.stats()},
     }
     try:
         conn = Redis.from_url(settings.redis_url)
         out["sku_queue_length"] = conn.llen("celery")
+        out["ingestion_queue_length"] = conn.llen(settings.ingestion_queue_name)
     except Exception:
         out["sku_queue_length"] = None
+        out["ingestion_queue_length"] = None
     try:
         inspect = celery_app.control.inspect()
         active = inspect.active()
@@ -371,53 +165,68 @@ async def upload_recipes(
         {"name": name, "ingredients_added": 0, "ingredients_total": ingredient_totals.get(name, 1), "ingredients_with_skus": 0, "ingredients_unavailable": 0, "sku_total": 0}
         for _, name in file_contents
     ]
-    job_progress_store[job_id] = {"files": files_progress, "complete": False}
-    event_queue = queue.Queue()
-    job_event_queues[job_id] = event_queue
-
-    asyncio.get_event_loop().run_in_executor(
-        None,
-        _run_processing,
-        job_id,
-        file_contents,
-        ingredient_totals,
-        effective_postal,
-        event_queue,
-    )
+    store = UploadJobStore()
+    try:
+        await asyncio.to_thread(store.create, job_id, file_contents, {"files": files_progress, "complete": False})
+        ingest_upload.apply_async(
+            args=(job_id, ingredient_totals, effective_postal),
+            queue=settings.ingestion_queue_name,
+        )
+    except (RedisError, OSError) as e:
+        logger.error("recipes.upload.queue_failed job=%s error=%s", job_id, e)
+        return JSONResponse({"detail": "Upload queue unavailable, try again shortly"}, status_code=503)
+    logger.info("recipes.upload.queued job=%s files=%s queue=%s", job_id, len(file_contents), settings.ingestion_queue_name)
 
     return {"job_id": job_id, "files": files_progress}
 
 
 @router.get("/recipes/upload/stream/{job_id}")
-async def stream_upload_progress(job_id: str):
+async def stream_upload_progress(job_id: str, last_event_id: str | None = Header(default=None)):
     """
     SSE stream for upload progress. Yields events as they happen (per ingredient).
-    Connect after receiving job_id from POST /recipes/upload.
+    Connect after receiving job_id from POST /recipes/upload. Each event carries its index as the SSE id;
+    a reconnecting client (Last-Event-ID) resumes after it, otherwise the stream replays from the start.
+    sku_progress (SKU coverage, every SKU_POLL_INTERVAL while it changes) and the final stream_complete are
+    computed here by job_status, not published by the worker, so they carry no id. The stream also ends when
+    the job's keys are gone.
     """
-    ev_queue = job_event_queues.get(job_id)
-    if not ev_queue:
-        progress = job_progress_store.get(job_id)
-        if progress and progress.get("complete"):
-            async def finished():
-                yield _emit_sse("stream_complete", {})
-            return StreamingResponse(
-                finished(),
-                media_type="text/event-stream",
-                headers={"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Accel-Buffering": "no"},
-            )
+    store = UploadJobStore()
+    if await asyncio.to_thread(store.progress, job_id) is None:
         return JSONResponse({"detail": "Job not found or expired"}, status_code=404)
+    cursor = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
 
     async def generate():
-        poll_interval = 0.05
+        nonlocal cursor
+        last_sku = None
+        last_sku_at = last_emit_at = 0.0
         while True:
-            try:
-                event, data = ev_queue.get_nowait()
-            except queue.Empty:
-                await asyncio.sleep(poll_interval)
+            for event, data in await asyncio.to_thread(store.events, job_id, cursor):
+                yield _emit_sse(event, data, cursor)
+                cursor += 1
+                if event == "stream_complete":  # the task failed
+                    return
+            now = time.monotonic()
+            if now - last_sku_at < upload_jobs.SKU_POLL_INTERVAL:
+                await asyncio.sleep(STREAM_POLL_INTERVAL)
                 continue
-            yield _emit_sse(event, data)
-            if event == "stream_complete":
-                break
+            last_sku_at = now
+            status = await asyncio.to_thread(job_status, store, job_id)
+            if status is None:
+                # Keys expired (or the job was lost before publishing anything more): nothing left to stream
+                logger.warning("recipes.upload.stream_expired job=%s cursor=%s", job_id, cursor)
+                yield _emit_sse("stream_complete", {})
+                return
+            if status["complete"]:
+                # upload_complete and ingested_at are written together; flush any events not yet sent
+                for event, data in await asyncio.to_thread(store.events, job_id, cursor):
+                    yield _emit_sse(event, data, cursor)
+                    cursor += 1
+            if status["sku"] != last_sku or now - last_emit_at >= upload_jobs.SKU_HEARTBEAT_S or status["complete"]:
+                last_sku, last_emit_at = status["sku"], now
+                yield _emit_sse("sku_progress", {**status["sku"], "files": status["files"]})
+            if status["complete"]:
+                yield _emit_sse("stream_complete", {})
+                return
 
     return StreamingResponse(
         generate(),
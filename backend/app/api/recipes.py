@@ -1,40 +1,29 @@
+import asyncio
 import io
+import threading
 import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import APIRouter, File, Form, UploadFile
-from sqlmodel import select
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
 
 from app.config import settings
 from app.logging import get_logger
 from app.utils.timing import time_span
 from app.schemas.recipe import RecipeUploadResponse
 from app.services.llm.dspy_client import configure_dspy
-from app.services.llm.ingredient_matcher import match_ingredient
-from app.services.llm.unit_normalizer import normalize_units
 from app.services.allergens import infer_allergens_from_ingredients
-from app.services.parsing.recipe_parser import infer_meal_type, parse_recipe_text
+from app.services.ingestion import match_and_normalize
+from app.services.ingestion_pipeline import IngestionPipeline
 from app.storage.db import get_session
-from app.storage.models import Ingredient, Recipe, RecipeIngredient
-from app.storage.repositories import (
-    create_recipe,
-    create_recipe_ingredients,
-    delete_skus_for_ingredients,
-    get_ingredients,
-    get_or_create_ingredient,
-)
-from app.workers.tasks import fetch_skus_for_ingredient
+from app.storage.repositories import get_catalog_stats
+from app.workers.sku_enqueue import SkuEnqueuer, submit_sku_fetches
 
 router = APIRouter()
 logger = get_logger(__name__)
 
-
-def _match_and_normalize(ingredient_text: str, existing_names: list[str]) -> Tuple[dict, dict]:
-    match = match_ingredient(ingredient_text, existing_names)
-    canonical_name = (match.get("canonical_name") or "").strip().lower() or "unknown"
-    normalized = normalize_units(ingredient_text, canonical_name=canonical_name)
-    return match, normalized
+# Sync uploads block on LLM calls and DB commits for their whole duration: run them here, never on the event loop
+sync_upload_executor = ThreadPoolExecutor(max_workers=settings.sync_upload_workers, thread_name_prefix="sync-upload")
+_sync_upload_slots = threading.BoundedSemaphore(settings.sync_upload_max_pending)
 
 
 def _expand_files(content: bytes, filename: str) -> list[tuple[bytes, str]]:
@@ -56,160 +45,86 @@ def _expand_files(content: bytes, filename: str) -> list[tuple[bytes, str]]:
     return [(content, filename)]
 
 
+def _process_upload(raw_files: list[tuple[bytes, str]], effective_postal: str) -> RecipeUploadResponse:
+    """The whole sync upload (expand, pipeline, response); blocking, runs on sync_upload_executor."""
+    configure_dspy()
+    file_contents: list[tuple[bytes, str]] = []
+    for content, filename in raw_files:
+        file_contents.extend(_expand_files(content, filename))
+
+    # parse -> resolve -> allergen -> persist -> SKU enqueue, overlapped across recipes and files
+    pipeline = IngestionPipeline(
+        resolve_fn=match_and_normalize,
+        allergen_fn=infer_allergens_from_ingredients,
+        sku_enqueuer=SkuEnqueuer(submit_sku_fetches),
+        postal_code=effective_postal,
+    )
+    with time_span("ingredient.pipeline", files=len(file_contents)):
+        pipeline.run(file_contents)
+    dedupe = pipeline.dedupe_stats()
+
+    with get_session() as session:
+        stats = get_catalog_stats(session)
+    logger.info(
+        "db.state postgres: recipes=%s ingredients=%s recipe_links=%s",
+        stats["recipes"],
+        stats["ingredients"],
+        stats["recipe_ingredients"],
+    )
+
+    logger.info(
+        "recipes.upload.end recipes=%s duplicates_skipped=%s ingredients=%s sku_jobs=%s sku_jobs_coalesced=%s "
+        "lines=%s unique_lines=%s alias_hits=%s resolutions_saved=%s",
+        pipeline.recipes_created,
+        pipeline.duplicates_skipped,
+        pipeline.ingredients_created,
+        pipeline.sku_jobs,
+        pipeline.sku_jobs_coalesced,
+        dedupe["lines"],
+        dedupe["unique_lines"],
+        dedupe["alias_hits"],
+        dedupe["resolutions_saved"],
+    )
+    return RecipeUploadResponse(
+        recipes_created=pipeline.recipes_created,
+        ingredients_created=pipeline.ingredients_created,
+        sku_jobs_enqueued=pipeline.sku_jobs,
+        sku_jobs_coalesced=pipeline.sku_jobs_coalesced,
+        duplicates_skipped=pipeline.duplicates_skipped,
+        skipped_recipes=pipeline.skipped,
+        ingredient_lines=dedupe["lines"],
+        unique_ingredient_lines=dedupe["unique_lines"],
+        alias_hits=dedupe["alias_hits"],
+        lexical_matches=dedupe["lexical_matches"],
+        resolutions_saved=dedupe["resolutions_saved"],
+        pipeline=pipeline.stats(),
+    )
+
+
 @router.post("/recipes/upload/sync", response_model=RecipeUploadResponse)
 async def upload_recipes(
     files: list[UploadFile] = File(...),
     postal_code: str | None = Form(default=None),
 ) -> RecipeUploadResponse:
-    with time_span("recipes.upload.total", files=len(files)):
-        configure_dspy()
-        effective_postal = (postal_code or "").strip() or settings.default_postal_code
-        recipes_created = 0
-        ingredients_created = 0
-        sku_jobs = 0
-        logger.info("recipes.upload.start files=%s postal=%s", len(files), effective_postal)
-
-        with get_session() as session:
-            existing = get_ingredients(session)
-            existing_names = [ing.canonical_name for ing in existing]
-            existing_lookup = {ing.canonical_name: ing for ing in existing}
-
-            for upload in files:
-                content = await upload.read()
-                fn = upload.filename or "upload"
-                for file_content, source_name in _expand_files(content, fn):
-                    parsed_recipes = parse_recipe_text(file_content.decode("utf-8"))
-                    for parsed in parsed_recipes:
-                        meal_type = infer_meal_type(parsed.name, parsed.instructions)
-                        recipe = create_recipe(
-                            session,
-                            Recipe(
-                                name=parsed.name,
-                                servings=parsed.servings,
-                                instructions=parsed.instructions,
-                                source_file=source_name,
-                                meal_type=meal_type,
-                            ),
-                        )
-                        recipes_created += 1
-
-                        recipe_ingredients: list[RecipeIngredient] = []
-                        recipe_ingredient_names: list[str] = []
-                        current_existing = list(existing_names)
-                        # ThreadPoolExecutor: threads (true parallelism for I/O-bound LLM calls), not asyncio
-                        max_workers = min(
-                            settings.ingredient_batch_max_workers,
-                            max(1, len(parsed.ingredients)),
-                        )
-                        logger.info(
-                            "ingredient.batch.start recipe=%s workers=%s count=%s",
-                            parsed.name,
-                            max_workers,
-                            len(parsed.ingredients),
-                        )
-                        results: dict[str, Tuple[dict, dict]] = {}
-                        with time_span("ingredient.batch.parallel", recipe=parsed.name, workers=max_workers, count=len(parsed.ingredients)):
-                            with ThreadPoolExecutor(max_workers=max_workers) as ex:
-                                futures = {
-                                    ex.submit(_match_and_normalize, it, current_existing): it
-                                    for it in parsed.ingredients
-                                }
-                                for fut in as_completed(futures):
-                                    it = futures[fut]
-                                    try:
-                                        results[it] = fut.result()
-                                    except Exception as e:
-                                        logger.warning("ingredient.parse_failed text=%s error=%s", it, e)
-                        for ingredient_text in parsed.ingredients:
-                            if ingredient_text not in results:
-                                continue
-                            match, normalized = results[ingredient_text]
-                            canonical_name = match["canonical_name"].strip().lower()
-                            if not canonical_name:
-                                canonical_name = "unknown"
-                            ingredient = existing_lookup.get(canonical_name)
-                            new_base = (normalized.get("base_unit") or "count").strip().lower()
-                            if not ingredient:
-                                ingredient = get_or_create_ingredient(
-                                    session,
-                                    name=canonical_name,
-                                    canonical_name=canonical_name,
-                                    base_unit=new_base,
-                                    base_unit_qty=normalized.get("base_unit_qty", 1.0),
-                                )
-                                existing_lookup[canonical_name] = ingredient
-                                existing_names.append(canonical_name)
-                                ingredients_created += 1
-                                logger.info(
-                                    "ingredient.created id=%s name=%s base_unit=%s",
-                                    ingredient.id,
-                                    ingredient.canonical_name,
-                                    ingredient.base_unit,
-                                )
-                                fetch_skus_for_ingredient.delay(
-                                    ingredient.id, canonical_name, effective_postal
-                                )
-                                sku_jobs += 1
-                            else:
-                                # Repair stale base_unit when normalizer disagrees
-                                cur = (ingredient.base_unit or "").strip().lower()
-                                if new_base in ("g", "ml", "count", "tbsp", "tsp") and cur != new_base:
-                                    ingredient.base_unit = new_base
-                                    session.add(ingredient)
-                                    session.commit()
-                                    session.refresh(ingredient)
-                                    deleted = delete_skus_for_ingredients(session, [ingredient.id])
-                                    if deleted:
-                                        session.commit()
-                                    logger.info(
-                                        "ingredient.base_unit.repair id=%s name=%s old=%s new=%s deleted_skus=%s",
-                                        ingredient.id,
-                                        canonical_name,
-                                        cur,
-                                        new_base,
-                                        deleted,
-                                    )
-                                    fetch_skus_for_ingredient.delay(
-                                        ingredient.id, canonical_name, effective_postal
-                                    )
-                                    sku_jobs += 1
-
-                            recipe_ingredients.append(
-                                RecipeIngredient(
-                                    recipe_id=recipe.id,
-                                    ingredient_id=ingredient.id,
-                                    quantity=normalized["normalized_qty"],
-                                    unit=normalized["normalized_unit"],
-                                    original_text=ingredient_text,
-                                )
-                            )
-                            recipe_ingredient_names.append(canonical_name)
-
-                        create_recipe_ingredients(session, recipe_ingredients)
-
-                        # Set allergens from ingredients (meal initialisation)
-                        recipe.allergens = infer_allergens_from_ingredients(recipe_ingredient_names)
-                        session.add(recipe)
-                        session.commit()
-
-            total_recipes = len(list(session.exec(select(Recipe))))
-            total_ingredients = len(list(session.exec(select(Ingredient))))
-            total_recipe_links = len(list(session.exec(select(RecipeIngredient))))
-            logger.info(
-                "db.state postgres: recipes=%s ingredients=%s recipe_links=%s",
-                total_recipes,
-                total_ingredients,
-                total_recipe_links,
-            )
-
-        logger.info(
-            "recipes.upload.end recipes=%s ingredients=%s sku_jobs=%s",
-            recipes_created,
-            ingredients_created,
-            sku_jobs,
-        )
-        return RecipeUploadResponse(
-            recipes_created=recipes_created,
-            ingredients_created=ingredients_created,
-            sku_jobs_enqueued=sku_jobs,
-        )
+    """
+    Upload and process recipes within the request. The event loop only reads the body; processing runs on
+    sync_upload_executor (SYNC_UPLOAD_WORKERS threads), so health checks, SSE streams and other requests keep
+    being served meanwhile. 503 when SYNC_UPLOAD_MAX_PENDING uploads are already running or waiting.
+    """
+    if not _sync_upload_slots.acquire(blocking=False):
+        logger.warning("recipes.upload.rejected pending=%s", settings.sync_upload_max_pending)
+        raise HTTPException(status_code=503, detail="Too many uploads in progress, try again shortly")
+    future = None
+    try:
+        with time_span("recipes.upload.total", files=len(files)):
+            effective_postal = (postal_code or "").strip() or settings.default_postal_code
+            logger.info("recipes.upload.start files=%s postal=%s", len(files), effective_postal)
+            raw_files = [(await upload.read(), upload.filename or "upload") for upload in files]
+            future = sync_upload_executor.submit(_process_upload, raw_files, effective_postal)
+            # The slot is held until the work itself finishes: a client disconnect cancels this coroutine, not
+            # an upload already running on the executor
+            future.add_done_callback(lambda _: _sync_upload_slots.release())
+            return await asyncio.wrap_future(future)
+    finally:
+        if future is None:
+            _sync_upload_slots.release()
@@ -0,0 +1,18 @@
+"""Catalog statistics from COUNT(*) (or pg_class.reltuples estimates) instead of loading tables."""
+
+from fastapi import APIRouter, Depends
+from sqlmodel import Session
+
+from app.storage.db import request_read_session
+from app.storage.repositories import get_catalog_stats
+
+router = APIRouter()
+
+
+@router.get("/stats")
+def catalog_stats(estimate: bool = False, session: Session = Depends(request_read_session)) -> dict:
+    """
+    Row counts for recipes, ingredients, recipe links and SKUs, plus SKU coverage.
+    estimate=true reads planner estimates for the table totals (constant time on Postgres).
+    """
+    return get_catalog_stats(session, estimate=estimate)
@@ -0,0 +1,152 @@
+"""
+Operational commands.
+
+    python -m app.cli migrate                      # apply pending schema migrations
+    python -m app.cli db-version                   # show current vs head schema revision
+    python -m app.cli backfill sku_unavailable     # run/resume a data backfill
+    python -m app.cli dedupe-ingredients           # merge ingredients sharing a canonical_name
+    python -m app.cli import recipes/ --batch-size 500  # bulk/resumable import (dir, .zip or .jsonl)
+    python -m app.cli bench-units ../intern-dataset-main [--llm]  # unit fast-path coverage / LLM agreement
+"""
+
+import argparse
+import sys
+
+from app.logging import configure_logging, get_logger
+from app.storage.db import engine, get_session
+
+logger = get_logger(__name__)
+
+
+def _cmd_migrate(_args: argparse.Namespace) -> int:
+    from app.storage.schema import ensure_schema_current
+
+    revision = ensure_schema_current(engine, auto_migrate=True)
+    print(f"schema at {revision}")
+    return 0
+
+
+def _cmd_db_version(_args: argparse.Namespace) -> int:
+    from app.storage.schema import current_revision, head_revision
+
+    current, head = current_revision(engine), head_revision()
+    print(f"current={current or 'unversioned'} head={head}")
+    return 0 if current == head else 1
+
+
+def _cmd_backfill(args: argparse.Namespace) -> int:
+    from app.storage.backfills import run_backfill
+
+    with get_session() as session:
+        state = run_backfill(session, args.name, batch_size=args.batch_size, restart=args.restart)
+    print(f"backfill {state.name}: rows_updated={state.rows_updated} last_id={state.last_id}")
+    return 0
+
+
+def _cmd_dedupe_ingredients(_args: argparse.Namespace) -> int:
+    from app.storage.repositories import merge_duplicate_ingredients
+
+    with get_session() as session:
+        result = merge_duplicate_ingredients(session)
+    print(f"dedupe-ingredients: groups={result['groups']} merged={result['merged']}")
+    return 0
+
+
+def _cmd_import(args: argparse.Namespace) -> int:
+    from app.services.llm.dspy_client import configure_dspy
+    from app.services.recipe_import import run_import
+
+    configure_dspy()
+    with get_session() as session:
+        stats = run_import(
+            session,
+            args.path,
+            batch_size=args.batch_size,
+            max_workers=args.workers,
+            postal_code=args.postal_code,
+            enqueue_skus=not args.no_skus,
+            llm_allergens=args.llm_allergens,
+            restart=args.restart,
+        )
+    print(
+        f"import {args.path}: sources={stats.sources} (resumed after {stats.skipped_sources}) "
+        f"failed={stats.failed_sources} recipes={stats.recipes} duplicates={stats.duplicates_skipped} "
+        f"links={stats.links} new_ingredients={stats.ingredients_created} sku_jobs={stats.sku_jobs} "
+        f"elapsed_s={stats.elapsed_s:.1f} recipes_per_s={stats.recipes_per_s:.1f} resolver={stats.resolver}"
+    )
+    return 0
+
+
+def _cmd_bench_units(args: argparse.Namespace) -> int:
+    from app.config import settings
+    from app.services.parsing.quantity_parser import benchmark
+    from app.services.recipe_import import _parse_source, iter_sources
+
+    lines = []
+    for path in args.paths:
+        for _name, kind, raw in iter_sources(path):
+            lines.extend(line for recipe in _parse_source(kind, raw) for line in recipe.ingredients)
+    llm_fn = None
+    if args.llm:
+        from app.services.llm.dspy_client import configure_dspy
+        from app.services.llm.unit_normalizer import normalize_units_llm
+
+        configure_dspy()
+        llm_fn = lambda line, name: normalize_units_llm(line, canonical_name=name)  # noqa: E731
+    min_confidence = args.min_confidence if args.min_confidence is not None else settings.unit_fast_path_min_confidence
+    result = benchmark(lines, min_confidence=min_confidence, llm_fn=llm_fn)
+    print(f"bench-units: distinct_lines={result['lines']} fast_path={result['fast_path']} coverage={result['coverage']}")
+    if llm_fn is not None:
+        print(f"agreement with LLM on fast-path lines: {result['agreement']}")
+        for d in result["disagreements"]:
+            print(f"  DIFF {d['line']!r}: fast={d['fast']} llm={d['llm']}")
+    if args.verbose:
+        for line in result["fallback"]:
+            print(f"  LLM  {line!r}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("migrate", help="apply pending schema migrations").set_defaults(func=_cmd_migrate)
+    sub.add_parser("db-version", help="show current and head schema revisions").set_defaults(func=_cmd_db_version)
+
+    backfill = sub.add_parser("backfill", help="run or resume a named data backfill")
+    backfill.add_argument("name")
+    backfill.add_argument("--batch-size", type=int, default=1000)
+    backfill.add_argument("--restart", action="store_true", help="ignore saved progress and start over")
+    backfill.set_defaults(func=_cmd_backfill)
+
+    sub.add_parser(
+        "dedupe-ingredients", help="merge duplicate canonical ingredients and repoint recipe links and SKUs"
+    ).set_defaults(func=_cmd_dedupe_ingredients)
+
+    imp = sub.add_parser("import", help="bulk import recipes from a directory, .zip or .jsonl (resumable)")
+    imp.add_argument("path")
+    imp.add_argument("--batch-size", type=int, default=500, help="recipes per transaction")
+    imp.add_argument("--workers", type=int, default=None, help="parallel ingredient resolutions")
+    imp.add_argument("--postal-code", default=None)
+    imp.add_argument("--no-skus", action="store_true", help="do not enqueue SKU fetches for new ingredients")
+    imp.add_argument("--llm-allergens", action="store_true", help="infer allergens with the LLM (default: keywords)")
+    imp.add_argument("--restart", action="store_true", help="ignore saved progress and start over")
+    imp.set_defaults(func=_cmd_import)
+
+    bench = sub.add_parser("bench-units", help="rule-based unit normalization coverage (and LLM agreement) on recipes")
+    bench.add_argument("paths", nargs="+", help="recipe directories, .zip or .jsonl files")
+    bench.add_argument("--llm", action="store_true", help="also call the LLM on fast-path lines and report agreement")
+    bench.add_argument("--min-confidence", type=float, default=None, help="default: UNIT_FAST_PATH_MIN_CONFIDENCE")
+    bench.add_argument("-v", "--verbose", action="store_true", help="list the lines that fall back to the LLM")
+    bench.set_defaults(func=_cmd_bench_units)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    configure_logging()
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.recipes import sync_upload_executor
 from app.api.routes import router as api_router
 from app.logging import configure_logging, get_logger
 from app.services.llm.dspy_client import configure_dspy
-from app.storage.db import create_db_and_tables
+from app.storage.db import engine
+from app.storage.llm_log_sink import llm_call_log_sink
+from app.storage.schema import ensure_schema_current
 
 app = FastAPI(title="Tandem Recipes API")
 logger = get_logger(__name__)
@@ -22,7 +25,14 @@ def on_startup() -> None:
     configure_logging()
     logger.info("startup: configuring services")
     configure_dspy()
-    create_db_and_tables()
+    ensure_schema_current(engine)
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    sync_upload_executor.shutdown(wait=True)
+    llm_call_log_sink.close()
+    logger.info("shutdown: llm_log_sink flushed stats=%s", llm_call_log_sink.stats())
 
 
 app.include_router(api_router)
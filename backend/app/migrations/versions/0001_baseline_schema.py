@@ -0,0 +1,126 @@
+"""Baseline schema (replaces create_all + ALTER ... IF NOT EXISTS on startup).
+
+Existing deployments predate migrations: tables are only created when missing and the columns
+that used to be added at startup are added only when absent, so this revision is safe to run
+against a database created by the old startup path.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _has_column(inspector, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspector.get_columns(table))
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("recipe"):
+        op.create_table(
+            "recipe",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("servings", sa.Integer(), nullable=False),
+            sa.Column("instructions", sa.String(), nullable=False),
+            sa.Column("source_file", sa.String(), nullable=False),
+            sa.Column("meal_type", sa.String(), nullable=False, server_default="entree"),
+            sa.Column("allergens", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+    if not inspector.has_table("ingredient"):
+        op.create_table(
+            "ingredient",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("canonical_name", sa.String(), nullable=False),
+            sa.Column("base_unit", sa.String(), nullable=False),
+            sa.Column("base_unit_qty", sa.Float(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("sku_unavailable", sa.Boolean(), nullable=False, server_default=sa.false()),
+        )
+    if not inspector.has_table("recipeingredient"):
+        op.create_table(
+            "recipeingredient",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("recipe_id", sa.Integer(), sa.ForeignKey("recipe.id"), nullable=False),
+            sa.Column("ingredient_id", sa.Integer(), sa.ForeignKey("ingredient.id"), nullable=False),
+            sa.Column("quantity", sa.Float(), nullable=False),
+            sa.Column("unit", sa.String(), nullable=False),
+            sa.Column("original_text", sa.String(), nullable=False),
+        )
+    if not inspector.has_table("sku"):
+        op.create_table(
+            "sku",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("ingredient_id", sa.Integer(), sa.ForeignKey("ingredient.id"), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("brand", sa.String(), nullable=True),
+            sa.Column("size", sa.String(), nullable=True),
+            sa.Column("price", sa.Float(), nullable=True),
+            sa.Column("price_per_unit", sa.String(), nullable=True),
+            sa.Column("quantity_in_base_unit", sa.Float(), nullable=True),
+            sa.Column("size_display", sa.String(), nullable=True),
+            sa.Column("retailer_slug", sa.String(), nullable=True),
+            sa.Column("postal_code", sa.String(), nullable=True),
+            sa.Column("fetched_at", sa.DateTime(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+        )
+    if not inspector.has_table("menuplan"):
+        op.create_table(
+            "menuplan",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("target_servings", sa.Integer(), nullable=False),
+            sa.Column("plan_payload", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+    if not inspector.has_table("llmcalllog"):
+        op.create_table(
+            "llmcalllog",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("prompt_name", sa.String(), nullable=False),
+            sa.Column("prompt_version", sa.String(), nullable=False),
+            sa.Column("model", sa.String(), nullable=False),
+            sa.Column("input_payload", sa.String(), nullable=False, server_default=""),
+            sa.Column("input_blob_hashes", sa.JSON(), nullable=True),
+            sa.Column("input_compressed", sa.LargeBinary(), nullable=True),
+            sa.Column("output_payload", sa.String(), nullable=False),
+            sa.Column("latency_ms", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+    if not inspector.has_table("promptblob"):
+        op.create_table(
+            "promptblob",
+            sa.Column("hash", sa.String(), primary_key=True),
+            sa.Column("content", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+
+    # Columns previously added by _migrate_* on every startup
+    inspector = sa.inspect(op.get_bind())
+    legacy_columns = [
+        ("recipe", sa.Column("meal_type", sa.String(32), server_default="entree")),
+        ("recipe", sa.Column("allergens", sa.JSON(), nullable=True)),
+        ("sku", sa.Column("quantity_in_base_unit", sa.Float(), nullable=True)),
+        ("sku", sa.Column("size_display", sa.String(64), nullable=True)),
+        ("ingredient", sa.Column("sku_unavailable", sa.Boolean(), server_default=sa.false())),
+        ("llmcalllog", sa.Column("input_blob_hashes", sa.JSON(), nullable=True)),
+        ("llmcalllog", sa.Column("input_compressed", sa.LargeBinary(), nullable=True)),
+    ]
+    for table, column in legacy_columns:
+        if not _has_column(inspector, table, column.name):
+            op.add_column(table, column)
+
+
+def downgrade() -> None:
+    for table in ("promptblob", "llmcalllog", "menuplan", "sku", "recipeingredient", "ingredient", "recipe"):
+        op.drop_table(table)
@@ -0,0 +1,29 @@
+"""Checkpoint table for resumable data backfills (python -m app.cli backfill ...).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "backfillstate",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("last_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("rows_updated", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("backfillstate")
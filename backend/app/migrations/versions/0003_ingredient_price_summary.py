@@ -0,0 +1,53 @@
+"""ingredient_price_summary: cheapest SKU per (ingredient, retailer, postal_code).
+
+Populate for existing SKUs with `python -m app.cli backfill price_summary`; until it completes,
+get_ingredients_needing_sku_refresh also checks SKUs directly. A database with no SKUs has nothing to
+backfill and is marked complete here.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ingredient_price_summary",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("ingredient_id", sa.Integer(), sa.ForeignKey("ingredient.id"), nullable=False),
+        sa.Column("retailer_slug", sa.String(), nullable=False, server_default=""),
+        sa.Column("postal_code", sa.String(), nullable=False, server_default=""),
+        sa.Column("min_price_per_base_unit", sa.Float(), nullable=True),
+        sa.Column("min_price_sku_id", sa.Integer(), nullable=True),
+        sa.Column("min_price", sa.Float(), nullable=True),
+        sa.Column("sku_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("fetched_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("ingredient_id", "retailer_slug", "postal_code"),
+    )
+    bind = op.get_bind()
+    if bind.execute(sa.text("SELECT 1 FROM sku LIMIT 1")).first() is None:
+        now = datetime.utcnow()
+        backfillstate = sa.table(
+            "backfillstate",
+            sa.column("name", sa.String()),
+            sa.column("completed_at", sa.DateTime()),
+            sa.column("updated_at", sa.DateTime()),
+        )
+        op.bulk_insert(backfillstate, [{"name": "price_summary", "completed_at": now, "updated_at": now}])
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM backfillstate WHERE name = 'price_summary'")
+    op.drop_table("ingredient_price_summary")
@@ -0,0 +1,42 @@
+"""menuplan: JSONB payload, request fingerprint, objective, timings, catalog version.
+
+Legacy rows keep their Python-repr plan_payload (now nullable); new rows write payload.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+JSONVariant = sa.JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("menuplan") as batch:
+        batch.alter_column("plan_payload", existing_type=sa.String(), nullable=True)
+        batch.add_column(sa.Column("request_fingerprint", sa.String(), nullable=True))
+        batch.add_column(sa.Column("request", JSONVariant, nullable=True))
+        batch.add_column(sa.Column("payload", JSONVariant, nullable=True))
+        batch.add_column(sa.Column("status", sa.String(), nullable=True))
+        batch.add_column(sa.Column("objective", sa.Float(), nullable=True))
+        batch.add_column(sa.Column("solve_ms", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("total_ms", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("catalog_version", sa.String(), nullable=True))
+    op.create_index("ix_menuplan_created_at", "menuplan", ["created_at"])
+    op.create_index("ix_menuplan_fingerprint_created_at", "menuplan", ["request_fingerprint", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_menuplan_fingerprint_created_at", table_name="menuplan")
+    op.drop_index("ix_menuplan_created_at", table_name="menuplan")
+    with op.batch_alter_table("menuplan") as batch:
+        for column in ("catalog_version", "total_ms", "solve_ms", "objective", "status", "payload", "request", "request_fingerprint"):
+            batch.drop_column(column)
@@ -0,0 +1,115 @@
+"""ingredient: unique index on canonical_name, merging existing duplicates first.
+
+Duplicates (same canonical_name) collapse onto the lowest id: recipeingredient and sku rows are
+repointed, the duplicates' price summaries and rows are deleted, and the survivors' price summaries are
+recomputed from their (now merged) unexpired SKUs, as `python -m app.cli dedupe-ingredients` does. A
+survivor that gained an unexpired SKU is no longer marked sku_unavailable.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+DUPLICATE_IDS = (
+    "SELECT i.id FROM ingredient i "
+    "WHERE i.id > (SELECT MIN(j.id) FROM ingredient j WHERE j.canonical_name = i.canonical_name)"
+)
+KEEPER_ID = (
+    "(SELECT MIN(k.id) FROM ingredient k WHERE k.canonical_name = "
+    "(SELECT d.canonical_name FROM ingredient d WHERE d.id = {table}.ingredient_id))"
+)
+
+# Tables as of this revision (not app.storage.models, which keeps changing)
+sku = sa.table(
+    "sku",
+    sa.column("id", sa.Integer()),
+    sa.column("ingredient_id", sa.Integer()),
+    sa.column("price", sa.Float()),
+    sa.column("quantity_in_base_unit", sa.Float()),
+    sa.column("retailer_slug", sa.String()),
+    sa.column("postal_code", sa.String()),
+    sa.column("fetched_at", sa.DateTime()),
+    sa.column("expires_at", sa.DateTime()),
+)
+price_summary = sa.table(
+    "ingredient_price_summary",
+    sa.column("ingredient_id", sa.Integer()),
+    sa.column("retailer_slug", sa.String()),
+    sa.column("postal_code", sa.String()),
+    sa.column("min_price_per_base_unit", sa.Float()),
+    sa.column("min_price_sku_id", sa.Integer()),
+    sa.column("min_price", sa.Float()),
+    sa.column("sku_count", sa.Integer()),
+    sa.column("fetched_at", sa.DateTime()),
+    sa.column("expires_at", sa.DateTime()),
+    sa.column("updated_at", sa.DateTime()),
+)
+ingredient = sa.table("ingredient", sa.column("id", sa.Integer()), sa.column("sku_unavailable", sa.Boolean()))
+
+
+def _refresh_price_summaries(bind, keeper_ids: list[int]) -> None:
+    """Same grouping as repositories.refresh_price_summaries, in plain SQL + Python."""
+    now = datetime.utcnow()
+    bind.execute(sa.delete(price_summary).where(price_summary.c.ingredient_id.in_(keeper_ids)))
+    rows = bind.execute(
+        sa.select(sku).where(sku.c.ingredient_id.in_(keeper_ids), sku.c.expires_at > now).order_by(sku.c.id)
+    ).mappings()
+    groups: dict[tuple[int, str, str], dict] = {}
+    for row in rows:
+        key = (row["ingredient_id"], row["retailer_slug"] or "", row["postal_code"] or "")
+        summary = groups.setdefault(key, {
+            "ingredient_id": key[0],
+            "retailer_slug": key[1],
+            "postal_code": key[2],
+            "min_price_per_base_unit": None,
+            "min_price_sku_id": None,
+            "min_price": None,
+            "sku_count": 0,
+            "fetched_at": row["fetched_at"],
+            "expires_at": row["expires_at"],
+            "updated_at": now,
+        })
+        summary["sku_count"] += 1
+        summary["fetched_at"] = max(summary["fetched_at"], row["fetched_at"])
+        summary["expires_at"] = max(summary["expires_at"], row["expires_at"])
+        qty = row["quantity_in_base_unit"]
+        if row["price"] is None or not qty or qty <= 0:
+            continue
+        ppu = row["price"] / qty
+        if summary["min_price_per_base_unit"] is None or ppu < summary["min_price_per_base_unit"]:
+            summary.update(min_price_per_base_unit=round(ppu, 6), min_price_sku_id=row["id"], min_price=row["price"])
+    if groups:
+        op.bulk_insert(price_summary, list(groups.values()))
+        covered = sorted({key[0] for key in groups})
+        bind.execute(sa.update(ingredient).where(ingredient.c.id.in_(covered)).values(sku_unavailable=False))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    keeper_ids = list(bind.execute(sa.text(
+        "SELECT MIN(id) FROM ingredient GROUP BY canonical_name HAVING COUNT(*) > 1"
+    )).scalars())
+    for table in ("recipeingredient", "sku"):
+        op.execute(
+            f"UPDATE {table} SET ingredient_id = {KEEPER_ID.format(table=table)} "
+            f"WHERE ingredient_id IN ({DUPLICATE_IDS})"
+        )
+    op.execute(f"DELETE FROM ingredient_price_summary WHERE ingredient_id IN ({DUPLICATE_IDS})")
+    op.execute(f"DELETE FROM ingredient WHERE id IN ({DUPLICATE_IDS})")
+    if keeper_ids:
+        _refresh_price_summaries(bind, keeper_ids)
+    op.create_index("ux_ingredient_canonical_name", "ingredient", ["canonical_name"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ux_ingredient_canonical_name", table_name="ingredient")
@@ -0,0 +1,48 @@
+"""product: shared retailer listings; sku.product_id references them.
+
+Existing SKU rows keep product_id NULL; rows written by later refreshes link to a product.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+JSONVariant = sa.JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "product",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("retailer_slug", sa.String(), nullable=False, server_default=""),
+        sa.Column("item_id", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("brand", sa.String(), nullable=True),
+        sa.Column("size", sa.String(), nullable=True),
+        sa.Column("size_display", sa.String(), nullable=True),
+        sa.Column("quantity_by_unit", JSONVariant, nullable=True),
+        sa.Column("first_seen_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("retailer_slug", "item_id"),
+    )
+    with op.batch_alter_table("sku") as batch:
+        batch.add_column(sa.Column("product_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_sku_product_id", "product", ["product_id"], ["id"])
+        batch.create_index("ix_sku_product_id", ["product_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("sku") as batch:
+        batch.drop_index("ix_sku_product_id")
+        batch.drop_constraint("fk_sku_product_id", type_="foreignkey")
+        batch.drop_column("product_id")
+    op.drop_table("product")
@@ -0,0 +1,52 @@
+"""Recipe search: recipe.search_vector (tsvector, GIN) and pg_trgm indexes on recipe/ingredient names.
+
+Also indexes recipeingredient.recipe_id / ingredient_id (both dialects). The Postgres-only parts are
+skipped elsewhere; search falls back to LIKE there. Existing recipes get their search_vector here.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_recipeingredient_recipe_id", "recipeingredient", ["recipe_id"])
+    op.create_index("ix_recipeingredient_ingredient_id", "recipeingredient", ["ingredient_id"])
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column("recipe", sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True))
+    op.create_index("ix_recipe_search_vector", "recipe", ["search_vector"], postgresql_using="gin")
+    op.execute("CREATE INDEX ix_recipe_name_trgm ON recipe USING gin (name gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_ingredient_canonical_name_trgm ON ingredient USING gin (canonical_name gin_trgm_ops)")
+    op.execute(
+        """
+        UPDATE recipe r SET search_vector =
+            setweight(to_tsvector('english', coalesce(r.name, '')), 'A')
+            || setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(i.canonical_name, ' ')
+                FROM recipeingredient ri JOIN ingredient i ON i.id = ri.ingredient_id
+                WHERE ri.recipe_id = r.id
+            ), '')), 'B')
+            || setweight(to_tsvector('english', coalesce(r.instructions, '')), 'C')
+        """
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_ingredient_canonical_name_trgm", table_name="ingredient")
+        op.drop_index("ix_recipe_name_trgm", table_name="recipe")
+        op.drop_index("ix_recipe_search_vector", table_name="recipe")
+        op.drop_column("recipe", "search_vector")
+    op.drop_index("ix_recipeingredient_ingredient_id", table_name="recipeingredient")
+    op.drop_index("ix_recipeingredient_recipe_id", table_name="recipeingredient")
@@ -0,0 +1,29 @@
+"""recipe.allergens as JSONB with a GIN index, so exclude_allergens filters run in SQL.
+
+Postgres only; other dialects keep the JSON column (filters use json_each there).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE recipe ALTER COLUMN allergens TYPE jsonb USING allergens::jsonb")
+    op.create_index("ix_recipe_allergens", "recipe", ["allergens"], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_index("ix_recipe_allergens", table_name="recipe")
+    op.execute("ALTER TABLE recipe ALTER COLUMN allergens TYPE json USING allergens::json")
@@ -0,0 +1,36 @@
+"""ingredientalias: persisted ingredient-line resolutions (canonical ingredient + unit normalization).
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ingredientalias",
+        sa.Column("alias_key", sa.String(), primary_key=True),
+        sa.Column("ingredient_id", sa.Integer(), sa.ForeignKey("ingredient.id"), nullable=False),
+        sa.Column("normalized_qty", sa.Float(), nullable=False),
+        sa.Column("normalized_unit", sa.String(), nullable=False),
+        sa.Column("base_unit", sa.String(), nullable=False),
+        sa.Column("base_unit_qty", sa.Float(), nullable=False),
+        sa.Column("prompt_version", sa.String(), nullable=False),
+        sa.Column("hits", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_ingredientalias_ingredient_id", "ingredientalias", ["ingredient_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ingredientalias_ingredient_id", table_name="ingredientalias")
+    op.drop_table("ingredientalias")
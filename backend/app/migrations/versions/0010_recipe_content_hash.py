@@ -0,0 +1,27 @@
+"""recipe: content_hash column with a unique index (idempotent uploads and imports).
+
+Existing rows keep NULL (NULLs never collide in the unique index); fill them with
+`python -m app.cli backfill recipe_content_hash`, which leaves NULL on rows duplicating an earlier recipe.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("recipe", sa.Column("content_hash", sa.String(), nullable=True))
+    op.create_index("ux_recipe_content_hash", "recipe", ["content_hash"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ux_recipe_content_hash", table_name="recipe")
+    op.drop_column("recipe", "content_hash")
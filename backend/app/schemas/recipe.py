@@ -1,7 +1,25 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class RecipeUploadResponse(BaseModel):
     recipes_created: int
     ingredients_created: int
-    sku_jobs_enqueued: int
+    sku_jobs_enqueued: int  # unique (ingredient, postal code) fetches queued
+    sku_jobs_coalesced: int = 0  # fetch requests dropped: same job already pending (this or another upload)
+    # Recipes whose content hash was already stored (or repeated within the upload): not re-ingested
+    duplicates_skipped: int = 0
+    skipped_recipes: list[dict] = []  # name, source_file, recipe_id of the existing copy (None: same upload)
+    # Upload-wide ingredient line dedupe: each distinct line is resolved (LLM match + normalize) once
+    ingredient_lines: int = 0
+    unique_ingredient_lines: int = 0
+    alias_hits: int = 0  # distinct lines answered by the ingredientalias table (no LLM)
+    lexical_matches: int = 0  # distinct lines matched to an existing ingredient by name (no match LLM call)
+    resolutions_saved: int = 0  # line occurrences answered by the upload memo or an alias instead of resolving
+    pipeline: dict = {}  # per-stage throughput and queue depth (IngestionPipeline.stats())
+
+
+class CookWithRequest(BaseModel):
+    ingredient_ids: list[int] = []
+    ingredient_names: list[str] = []  # canonical names, matched case-insensitively
+    max_missing: int | None = None
+    limit: int = Field(default=20, ge=1, le=200)
@@ -0,0 +1,252 @@
+"""
+Ingredient-line resolution for recipe ingestion (upload endpoints and the bulk import CLI).
+
+Recipes repeat the same lines constantly ("salt to taste", "2 cloves garlic, minced"). The resolver
+keys lines by their normalized text, resolves each distinct line once (LLM match + unit normalization,
+in parallel) and memoizes the result for the rest of the upload or import, so every later occurrence
+is free. Uploads collect every line across all files first and resolve them in one pass.
+
+With an IngredientAliasStore the memo is also persistent: distinct lines are looked up in the
+ingredientalias table first (valid only for the current match/normalize prompt versions), and fresh LLM
+resolutions are written back once their canonical ingredient exists, so re-ingesting known lines costs
+no LLM calls at all.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Tuple
+
+from sqlmodel import Session
+
+from app.config import settings
+from app.logging import get_logger
+from app.services.llm.ingredient_matcher import match_ingredient
+from app.services.llm.prompts import INGREDIENT_MATCH_PROMPT_VERSION, UNIT_NORMALIZE_PROMPT_VERSION
+from app.services.llm.unit_normalizer import normalize_units
+from app.services.parsing.lexical_matcher import LEXICAL_RULES_VERSION
+from app.services.parsing.quantity_parser import UNIT_GRAMMAR_VERSION
+from app.storage.repositories import (
+    get_ingredient_aliases,
+    record_ingredient_alias_hits,
+    upsert_ingredient_aliases,
+)
+from app.utils.counters import Counters, ratio
+
+logger = get_logger(__name__)
+
+# (ingredient_text, existing canonical names) -> (match, normalized), as returned by match_and_normalize
+ResolveFn = Callable[[str, list[str]], Tuple[dict, dict]]
+
+# Aliases are valid only for the prompts (and lexical/unit rules) that produced them; bumping any version invalidates them
+ALIAS_PROMPT_VERSION = (
+    f"match:{INGREDIENT_MATCH_PROMPT_VERSION}+{LEXICAL_RULES_VERSION}"
+    f"/normalize:{UNIT_NORMALIZE_PROMPT_VERSION}+{UNIT_GRAMMAR_VERSION}"
+)
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_line(text: str) -> str:
+    """Dedupe key for an ingredient line: lowercased, whitespace collapsed, trailing punctuation dropped."""
+    return _WS.sub(" ", (text or "").strip().lower()).rstrip(" .,;")
+
+
+def match_and_normalize(ingredient_text: str, existing_names: list[str]) -> Tuple[dict, dict]:
+    match = match_ingredient(ingredient_text, existing_names)
+    canonical_name = (match.get("canonical_name") or "").strip().lower() or "unknown"
+    normalized = normalize_units(ingredient_text, canonical_name=canonical_name)
+    return match, normalized
+
+
+def canonical_name_of(match: dict) -> str:
+    return (match.get("canonical_name") or "").strip().lower() or "unknown"
+
+
+class AliasMetrics(Counters):
+    """Process-wide ingredientalias lookup counters (exposed in GET /api/utilization)."""
+
+    def __init__(self) -> None:
+        super().__init__("lookups", "hits", "stale", "written")
+
+    def stats(self) -> dict:
+        counts = self.snapshot()
+        return {
+            **counts,
+            "hit_rate": ratio(counts["hits"], counts["lookups"]),
+            "prompt_version": ALIAS_PROMPT_VERSION,
+        }
+
+
+alias_metrics = AliasMetrics()
+
+
+class IngredientAliasStore:
+    """ingredientalias-backed lookups and write-back for one session (not thread-safe; use from the caller's thread)."""
+
+    def __init__(self, session: Session, prompt_version: str = ALIAS_PROMPT_VERSION, record_hits: bool = True) -> None:
+        self.session = session
+        self.prompt_version = prompt_version
+        # False: lookups only read; the caller records hits itself (record_ingredient_alias_hits)
+        self.record_hits = record_hits
+
+    def lookup(self, keys: Iterable[str]) -> dict[str, Tuple[dict, dict]]:
+        """alias_key -> (match, normalized) for current-version aliases. Counts hits; does not commit."""
+        keys = list(keys)
+        found: dict[str, Tuple[dict, dict]] = {}
+        stale = 0
+        for alias, canonical_name in get_ingredient_aliases(self.session, keys):
+            if alias.prompt_version != self.prompt_version:
+                stale += 1
+                continue
+            found[alias.alias_key] = (
+                {"decision": "existing", "canonical_name": canonical_name, "rationale": "alias"},
+                {
+                    "base_unit": alias.base_unit,
+                    "base_unit_qty": alias.base_unit_qty,
+                    "normalized_qty": alias.normalized_qty,
+                    "normalized_unit": alias.normalized_unit,
+                },
+            )
+        if found and self.record_hits:
+            record_ingredient_alias_hits(self.session, found)
+        alias_metrics.record(lookups=len(keys), hits=len(found), stale=stale)
+        return found
+
+    def save(self, resolutions: dict[str, Tuple[dict, dict]], ingredients: dict) -> int:
+        """
+        Persist fresh resolutions (alias_key -> (match, normalized)) whose canonical name is in
+        ingredients (canonical_name -> Ingredient). Does not commit.
+        """
+        rows = []
+        for key, (match, normalized) in resolutions.items():
+            ingredient = ingredients.get(canonical_name_of(match))
+            if ingredient is None:
+                continue
+            rows.append({
+                "alias_key": key,
+                "ingredient_id": ingredient.id,
+                "normalized_qty": normalized["normalized_qty"],
+                "normalized_unit": normalized["normalized_unit"],
+                "base_unit": (normalized.get("base_unit") or "count").strip().lower(),
+                "base_unit_qty": normalized.get("base_unit_qty", 1.0),
+                "prompt_version": self.prompt_version,
+            })
+        written = upsert_ingredient_aliases(self.session, rows)
+        alias_metrics.record(written=written)
+        return written
+
+
+class IngredientLineResolver:
+    """
+    Memoizing, deduplicating front end to an ingredient resolve function.
+
+    existing_names is shared with the caller, which appends canonical names as it creates them so
+    later LLM calls can match against them. With alias_store, distinct lines are looked up there before
+    the resolve function; LLM results accumulate in `fresh` until the caller saves them
+    (save_aliases) after creating their ingredients.
+    """
+
+    def __init__(
+        self,
+        existing_names: list[str],
+        resolve_fn: ResolveFn | None = None,
+        max_workers: int | None = None,
+        on_resolved: Callable[[int, int], None] | None = None,
+        alias_store: IngredientAliasStore | None = None,
+    ) -> None:
+        self.existing_names = existing_names
+        self._resolve_fn = resolve_fn or match_and_normalize
+        self.max_workers = max(1, max_workers or settings.ingredient_batch_max_workers)
+        # Called as on_resolved(done, pending_total) after each distinct line (progress reporting)
+        self._on_resolved = on_resolved
+        self.alias_store = alias_store
+        self._memo: dict[str, Tuple[dict, dict]] = {}
+        self.fresh: dict[str, Tuple[dict, dict]] = {}
+        self._alias_hit_keys: list[str] = []
+        self.lines = 0
+        self.unique = 0
+        self.memo_hits = 0
+        self.alias_hits = 0
+        self.resolved = 0
+        self.lexical = 0
+        self.failed = 0
+
+    def resolve(self, lines: Iterable[str]) -> dict[str, Tuple[dict, dict]]:
+        """
+        Map each line (original text) to (match, normalized). Lines whose resolution failed are
+        omitted, as in the upload endpoints.
+        """
+        lines = list(lines)
+        self.lines += len(lines)
+        pending: dict[str, str] = {}
+        for line in lines:
+            key = normalize_line(line)
+            if key not in self._memo:
+                pending.setdefault(key, line)
+        self.memo_hits += len(lines) - len(pending)
+        self.unique += len(pending)
+        if pending and self.alias_store is not None:
+            known = self.alias_store.lookup(pending)
+            self._memo.update(known)
+            self.alias_hits += len(known)
+            if not self.alias_store.record_hits:
+                self._alias_hit_keys.extend(known)
+            pending = {key: text for key, text in pending.items() if key not in known}
+        if pending:
+            self._resolve_pending(pending)
+        out = {}
+        for line in lines:
+            result = self._memo.get(normalize_line(line))
+            if result is not None:
+                out[line] = result
+        return out
+
+    def _resolve_pending(self, pending: dict[str, str]) -> None:
+        existing = list(self.existing_names)
+        workers = min(self.max_workers, len(pending))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = {ex.submit(self._resolve_fn, text, existing): key for key, text in pending.items()}
+            for done, fut in enumerate(as_completed(futures), start=1):
+                key = futures[fut]
+                try:
+                    self._memo[key] = fut.result()
+                    if str(self._memo[key][0].get("rationale", "")).startswith("lexical:"):
+                        self.lexical += 1  # matched by the lexical resolver, not the LLM
+                    if self.alias_store is not None:
+                        self.fresh[key] = self._memo[key]
+                    self.resolved += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning("ingredient.parse_failed text=%s error=%s", pending[key], e)
+                if self._on_resolved is not None:
+                    self._on_resolved(done, len(pending))
+
+    def save_aliases(self, ingredients: dict) -> int:
+        """Write fresh LLM resolutions to the alias store (canonical_name -> Ingredient). Does not commit."""
+        if self.alias_store is None or not self.fresh:
+            return 0
+        return self.alias_store.save(self.take_fresh(), ingredients)
+
+    def take_fresh(self) -> dict[str, Tuple[dict, dict]]:
+        """Hand over fresh LLM resolutions (alias_key -> (match, normalized)) for the caller to save."""
+        fresh, self.fresh = self.fresh, {}
+        return fresh
+
+    def take_alias_hits(self) -> list[str]:
+        """Hand over alias keys answered by the store since the last call (for deferred hit recording)."""
+        keys, self._alias_hit_keys = self._alias_hit_keys, []
+        return keys
+
+    def stats(self) -> dict:
+        return {
+            "lines": self.lines,
+            "unique_lines": self.unique,
+            "unique_resolved": self.resolved,
+            "lexical_matches": self.lexical,
+            "memo_hits": self.memo_hits,
+            "alias_hits": self.alias_hits,
+            "failed": self.failed,
+            # Line resolutions skipped (memo or alias); how many LLM calls each would have made varies with the
+            # lexical / unit fast paths, see lexical_matches and GET /api/utilization
+            "resolutions_saved": self.memo_hits + self.alias_hits,
+        }
@@ -0,0 +1,517 @@
+"""
+Streaming recipe ingestion shared by POST /recipes/upload (SSE) and POST /recipes/upload/sync.
+
+    parse -> resolve (canonicalize + normalize) -> allergen -> persist -> sku_enqueue
+
+Each stage runs on its own thread(s) and hands recipes to the next through a bounded queue, so LLM
+resolution of later recipes overlaps allergen inference and DB writes of earlier ones, across files.
+A full queue blocks its producer (backpressure) instead of buffering the whole upload.
+
+- Canonicalization and unit normalization are one stage: normalize_units needs the canonical name, and
+  both results are deduplicated, memoized and aliased together per line (IngredientLineResolver). The
+  stage drains up to resolve_batch recipes at a time and resolves their distinct lines in one parallel
+  pass; the memo spans the upload, so repeated lines still cost one resolution.
+- Allergens depend only on canonical names, so they are inferred before persist and written with the
+  recipe row. Persist is the only stage that writes: one session, one transaction per chunk of up to
+  write_batch queued recipes (bulk inserts, ids via RETURNING), so a slow writer batches more per commit.
+  The resolve stage only reads aliases and hands their hit counts to persist.
+- Uploads are idempotent: each recipe is hashed at parse time (recipe_content_hash) and the resolve stage
+  drops recipes whose hash is already stored or was seen earlier in the upload, before any LLM call.
+  A concurrent upload of the same recipe that wins the race trips ux_recipe_content_hash in persist,
+  and the loser is counted as skipped too.
+
+- SKU fetches go through a SkuEnqueuer: each chunk's targets are flushed together, repeats within the
+  upload and jobs already queued by other uploads are coalesced.
+
+stats() reports per-stage throughput, busy time and queue depth.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Iterable
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.config import settings
+from app.logging import get_logger
+from app.services.ingestion import IngredientAliasStore, IngredientLineResolver, ResolveFn, canonical_name_of, normalize_line
+from app.services.parsing.recipe_parser import ParsedRecipe, infer_meal_type, parse_recipe_text, recipe_content_hash
+from app.storage.db import get_session
+from app.storage.recipe_search import refresh_recipe_search_vectors
+from app.storage.repositories import (
+    bulk_insert_recipe_ingredients,
+    bulk_insert_recipes,
+    delete_skus_for_ingredients,
+    get_ingredients,
+    get_or_create_ingredients,
+    get_recipe_ids_by_content_hash,
+    record_ingredient_alias_hits,
+)
+from app.workers.sku_enqueue import SkuEnqueuer
+
+logger = get_logger(__name__)
+
+# Base units the normalizer may switch an existing ingredient to (repairing stale rows)
+REPAIRABLE_BASE_UNITS = ("g", "ml", "count", "tbsp", "tsp")
+
+_DONE = object()
+
+
+@dataclass
+class IngestItem:
+    """One recipe moving through the pipeline."""
+
+    file_idx: int
+    source_name: str
+    parsed: ParsedRecipe
+    content_hash: str = ""
+    results: dict = field(default_factory=dict)  # ingredient line -> (match, normalized)
+    fresh: dict = field(default_factory=dict)  # alias_key -> resolution to save as an alias
+    alias_hits: list[str] = field(default_factory=list)  # alias keys that answered this recipe's lines
+    ingredient_names: list[str] = field(default_factory=list)
+    allergens: list[str] = field(default_factory=list)
+    recipe_id: int | None = None
+    sku_targets: list[tuple[int, str]] = field(default_factory=list)  # (ingredient_id, canonical_name)
+
+
+class _Stage:
+    def __init__(self, name: str, fn: Callable[[list], list], workers: int, batch_size: int, capacity: int):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.inbox: queue.Queue = queue.Queue(maxsize=capacity)
+        self.downstream: "_Stage | None" = None
+        self.lock = threading.Lock()
+        self.active = workers
+        self.processed = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.max_depth = 0
+
+    def put(self, item) -> None:
+        self.inbox.put(item)  # blocks while this stage is backlogged
+        depth = self.inbox.qsize()
+        with self.lock:
+            self.max_depth = max(self.max_depth, depth)
+
+    def take(self) -> tuple[list, bool]:
+        """Block for one item, then take whatever else is ready up to batch_size. Returns (items, done)."""
+        first = self.inbox.get()
+        if first is _DONE:
+            return [], True
+        items = [first]
+        while len(items) < self.batch_size:
+            try:
+                nxt = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is _DONE:
+                return items, True
+            items.append(nxt)
+        return items, False
+
+    def stats(self, elapsed_s: float) -> dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "processed": self.processed,
+                "errors": self.errors,
+                "busy_s": round(self.busy_s, 3),
+                "per_s": round(self.processed / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+                "queue_depth": self.inbox.qsize(),
+                "queue_max_depth": self.max_depth,
+                "queue_capacity": self.inbox.maxsize,
+            }
+
+
+class IngestionPipeline:
+    """
+    Run one upload through the stages. Collaborators are injected so each endpoint keeps its own
+    (patchable) entry points: resolve_fn (line, existing names -> (match, normalized)), allergen_fn
+    (canonical names -> allergen codes) and sku_enqueuer (SkuEnqueuer: coalesces repeated (ingredient,
+    postal code) jobs, within the upload and against jobs already queued, and submits in batches).
+
+    enqueue_existing=True enqueues a SKU fetch for every linked line (the SSE upload tracks SKU coverage
+    per file); otherwise only for new and base-unit-repaired ingredients. Callbacks run on stage
+    threads: on_resolved(done, total) per distinct line resolved, on_ingredient(item, canonical_name,
+    ingredient_id) per linked line, on_skipped(item, recipe_id) per recipe dropped as a duplicate of
+    recipe_id (None when it duplicates an earlier recipe of the same upload).
+    """
+
+    def __init__(
+        self,
+        resolve_fn: ResolveFn,
+        allergen_fn: Callable[[list[str]], list[str]],
+        sku_enqueuer: SkuEnqueuer,
+        postal_code: str,
+        enqueue_existing: bool = False,
+        on_resolved: Callable[[int, int], None] | None = None,
+        on_ingredient: Callable[[IngestItem, str, int], None] | None = None,
+        on_skipped: Callable[[IngestItem, int | None], None] | None = None,
+        session_factory: Callable[[], Session] | None = None,
+        queue_size: int | None = None,
+        resolve_batch: int | None = None,
+        allergen_workers: int | None = None,
+        write_batch: int | None = None,
+    ) -> None:
+        self.resolve_fn = resolve_fn
+        self.allergen_fn = allergen_fn
+        self.sku_enqueuer = sku_enqueuer
+        self.postal_code = postal_code
+        self.enqueue_existing = enqueue_existing
+        self.on_resolved = on_resolved
+        self.on_ingredient = on_ingredient
+        self.on_skipped = on_skipped
+        self._session_factory = session_factory or get_session
+        self.queue_size = max(1, queue_size or settings.ingestion_queue_size)
+        self.resolve_batch = max(1, resolve_batch or settings.ingestion_resolve_batch)
+        self.allergen_workers = max(1, allergen_workers or settings.ingestion_allergen_workers)
+        self.write_batch = max(1, write_batch or settings.ingestion_write_batch)
+        self.resolver: IngredientLineResolver | None = None
+        self.files = 0
+        self.recipes_parsed = 0
+        self.recipes_created = 0
+        self.skipped: list[dict] = []  # duplicate recipes: name, source_file, recipe_id
+        self.ingredients_created = 0
+        self.writes = 0  # persist transactions committed
+        self.elapsed_s = 0.0
+        self._stages: list[_Stage] = []
+        self._started = 0.0
+        self._read_session: Session | None = None
+        self._seen_hashes: set[str] = set()
+        self._skip_lock = threading.Lock()
+
+    def run(self, files: Iterable[tuple[bytes, str]]) -> "IngestionPipeline":
+        """Ingest (content, source_name) files. Parses on the caller's thread; returns once every stage has drained."""
+        self._started = time.perf_counter()
+        with self._session_factory() as session, self._session_factory() as alias_session:
+            self._read_session = alias_session
+            existing = {ing.canonical_name: ing for ing in get_ingredients(session)}
+            self.resolver = IngredientLineResolver(
+                list(existing),
+                resolve_fn=self.resolve_fn,
+                on_resolved=self.on_resolved,
+                alias_store=IngredientAliasStore(alias_session, record_hits=False),
+            )
+            self._stages = [
+                _Stage("resolve", self._resolve, 1, self.resolve_batch, self.queue_size),
+                _Stage("allergen", self._allergens, self.allergen_workers, 1, self.queue_size),
+                _Stage("persist", _Persist(self, session, existing), 1, self.write_batch, self.queue_size),
+                _Stage("sku_enqueue", self._enqueue, 1, self.queue_size, self.queue_size),
+            ]
+            for upstream, downstream in zip(self._stages, self._stages[1:]):
+                upstream.downstream = downstream
+            threads = [
+                threading.Thread(target=self._work, args=(stage,), name=f"ingest-{stage.name}", daemon=True)
+                for stage in self._stages
+                for _ in range(stage.workers)
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                self._parse(files)
+            finally:
+                self._stages[0].put(_DONE)
+                for thread in threads:
+                    thread.join()
+        self.elapsed_s = time.perf_counter() - self._started
+        logger.info(
+            "ingest.pipeline.end files=%s recipes=%s duplicates_skipped=%s ingredients_created=%s sku_jobs=%s "
+            "sku_jobs_coalesced=%s elapsed_s=%.2f stages=%s",
+            self.files,
+            self.recipes_created,
+            self.duplicates_skipped,
+            self.ingredients_created,
+            self.sku_jobs,
+            self.sku_jobs_coalesced,
+            self.elapsed_s,
+            self.stats()["stages"],
+        )
+        return self
+
+    @property
+    def sku_jobs(self) -> int:
+        """SKU fetches actually queued (unique per ingredient and postal code)."""
+        return self.sku_enqueuer.enqueued
+
+    @property
+    def sku_jobs_coalesced(self) -> int:
+        """SKU fetch requests dropped because the same job was already pending."""
+        return self.sku_enqueuer.coalesced
+
+    @property
+    def duplicates_skipped(self) -> int:
+        return len(self.skipped)
+
+    def stats(self) -> dict:
+        elapsed = self.elapsed_s or (time.perf_counter() - self._started if self._started else 0.0)
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "files": self.files,
+            "recipes_parsed": self.recipes_parsed,
+            "write_transactions": self.writes,
+            "stages": {stage.name: stage.stats(elapsed) for stage in self._stages},
+        }
+
+    def dedupe_stats(self) -> dict:
+        """IngredientLineResolver stats for the upload (lines, unique_lines, alias_hits, resolutions_saved, ...)."""
+        return self.resolver.stats() if self.resolver is not None else {}
+
+    # -- stages ---------------------------------------------------------------------------------
+
+    def _parse(self, files: Iterable[tuple[bytes, str]]) -> None:
+        for file_idx, (content, source_name) in enumerate(files):
+            self.files += 1
+            try:
+                recipes = parse_recipe_text(content.decode("utf-8"))
+            except Exception as e:
+                logger.warning("ingest.parse_failed source=%s error=%s", source_name, e)
+                continue
+            for parsed in recipes:
+                self.recipes_parsed += 1
+                self._stages[0].put(IngestItem(file_idx, source_name, parsed, recipe_content_hash(parsed)))
+
+    def _skip(self, item: IngestItem, recipe_id: int | None) -> None:
+        with self._skip_lock:
+            self.skipped.append({"name": item.parsed.name, "source_file": item.source_name, "recipe_id": recipe_id})
+        logger.info("ingest.duplicate recipe=%s source=%s existing_id=%s", item.parsed.name, item.source_name, recipe_id)
+        if self.on_skipped is not None:
+            self.on_skipped(item, recipe_id)
+
+    def _drop_known(self, items: list[IngestItem]) -> list[IngestItem]:
+        """Skip recipes already stored or already seen in this upload (before any LLM call)."""
+        known = get_recipe_ids_by_content_hash(self._read_session, (item.content_hash for item in items))
+        fresh = []
+        for item in items:
+            if item.content_hash in known:
+                self._skip(item, known[item.content_hash])
+            elif item.content_hash in self._seen_hashes:
+                self._skip(item, None)
+            else:
+                self._seen_hashes.add(item.content_hash)
+                fresh.append(item)
+        return fresh
+
+    def _resolve(self, items: list[IngestItem]) -> list[IngestItem]:
+        items = self._drop_known(items)
+        if not items:
+            return []
+        results = self.resolver.resolve(line for item in items for line in item.parsed.ingredients)
+        fresh = self.resolver.take_fresh()
+        hits = set(self.resolver.take_alias_hits())
+        for item in items:
+            item.results = {line: results[line] for line in item.parsed.ingredients if line in results}
+            for line in item.results:
+                key = normalize_line(line)
+                if key in fresh:
+                    item.fresh[key] = fresh.pop(key)
+                elif key in hits:
+                    hits.discard(key)
+                    item.alias_hits.append(key)
+        return items
+
+    def _allergens(self, items: list[IngestItem]) -> list[IngestItem]:
+        for item in items:
+            item.ingredient_names = [
+                canonical_name_of(item.results[line][0]) for line in item.parsed.ingredients if line in item.results
+            ]
+            item.allergens = self.allergen_fn(item.ingredient_names)
+        return items
+
+    def _enqueue(self, items: list[IngestItem]) -> list[IngestItem]:
+        for item in items:
+            for ingredient_id, canonical_name in item.sku_targets:
+                self.sku_enqueuer.add(ingredient_id, canonical_name, self.postal_code)
+        self.sku_enqueuer.flush()
+        return []
+
+    # -- plumbing -------------------------------------------------------------------------------
+
+    def _work(self, stage: _Stage) -> None:
+        while True:
+            items, done = stage.take()
+            if items:
+                start = time.perf_counter()
+                try:
+                    out = stage.fn(items)
+                except Exception as e:
+                    out = []
+                    with stage.lock:
+                        stage.errors += len(items)
+                    logger.warning("ingest.stage_failed stage=%s items=%s error=%s", stage.name, len(items), e)
+                with stage.lock:
+                    stage.processed += len(items)
+                    stage.busy_s += time.perf_counter() - start
+                for item in out:
+                    stage.downstream.put(item)
+            if done:
+                with stage.lock:
+                    stage.active -= 1
+                    last = stage.active == 0
+                if not last:
+                    stage.inbox.put(_DONE)  # let sibling workers see the end of input
+                elif stage.downstream is not None:
+                    stage.downstream.put(_DONE)
+                return
+
+
+class _Persist:
+    """
+    Persist stage as a unit of work: one transaction per chunk of recipes (whatever is queued, up to
+    write_batch). New canonical ingredients go in with one get_or_create_ingredients, recipes and links as
+    executemany INSERTs (ids via RETURNING), base-unit repairs, aliases and alias hits in the same transaction.
+    In-memory state (known ingredients, counters, on_ingredient callbacks) is applied only after the commit.
+    A failed chunk is rolled back and retried recipe by recipe, so one bad or concurrently stored recipe
+    does not drop the rest.
+    """
+
+    def __init__(self, pipeline: IngestionPipeline, session: Session, existing: dict) -> None:
+        self.pipeline = pipeline
+        self.session = session
+        self.existing = existing
+
+    def __call__(self, items: list[IngestItem]) -> list[IngestItem]:
+        try:
+            return self._write(items)
+        except Exception as e:
+            self.session.rollback()
+            if len(items) > 1:
+                logger.info("ingest.persist_chunk_retry recipes=%s error=%s", len(items), e)
+                return [out for item in items for out in self([item])]
+            item = items[0]
+            if isinstance(e, IntegrityError):
+                # Another upload stored the same recipe after the resolve stage checked its hash
+                known = get_recipe_ids_by_content_hash(self.session, [item.content_hash])
+                if item.content_hash in known:
+                    self.pipeline._skip(item, known[item.content_hash])
+                    return []
+            logger.warning("ingest.persist_failed recipe=%s error=%s", item.parsed.name, e)
+            return []
+
+    def _write(self, items: list[IngestItem]) -> list[IngestItem]:
+        session, pipeline = self.session, self.pipeline
+
+        # Create all new canonical names for the chunk in one race-free batch
+        new_rows: dict[str, dict] = {}
+        for item in items:
+            for match, normalized in item.results.values():
+                canonical_name = canonical_name_of(match)
+                if canonical_name not in self.existing and canonical_name not in new_rows:
+                    new_rows[canonical_name] = {
+                        "name": canonical_name,
+                        "canonical_name": canonical_name,
+                        "base_unit": (normalized.get("base_unit") or "count").strip().lower(),
+                        "base_unit_qty": normalized.get("base_unit_qty", 1.0),
+                    }
+        resolved: dict = {}
+        just_created: set[str] = set()
+        if new_rows:
+            resolved, just_created = get_or_create_ingredients(session, list(new_rows.values()), commit=False)
+        ingredients = {**self.existing, **resolved}
+        to_enqueue = set(just_created)  # new ingredients get a SKU fetch (concurrent ones by their own upload)
+
+        now = datetime.utcnow()
+        recipe_ids = bulk_insert_recipes(
+            session,
+            [
+                {
+                    "name": item.parsed.name,
+                    "servings": item.parsed.servings,
+                    "instructions": item.parsed.instructions,
+                    "source_file": item.source_name,
+                    "meal_type": infer_meal_type(item.parsed.name, item.parsed.instructions),
+                    "allergens": item.allergens,
+                    "content_hash": item.content_hash,
+                    "created_at": now,
+                }
+                for item in items
+            ],
+        )
+
+        link_rows: list[dict] = []
+        linked: list[tuple[IngestItem, str, int]] = []
+        repaired: list[tuple[str, str, str, int]] = []
+        for item, recipe_id in zip(items, recipe_ids):
+            sku_targets = []
+            for ingredient_text in item.parsed.ingredients:
+                if ingredient_text not in item.results:
+                    continue
+                match, normalized = item.results[ingredient_text]
+                canonical_name = canonical_name_of(match)
+                ingredient = ingredients[canonical_name]
+                if canonical_name in to_enqueue:
+                    to_enqueue.discard(canonical_name)
+                    enqueue = True
+                else:
+                    repair = self._repair_base_unit(ingredient, canonical_name, normalized)
+                    if repair is not None:
+                        repaired.append(repair)
+                    enqueue = repair is not None or pipeline.enqueue_existing
+                if enqueue:
+                    sku_targets.append((ingredient.id, canonical_name))
+                link_rows.append({
+                    "recipe_id": recipe_id,
+                    "ingredient_id": ingredient.id,
+                    "quantity": normalized["normalized_qty"],
+                    "unit": normalized["normalized_unit"],
+                    "original_text": ingredient_text,
+                })
+                linked.append((item, canonical_name, ingredient.id))
+            item.sku_targets = sku_targets
+
+        bulk_insert_recipe_ingredients(session, link_rows)
+        linked_ids = {row["recipe_id"] for row in link_rows}
+        refresh_recipe_search_vectors(session, [rid for rid in recipe_ids if rid not in linked_ids])
+        # Remember fresh resolutions so re-uploads of these lines skip the LLM
+        fresh = {key: resolution for item in items for key, resolution in item.fresh.items()}
+        if fresh:
+            IngredientAliasStore(session).save(fresh, ingredients)
+        alias_hits = [key for item in items for key in item.alias_hits]
+        if alias_hits:
+            record_ingredient_alias_hits(session, alias_hits)
+        session.commit()
+
+        # Committed: publish the new ingredients and recipes
+        for canonical_name, ingredient in resolved.items():
+            self.existing[canonical_name] = ingredient
+            pipeline.resolver.existing_names.append(canonical_name)
+        for canonical_name in sorted(just_created):
+            logger.info("ingredient.created id=%s name=%s", resolved[canonical_name].id, canonical_name)
+        for canonical_name, old, new, deleted in repaired:
+            logger.info(
+                "ingredient.base_unit.repair name=%s old=%s new=%s deleted_skus=%s", canonical_name, old, new, deleted
+            )
+        for item, recipe_id in zip(items, recipe_ids):
+            item.recipe_id = recipe_id
+        pipeline.recipes_created += len(items)
+        pipeline.ingredients_created += len(just_created)
+        pipeline.writes += 1
+        logger.info(
+            "ingest.persist_chunk recipes=%s links=%s ingredients_created=%s",
+            len(items),
+            len(link_rows),
+            len(just_created),
+        )
+        if pipeline.on_ingredient is not None:
+            for item, canonical_name, ingredient_id in linked:
+                pipeline.on_ingredient(item, canonical_name, ingredient_id)
+        return items
+
+    def _repair_base_unit(self, ingredient, canonical_name: str, normalized: dict) -> tuple | None:
+        """
+        Switch a stale base_unit to the normalizer's and drop its SKUs (uncommitted).
+        Returns (canonical_name, old, new, deleted_skus) when repaired.
+        """
+        new_base = (normalized.get("base_unit") or "count").strip().lower()
+        cur = (ingredient.base_unit or "").strip().lower()
+        if new_base not in REPAIRABLE_BASE_UNITS or cur == new_base:
+            return None
+        ingredient.base_unit = new_base
+        self.session.add(ingredient)
+        deleted = delete_skus_for_ingredients(self.session, [ingredient.id], commit=False)
+        return canonical_name, cur, new_base, deleted
@@ -5,8 +5,7 @@ import dspy
 
 from app.config import settings
 from app.logging import get_logger
-from app.storage.db import get_session
-from app.storage.repositories import log_llm_call
+from app.storage.llm_log_sink import llm_call_log_sink
 from app.utils.timing import _format_duration
 
 logger = get_logger(__name__)
@@ -68,16 +67,15 @@ def _run_llm_call(
         if prev_lm is not None:
             dspy.settings.configure(lm=prev_lm, trace=getattr(dspy.settings, "trace", []))
     latency_ms = int((time.time() - start) * 1000)
-    with get_session() as session:
-        log_llm_call(
-            session=session,
-            prompt_name=prompt_name,
-            prompt_version=prompt_version,
-            model=model,
-            input_payload=str(kwargs),
-            output_payload=str(result),
-            latency_ms=latency_ms,
-        )
+    # Write-behind: the row is persisted by the sink's flusher thread, not on this call's path
+    llm_call_log_sink.submit(
+        prompt_name=prompt_name,
+        prompt_version=prompt_version,
+        model=model,
+        input_kwargs=kwargs,
+        output_payload=str(result),
+        latency_ms=latency_ms,
+    )
     _log_last_prompt(prompt_name)
     logger.info(
         "[TIMING] llm.call.end name=%s latency_ms=%s (%s)",
@@ -9,6 +9,35 @@ from app.services.llm.ingredient_retrieval import (
     INGREDIENT_RETRIEVAL_TOP_K,
     retrieve_similar_ingredients,
 )
+from app.services.parsing.lexical_matcher import lexical_match
+from app.utils.counters import Counters, ratio
+
+
+class MatchDecisionMetrics(Counters):
+    """Process-wide match_ingredient decisions: lexical shortcut (by rule) vs LLM (exposed in GET /api/utilization)."""
+
+    def __init__(self) -> None:
+        super().__init__("llm")
+
+    def record_lexical(self, rule: str) -> None:
+        self.record(**{f"lexical:{rule}": 1})
+
+    def record_llm(self) -> None:
+        self.record(llm=1)
+
+    def stats(self) -> dict:
+        counts = self.snapshot()
+        by_rule = {name.split(":", 1)[1]: n for name, n in counts.items() if name.startswith("lexical:")}
+        lexical = sum(by_rule.values())
+        return {
+            "lexical": lexical,
+            "lexical_by_rule": by_rule,
+            "llm": counts["llm"],
+            "lexical_rate": ratio(lexical, lexical + counts["llm"]),
+        }
+
+
+match_metrics = MatchDecisionMetrics()
 
 
 def _parse_bullet_block(text: str) -> dict:
@@ -86,6 +115,12 @@ class IngredientMatcher(dspy.Module):
 
 
 def match_ingredient(ingredient_text: str, existing_ingredients: List[str]) -> dict:
+    # Lexical shortcut: the line names an existing ingredient (exact, plural or synonym) -> no LLM call
+    lexical = lexical_match(ingredient_text, existing_ingredients)
+    if lexical is not None:
+        match_metrics.record_lexical(lexical["rationale"].split(":", 1)[1])
+        return lexical
+    match_metrics.record_llm()
     # Hybrid: if too many existing ingredients, retrieve top-k by similarity to reduce context
     if len(existing_ingredients) > INGREDIENT_MATCH_FULL_CONTEXT_THRESHOLD:
         existing_ingredients = retrieve_similar_ingredients(
@@ -124,3 +124,14 @@ Diagnose the error. Common causes: (1) weight/volume given but treated as count
 Output JSON only:
 {{"diagnosis": "brief explanation", "corrections": [{{"type": "ingredient"|"recipe_ingredient"|"sku", "id": <int>, "quantity"?: <float>, "unit"?: "<str>", "base_unit"?: "<str>", "quantity_in_base_unit"?: <float>}}]}}
 For recipe_ingredient use "recipe_ingredient_id" to avoid confusion. Omit corrections array if no fix needed."""
+
+# Static prompt context: stored once in promptblob (content-addressed) and referenced by hash from
+# llmcalllog rows, so the ontology and template text are not repeated on every logged call.
+STATIC_PROMPT_TEMPLATES = (
+    UNIT_NORMALIZE_TEMPLATE,
+    SKU_SIZE_TEMPLATE,
+    INGREDIENT_MATCH_TEMPLATE,
+    SKU_FILTER_TEMPLATE,
+    OVERSEER_TEMPLATE,
+)
+STATIC_PROMPT_CONTEXT = (UNIT_CONVERSION_ONTOLOGY,)
@@ -1,20 +1,44 @@
 """
 Normalize ingredient quantities to a canonical base unit.
-Single LLM pass: convert directly to base_unit, normalized_qty, normalized_unit.
+Rule-based fast path first (app.services.parsing.quantity_parser); lines it can't parse confidently get a
+single LLM pass that converts directly to base_unit, normalized_qty, normalized_unit.
 """
 
 import re
 
 import dspy
 
+from app.config import settings
+from app.logging import get_logger
 from app.services.llm.dspy_client import run_with_logging
 from app.services.llm.prompts import (
     UNIT_CONVERSION_ONTOLOGY,
     UNIT_NORMALIZE_PROMPT_VERSION,
     UNIT_NORMALIZE_TEMPLATE,
 )
+from app.services.parsing.quantity_parser import ALLOWED_BASE_UNITS, parse_quantity
+from app.utils.counters import Counters, ratio
 
-ALLOWED_BASE_UNITS = ("g", "ml", "count", "tbsp", "tsp")
+logger = get_logger(__name__)
+
+
+class FastPathMetrics(Counters):
+    """Process-wide normalize_units fast-path counters (exposed in GET /api/utilization)."""
+
+    def __init__(self) -> None:
+        super().__init__("fast", "llm")
+
+    def stats(self) -> dict:
+        counts = self.snapshot()
+        return {
+            "fast_path": counts["fast"],
+            "llm_fallback": counts["llm"],
+            "coverage": ratio(counts["fast"], counts["fast"] + counts["llm"]),
+            "min_confidence": settings.unit_fast_path_min_confidence,
+        }
+
+
+fast_path_metrics = FastPathMetrics()
 
 
 def _extract_float(raw: object, default: float) -> float:
@@ -81,7 +105,24 @@ class NormalizeSignature(dspy.Signature):
 def normalize_units(
     ingredient_text: str,
     canonical_name: str = "",
-    target_base_unit: str | None = None,  # optional override; if None, LLM decides
+    target_base_unit: str | None = None,  # optional override; if None, the rules / LLM decide
+) -> dict:
+    """Convert ingredient to base_unit, normalized_qty, normalized_unit; the LLM only for low-confidence parses."""
+    parsed = parse_quantity(ingredient_text, canonical_name, target_base_unit)
+    if parsed.confidence >= settings.unit_fast_path_min_confidence:
+        fast_path_metrics.record(fast=1)
+        logger.debug(
+            "unit_normalize.fast_path text=%s reason=%s confidence=%s", ingredient_text, parsed.reason, parsed.confidence
+        )
+        return parsed.as_normalized()
+    fast_path_metrics.record(llm=1)
+    return normalize_units_llm(ingredient_text, canonical_name, target_base_unit)
+
+
+def normalize_units_llm(
+    ingredient_text: str,
+    canonical_name: str = "",
+    target_base_unit: str | None = None,
 ) -> dict:
     """Single-pass LLM: convert ingredient to base_unit, normalized_qty, normalized_unit."""
     prompt = UNIT_NORMALIZE_TEMPLATE.format(
@@ -0,0 +1,38 @@
+"""Stable fingerprint of a plan request, for plan-history lookup and reuse."""
+
+import hashlib
+import json
+
+from app.schemas.plan import PlanRequest
+
+
+def _norm_slugs(values: list[str] | None) -> list[str] | None:
+    if not values:
+        return None
+    return sorted({v.lower().strip().replace(" ", "-") for v in values if v and v.strip()}) or None
+
+
+def _norm_ids(values: list[int] | None) -> list[int] | None:
+    return sorted(set(values)) if values else None
+
+
+def normalize_plan_request(request: PlanRequest) -> dict:
+    """Canonical form of a PlanRequest: order-insensitive lists, normalized slugs, zero meal counts dropped."""
+    meal_config = {k.strip().lower(): v for k, v in (request.meal_config or {}).items() if v}
+    return {
+        "target_servings": request.target_servings,
+        "postal_code": (request.postal_code or "").strip() or None,
+        "time_limit_seconds": request.time_limit_seconds,
+        "batch_penalty": request.batch_penalty,
+        "meal_config": dict(sorted(meal_config.items())) or None,
+        "include_every_recipe_ids": _norm_ids(request.include_every_recipe_ids),
+        "required_recipe_ids": _norm_ids(request.required_recipe_ids),
+        "store_slugs": _norm_slugs(request.store_slugs),
+        "exclude_allergens": _norm_slugs(request.exclude_allergens),
+    }
+
+
+def plan_request_fingerprint(request: PlanRequest) -> str:
+    """sha256 hex of the normalized request; equal for semantically identical requests."""
+    canonical = json.dumps(normalize_plan_request(request), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -6,6 +6,7 @@ from sqlmodel import Session, select
 
 from app.logging import get_logger
 from app.storage.models import Ingredient, RecipeIngredient, SKU
+from app.storage.repositories import refresh_price_summaries
 
 logger = get_logger(__name__)
 
@@ -16,6 +17,7 @@ def apply_corrections(session: Session, corrections: list[dict]) -> int:
     corrections: [{"type": "ingredient"|"recipe_ingredient"|"sku", "id": int, ...}]
     """
     applied = 0
+    sku_ingredient_ids: set[int] = set()
     for c in corrections:
         ctype = (c.get("type") or "").strip().lower()
         cid = c.get("id")
@@ -52,6 +54,7 @@ def apply_corrections(session: Session, corrections: list[dict]) -> int:
                     try:
                         sku.quantity_in_base_unit = float(c["quantity_in_base_unit"])
                         session.add(sku)
+                        sku_ingredient_ids.add(sku.ingredient_id)
                         applied += 1
                         logger.info("overseer.apply sku id=%s quantity_in_base_unit=%s", cid, sku.quantity_in_base_unit)
                     except (TypeError, ValueError):
@@ -59,5 +62,8 @@ def apply_corrections(session: Session, corrections: list[dict]) -> int:
         except Exception as e:
             logger.warning("overseer.apply_failed type=%s id=%s error=%s", ctype, cid, e)
     if applied:
+        if sku_ingredient_ids:
+            session.flush()
+            refresh_price_summaries(session, list(sku_ingredient_ids))
         session.commit()
     return applied
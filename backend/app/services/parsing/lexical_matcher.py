@@ -0,0 +1,148 @@
+"""
+Lexical canonical-name resolution: the shortcut in front of the match_ingredient LLM call.
+
+An ingredient line is reduced to its name (quantity, unit, parentheticals and prep words like "minced",
+"chopped", "to taste" stripped), then normalized token-wise (lowercase, hyphens to spaces, last word
+singularized). If that key equals the key of an existing canonical name, or of a known synonym of one, the
+line resolves to it without a model call. Synonyms compare keys with prep words kept, so a
+"fresh coriander" line reaches cilantro but plain "coriander" (the seed spice) does not. Some prep words also name a
+product form when they are part of the name ("crushed red pepper" is chili flakes, "crushed tomatoes" is canned);
+those names only match an existing name that carries the same word. Anything else (no match, or only a
+partial/head-noun overlap such as "russet potatoes" vs "potato") is left to the LLM, which decides between existing,
+similar and new.
+"""
+
+import re
+import threading
+from typing import Sequence
+
+from app.services.parsing.quantity_parser import parse_quantity
+
+# Bump when matching rules or synonym groups change (part of the ingredient alias version)
+LEXICAL_RULES_VERSION = "l3"
+
+# Preparation / state words that never change which ingredient a line is
+PREP_WORDS = frozenset(
+    """
+    minced chopped diced sliced grated shredded crushed cubed peeled trimmed halved quartered julienned
+    softened melted beaten whisked rinsed drained packed sifted cooked boneless skinless fresh freshly finely
+    thinly roughly coarsely lightly very and/or optional
+    """.split()
+)
+# Prep words that, left in the name (not split off after a comma), make it a different product
+PRODUCT_FORM_WORDS = frozenset({"crushed", "diced", "cooked", "shredded"})
+_TRAILING_PHRASES = re.compile(r"\s+(?:to taste|as needed|for (?:garnish|serving|frying|drizzling)|if desired)$")
+
+# Interchangeable names; a line naming any member matches an existing ingredient named by another
+SYNONYM_GROUPS = (
+    ("green onion", "scallion", "spring onion"),
+    ("cilantro", "fresh coriander", "coriander leaf"),
+    ("chickpea", "garbanzo bean"),
+    ("zucchini", "courgette"),
+    ("eggplant", "aubergine"),
+    ("powdered sugar", "confectioners sugar", "confectioners' sugar", "icing sugar"),
+    ("extra virgin olive oil", "evoo"),
+    ("bell pepper", "capsicum"),
+    ("arugula", "rocket"),
+    ("heavy cream", "heavy whipping cream", "double cream"),
+)
+
+
+def singularize(word: str) -> str:
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes", "sses")):
+        return word[:-2]
+    if word.endswith("ves"):
+        return word[:-3] + "f"
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def name_key(name: str, singular: bool = True, keep_prep: bool = False) -> str:
+    """Normalized lookup key: lowercase, hyphens/apostrophes folded, prep words dropped, last word singular."""
+    tokens = re.sub(r"[-']", " ", name.lower()).replace(".", " ").split()
+    if not keep_prep:
+        tokens = [t for t in tokens if t not in PREP_WORDS]
+    if tokens and singular:
+        tokens[-1] = singularize(tokens[-1])
+    return " ".join(tokens)
+
+
+# Keyed with prep words kept: "fresh" is what makes "fresh coriander" the leaf rather than the spice
+_SYNONYMS: dict[str, tuple[str, ...]] = {}
+for _group in SYNONYM_GROUPS:
+    _keys = tuple(name_key(n, keep_prep=True) for n in _group)
+    for _key in _keys:
+        _SYNONYMS[_key] = _keys
+
+
+def line_name(ingredient_text: str) -> str:
+    """The ingredient name of a line: quantity, unit, size words, parentheticals and trailing notes removed."""
+    return _TRAILING_PHRASES.sub("", parse_quantity(ingredient_text).name).strip()
+
+
+class _NameIndex:
+    """name_key (and prep-kept synonym key) -> canonical name for one existing-names list (first name wins)."""
+
+    def __init__(self, names: Sequence[str]) -> None:
+        self.names = names
+        self.size = len(names)
+        self.by_key: dict[str, str] = {}
+        self.by_full_key: dict[str, str] = {}
+        for name in names:
+            full_key = name_key(name, keep_prep=True)
+            self.by_full_key.setdefault(full_key, name)
+            # "diced tomatoes" must not catch plain "tomato" lines either
+            if not PRODUCT_FORM_WORDS.intersection(full_key.split()):
+                self.by_key.setdefault(name_key(name), name)
+
+
+_index_lock = threading.Lock()
+_index: _NameIndex | None = None
+
+
+def _index_for(existing: Sequence[str]) -> _NameIndex:
+    # Callers resolve many lines against the same list object; rebuild only when it changes
+    global _index
+    with _index_lock:
+        if _index is None or _index.names is not existing or _index.size != len(existing):
+            _index = _NameIndex(existing)
+        return _index
+
+
+def lexical_match(ingredient_text: str, existing: Sequence[str]) -> dict | None:
+    """
+    match_ingredient-shaped result ({"decision": "existing", "canonical_name", "rationale", ...}) when the line
+    names an existing ingredient exactly, as a plural/singular variant or via a synonym; None otherwise.
+    rationale is "lexical:exact", "lexical:plural" or "lexical:synonym".
+    """
+    name = line_name(ingredient_text)
+    key = name_key(name)
+    if not key or not existing:
+        return None
+    index = _index_for(existing)
+    full_key = name_key(name, keep_prep=True)
+    keep_prep = bool(PRODUCT_FORM_WORDS.intersection(full_key.split()))
+    # A product-form word stays part of the name: "crushed tomatoes" only matches a "crushed tomato" name
+    match, rule = index.by_full_key.get(full_key) if keep_prep else index.by_key.get(key), None
+    if match is not None:
+        same_number = name_key(match, False, keep_prep) == name_key(name, False, keep_prep)
+        rule = "exact" if same_number else "plural"
+    elif not keep_prep:
+        group = _SYNONYMS.get(full_key) or _SYNONYMS.get(key, ())
+        for synonym in group:
+            if synonym in index.by_full_key:
+                match, rule = index.by_full_key[synonym], "synonym"
+                break
+    if match is None:
+        return None
+    return {
+        "decision": "existing",
+        "canonical_name": match.lower(),
+        "rationale": f"lexical:{rule}",
+        "follow_up_action": "n/a",
+    }
@@ -0,0 +1,330 @@
+"""
+Rule-based quantity/unit parsing for ingredient lines: the fast path in front of the normalize_units LLM call.
+
+"1/4 cup olive oil", "2 pounds russet potatoes" and "1 tablespoon lemon juice" need no model. parse_quantity
+reads the leading quantity (integers, decimals, fractions, mixed and unicode fractions, ranges, number words)
+and unit (synonyms and plurals), picks the base unit with the same rules as UNIT_NORMALIZE_TEMPLATE and
+converts with the UNIT_CONVERSION_ONTOLOGY factors. Every result carries a confidence: direct conversions
+score high; lines that need a density the ontology doesn't have (cups of rice -> g), containers ("1 can"),
+or anything unparsed score low and go to the LLM.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+# Bump when parsing or conversion rules change (part of the ingredient alias version)
+UNIT_GRAMMAR_VERSION = "g3"
+
+ALLOWED_BASE_UNITS = ("g", "ml", "count", "tbsp", "tsp")
+
+# Confidence levels (normalize_units takes the fast path at >= settings.unit_fast_path_min_confidence)
+EXACT = 1.0  # same dimension (volume -> ml, weight -> g, ...), or the to-taste rule
+UNITLESS = 0.9  # "2 lemons" -> 2 count; uncategorized weights -> g
+ONTOLOGY = 0.8  # cross-dimension via an ontology factor (tbsp butter -> g, lb onion -> count)
+RANGE_PENALTY = 0.1
+LOW = 0.3
+
+UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅕": "1/5", "⅖": "2/5", "⅗": "3/5",
+    "⅘": "4/5", "⅙": "1/6", "⅚": "5/6", "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "dozen": 12, "half": 0.5, "quarter": 0.25,
+}
+# Scale a preceding number or article: "2 dozen eggs" = 24, "a half cup" = 0.5 cup, "1 quarter pound" = 0.25 lb
+MULTIPLIER_WORDS = {"dozen": 12, "half": 0.5, "quarter": 0.25}
+
+# unit synonym -> (canonical unit, dimension, factor to the dimension's base: ml / g / count)
+_UNITS: dict[str, tuple[str, str, float]] = {}
+
+
+def _unit(name: str, dimension: str, factor: float, *synonyms: str) -> None:
+    for synonym in (name, *synonyms):
+        _UNITS[synonym] = (name, dimension, factor)
+
+
+_unit("ml", "volume", 1.0, "milliliter", "milliliters", "millilitre", "millilitres", "mls")
+_unit("l", "volume", 1000.0, "liter", "liters", "litre", "litres")
+_unit("tsp", "volume", 5.0, "teaspoon", "teaspoons", "tsps", "tsp.")
+_unit("tbsp", "volume", 15.0, "tablespoon", "tablespoons", "tbsps", "tbs", "tbl", "tbsp.", "tbs.")
+_unit("cup", "volume", 240.0, "cups", "c.")
+_unit("fl oz", "volume", 29.57, "fluid ounce", "fluid ounces", "fl. oz", "fl. oz.", "fl oz.")
+_unit("pint", "volume", 473.0, "pints", "pt")
+_unit("quart", "volume", 946.0, "quarts", "qt", "qts")
+_unit("gallon", "volume", 3785.0, "gallons", "gal")
+_unit("g", "weight", 1.0, "gram", "grams")
+_unit("kg", "weight", 1000.0, "kilogram", "kilograms", "kilo", "kilos", "kgs")
+_unit("oz", "weight", 28.35, "ounce", "ounces", "oz.")
+_unit("lb", "weight", 453.59, "lbs", "pound", "pounds", "lb.", "lbs.")
+_unit("piece", "count", 1.0, "pieces", "pc", "pcs")
+_unit("clove", "count", 1.0, "cloves")
+_unit("slice", "count", 1.0, "slices")
+_unit("head", "count", 1.0, "heads")
+_unit("stalk", "count", 1.0, "stalks")
+_unit("fillet", "count", 1.0, "fillets")
+_unit("loaf", "count", 1.0, "loaves")
+_unit("sprig", "count", 1.0, "sprigs")
+_unit("ear", "count", 1.0, "ears")
+_unit("stick", "stick", 1.0, "sticks")
+_unit("pinch", "taste", 0.0, "pinches", "dash", "dashes")
+for _container in ("can", "jar", "packet", "package", "pkg", "bag", "box", "bottle", "bunch", "container", "envelope", "carton"):
+    _unit(_container, "container", 1.0, _container + "s", _container + "es")
+
+# Longest first so "fl oz" wins over "fl", "tablespoons" over "tablespoon"
+_UNIT_RE = re.compile(
+    r"^(" + "|".join(re.escape(u) for u in sorted(_UNITS, key=len, reverse=True)) + r")(?=[\s,.)]|$)\s*(?:of\s+)?",
+    re.IGNORECASE,
+)
+_NUM = r"(?:\d+\s+\d+/\d+|\d+/\d+|\d*\.\d+|\d+)"
+_QTY_RE = re.compile(rf"^({_NUM})(?:\s*(?:-|–|—|to|or)\s*({_NUM}))?\s*", re.IGNORECASE)
+_WORD_QTY_RE = re.compile(r"^(" + "|".join(NUMBER_WORDS) + r")\b(?!-)\s*(?:of\s+)?", re.IGNORECASE)
+_MULTIPLIER_RE = re.compile(r"^(" + "|".join(MULTIPLIER_WORDS) + r")\b(?!-)\s*(?:of\s+)?(?:an?\s+)?", re.IGNORECASE)
+_SIZE_RE = re.compile(r"^(?:(?:extra[- ])?large|medium|small|whole|heaping|level|scant|generous|big)\b\s*", re.IGNORECASE)
+_VAGUE_RE = re.compile(r"^(?:few|couple|handful|bit|little|some|several)\b", re.IGNORECASE)
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_TO_TASTE_RE = re.compile(r"\b(to taste|as needed|pinch|dash)\b", re.IGNORECASE)
+# Trailing words that are not the ingredient itself: "thyme leaves", "salmon fillets", "basil for garnish"
+_TRAILING_RE = re.compile(r"(?:\s+for\s+.*|\s+(?:leaf|leaves|sprigs?|fillets?|cloves?|stalks?|heads?|slices?|pieces?))+$")
+
+# Base-unit rules, mirroring UNIT_NORMALIZE_TEMPLATE (checked in this order), matched on the head noun
+# (last words) so "egg noodles" is not an egg and "cream cheese" is a cheese
+LIQUID_KEYWORDS = ("oil", "evoo", "cream", "milk", "vinegar", "juice", "broth", "stock", "dressing", "sauce", "syrup", "water", "wine")
+GRAM_KEYWORDS = ("butter", "cheese", "parmesan", "mozzarella", "cheddar", "ricotta", "flour", "sugar", "rice", "crouton", "breadcrumb", "nut", "almond", "chocolate")
+TBSP_KEYWORDS = ("rosemary", "thyme", "oregano", "parsley", "basil")
+COUNT_KEYWORDS = (
+    "bell pepper", "chicken breast", "lemon", "lime", "egg", "garlic", "chicken", "asparagus", "salt", "pepper", "lettuce", "onion",
+    "tomato", "avocado", "carrot", "celery", "apple", "banana", "potato",
+)
+
+# From UNIT_CONVERSION_ONTOLOGY
+ITEM_WEIGHT_G = {
+    "bell pepper": 150.0, "onion": 150.0, "tomato": 170.0, "lemon": 120.0, "lime": 70.0, "avocado": 170.0,
+    "potato": 170.0, "carrot": 60.0, "celery": 40.0, "apple": 180.0, "banana": 120.0, "egg": 50.0,
+    "chicken breast": 170.0,
+}
+GRAMS_PER_ML = {"butter": 14.0 / 15.0, "cheese": 100.0 / 240.0, "parmesan": 100.0 / 240.0, "mozzarella": 100.0 / 240.0,
+                "cheddar": 100.0 / 240.0, "ricotta": 100.0 / 240.0, "crouton": 50.0 / 240.0}
+GRAMS_PER_STICK = {"butter": 113.0}
+# Words that leave a density/stick entry's product unchanged ("unsalted butter", "grated parmesan")
+FORM_QUALIFIERS = frozenset("unsalted salted softened melted cold cubed grated shredded fresh freshly finely".split())
+
+
+@dataclass
+class QuantityParse:
+    quantity: float | None  # parsed amount (midpoint for ranges), None when the line has none
+    unit: str | None  # canonical unit ("cup", "lb", "clove", ...); None for unitless counts
+    name: str  # the rest of the line: ingredient words, parentheticals and prep notes dropped
+    base_unit: str
+    normalized_qty: float
+    confidence: float
+    reason: str
+
+    def as_normalized(self) -> dict:
+        """Same shape as normalize_units' LLM result."""
+        return {
+            "base_unit": self.base_unit,
+            "base_unit_qty": 1.0,
+            "normalized_qty": round(self.normalized_qty, 4),
+            "normalized_unit": self.base_unit,
+        }
+
+
+def _number(text: str) -> float:
+    text = text.strip()
+    if " " in text:
+        whole, frac = text.split(None, 1)
+        return float(whole) + _number(frac)
+    if "/" in text:
+        num, den = text.split("/", 1)
+        return float(num) / float(den) if float(den) else 0.0
+    return float(text)
+
+
+def _normalize_text(text: str) -> str:
+    text = text.replace("⁄", "/")  # fraction slash
+    for char, ascii_frac in UNICODE_FRACTIONS.items():
+        # "1½" -> "1 1/2"
+        text = re.sub(rf"(\d){re.escape(char)}", rf"\1 {ascii_frac}", text).replace(char, ascii_frac)
+    return re.sub(r"\s+", " ", text.strip().lstrip("-•*").strip())
+
+
+def _keyword(name: str, keywords: Iterable[str]) -> str | None:
+    """The keyword that ends the ingredient name (singular or plural), if any."""
+    head = _TRAILING_RE.sub("", name)
+    for kw in keywords:
+        if re.search(rf"\b{re.escape(kw)}(?:e?s)?$", head):
+            return kw
+    return None
+
+
+def _whole_name_keyword(name: str, table: Iterable[str]) -> str | None:
+    """
+    Like _keyword, but the keyword must be the whole name (form qualifiers aside) or follow another key of the
+    table ("parmesan cheese"): "peanut butter" and "cream cheese" do not have butter's or cheese's density.
+    """
+    words = [w for w in _TRAILING_RE.sub("", name).split() if w not in FORM_QUALIFIERS]
+    kw = _keyword(" ".join(words), table)
+    if kw is None:
+        return None
+    modifiers = words[: -len(kw.split())]
+    return kw if not modifiers or " ".join(modifiers) in table else None
+
+
+def base_unit_for(name: str, dimension: str | None) -> tuple[str, bool]:
+    """(base_unit, categorized) for an ingredient name; the dimension default when no rule matches."""
+    if _keyword(name, LIQUID_KEYWORDS):
+        return "ml", True
+    if _keyword(name, GRAM_KEYWORDS):
+        return "g", True
+    if _keyword(name, TBSP_KEYWORDS):
+        return "tbsp", True
+    kw = _keyword(name, COUNT_KEYWORDS)
+    if kw == "potato" and dimension == "weight":
+        return "g", True
+    if kw:
+        return "count", True
+    return {"volume": "ml", "weight": "g"}.get(dimension, "count"), False
+
+
+def _convert(qty: float, unit: str | None, dimension: str | None, factor: float, base: str, name: str) -> tuple[float | None, float, str]:
+    """(normalized_qty, confidence, reason). normalized_qty None when no rule or ontology factor applies."""
+    if dimension in (None, "count"):
+        if base == "count":
+            return qty, UNITLESS, "count"
+        return None, LOW, f"count->{base}"
+    if dimension == "volume":
+        ml = qty * factor
+        if base == "ml":
+            return ml, EXACT, "volume"
+        if base in ("tbsp", "tsp"):
+            return ml / (15.0 if base == "tbsp" else 5.0), EXACT, "volume"
+        if base == "g":
+            kw = _whole_name_keyword(name, GRAMS_PER_ML)
+            if kw:
+                return ml * GRAMS_PER_ML[kw], ONTOLOGY, f"density:{kw}"
+        return None, LOW, f"volume->{base}"
+    if dimension == "weight":
+        grams = qty * factor
+        if base == "g":
+            return grams, EXACT, "weight"
+        if base == "count":
+            kw = _keyword(name, ITEM_WEIGHT_G)
+            if kw:
+                return grams / ITEM_WEIGHT_G[kw], ONTOLOGY, f"item_weight:{kw}"
+        return None, LOW, f"weight->{base}"
+    if dimension == "taste":
+        return 0.0, EXACT, "to_taste"
+    if dimension == "stick":
+        kw = _whole_name_keyword(name, GRAMS_PER_STICK)
+        if kw and base == "g":
+            return qty * GRAMS_PER_STICK[kw], ONTOLOGY, f"stick:{kw}"
+    return None, LOW, f"{dimension}:{unit}"
+
+
+def parse_quantity(ingredient_text: str, canonical_name: str = "", target_base_unit: str | None = None) -> QuantityParse:
+    """
+    Parse one ingredient line. canonical_name (when known) drives the base-unit rules, else the line's own
+    words do; target_base_unit overrides them (an existing ingredient's unit).
+    """
+    text = _normalize_text(ingredient_text)
+    qty: float | None = None
+    is_range = False
+    rest = text
+    m = _QTY_RE.match(rest)
+    if m:
+        low = _number(m.group(1))
+        qty = (low + _number(m.group(2))) / 2 if m.group(2) else low
+        is_range = bool(m.group(2))
+        rest = rest[m.end():]
+    else:
+        m = _WORD_QTY_RE.match(rest)
+        if m:
+            qty = float(NUMBER_WORDS[m.group(1).lower()])
+            rest = rest[m.end():]
+            if m.group(1).lower() in MULTIPLIER_WORDS:
+                rest = re.sub(r"^an?\s+", "", rest, flags=re.IGNORECASE)  # "half a cup"
+    if qty is not None:
+        m = _MULTIPLIER_RE.match(rest)
+        if m:
+            qty *= MULTIPLIER_WORDS[m.group(1).lower()]
+            rest = rest[m.end():]
+    rest = _PAREN_RE.sub(" ", rest).strip()
+    while (size := _SIZE_RE.match(rest)) is not None:
+        rest = rest[size.end():]
+
+    unit = dimension = None
+    factor = 1.0
+    m = _UNIT_RE.match(rest)
+    if m and qty is not None:
+        unit, dimension, factor = _UNITS[m.group(1).lower()]
+        rest = rest[m.end():]
+    name = re.sub(r"\s+", " ", rest.split(",")[0]).strip().lower()
+    subject = (canonical_name or "").strip().lower()
+    if not subject or subject == "unknown":
+        subject = name
+
+    def result(base, normalized, confidence, reason):
+        return QuantityParse(qty, unit, name, base, normalized, max(0.0, round(confidence, 2)), reason)
+
+    if qty is None:
+        if _TO_TASTE_RE.search(text):
+            return result("tsp", 0.0, EXACT, "to_taste")
+        return result("count", 0.0, 0.0, "no_quantity")
+
+    if dimension == "taste":
+        return result("tsp", 0.0, EXACT, "to_taste")
+    if _VAGUE_RE.match(rest):
+        return result("count", 0.0, LOW, "vague_quantity")
+    base, categorized = base_unit_for(subject, dimension)
+    if target_base_unit in ALLOWED_BASE_UNITS:
+        base, categorized = target_base_unit, True
+    normalized, confidence, reason = _convert(qty, unit, dimension, factor, base, subject)
+    if normalized is None:
+        return result(base, 0.0, confidence, reason)
+    if not categorized and dimension == "volume":
+        confidence = LOW  # an uncategorized solid by volume (cups of spinach) may be g or count
+    elif not categorized:
+        confidence = min(confidence, UNITLESS)
+    if is_range:
+        confidence -= RANGE_PENALTY
+    return result(base, normalized, confidence, reason)
+
+
+def benchmark(
+    lines: Iterable[str],
+    min_confidence: float,
+    llm_fn: Callable[[str, str], dict] | None = None,
+    qty_tolerance: float = 0.05,
+) -> dict:
+    """
+    Fast-path coverage over ingredient lines and, with llm_fn(line, name) -> normalize_units dict, agreement
+    with the LLM on the covered ones (same base_unit and normalized_qty within qty_tolerance, relative).
+    """
+    lines = list(dict.fromkeys(lines))
+    parses = {line: parse_quantity(line) for line in lines}
+    covered = [line for line in lines if parses[line].confidence >= min_confidence]
+    out = {
+        "lines": len(lines),
+        "fast_path": len(covered),
+        "coverage": round(len(covered) / len(lines), 4) if lines else None,
+        "fallback": sorted(line for line in lines if line not in covered),
+    }
+    if llm_fn is None:
+        return out
+    agree = 0
+    disagreements = []
+    for line in covered:
+        fast = parses[line].as_normalized()
+        llm = llm_fn(line, parses[line].name)
+        same_unit = fast["base_unit"] == llm.get("base_unit")
+        llm_qty = float(llm.get("normalized_qty") or 0.0)
+        same_qty = abs(fast["normalized_qty"] - llm_qty) <= qty_tolerance * max(abs(llm_qty), 1e-9) or fast["normalized_qty"] == llm_qty
+        if same_unit and same_qty:
+            agree += 1
+        else:
+            disagreements.append({"line": line, "fast": fast, "llm": llm})
+    out["agreement"] = round(agree / len(covered), 4) if covered else None
+    out["disagreements"] = disagreements
+    return out
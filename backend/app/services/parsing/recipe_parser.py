@@ -1,3 +1,4 @@
+import hashlib
 import re
 from dataclasses import dataclass
 from typing import List
@@ -32,6 +33,24 @@ class ParsedRecipe:
     instructions: str
 
 
+_WS = re.compile(r"\s+")
+
+
+def _norm(text: str) -> str:
+    return _WS.sub(" ", (text or "").strip().lower()).rstrip(" .,;")
+
+
+def recipe_content_hash(recipe: ParsedRecipe) -> str:
+    """
+    sha256 of a recipe's content: normalized name, servings, ingredient lines (in order) and instructions.
+    Case, whitespace and trailing punctuation do not count, so re-exporting the same file hashes the same.
+    """
+    parts = [_norm(recipe.name), str(recipe.servings)]
+    parts += [_norm(line) for line in recipe.ingredients]
+    parts.append(_norm(recipe.instructions))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
 def _parse_title(line: str) -> tuple[str, int]:
     match = re.match(r"^(.*)\(for\s+(\d+)\s+people\)\s*$", line.strip(), re.IGNORECASE)
     if match:
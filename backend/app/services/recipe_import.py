@@ -0,0 +1,279 @@
+"""
+Bulk recipe import for large legacy corpora (`python -m app.cli import <path>`).
+
+Sources are a directory of .txt recipe files (recursive), a .zip of them, or a .jsonl file whose lines
+are either {"text": "<recipe file text>"} or a structured recipe {"name", "servings", "ingredients",
+"instructions"}. Unlike /api/recipes/upload there is no per-recipe commit or SSE job:
+
+- sources are parsed in batches of roughly batch_size recipes;
+- ingredient lines are deduplicated across the batch, looked up in the ingredientalias table and memoized
+  for the whole run (IngredientLineResolver), so each distinct line costs at most one LLM resolution ever;
+- new canonical names are created with one get_or_create_ingredients call per batch;
+- recipes and links go in as executemany INSERTs, committed in one transaction per batch together with
+  the checkpoint (backfillstate row "import:<path>": sources consumed, recipes imported);
+- recipes whose content hash (recipe_content_hash) is already stored, or repeated earlier in the batch,
+  are skipped before resolution, so re-importing a corpus is a no-op.
+
+An interrupted import resumes after the last committed batch. Allergens use keyword inference unless
+llm_allergens is set. Existing ingredients keep their base_unit (no repair as in the upload path).
+"""
+
+import itertools
+import json
+import time
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from sqlmodel import Session
+
+from app.config import settings
+from app.logging import get_logger
+from app.services.allergens import infer_allergens_from_ingredients
+from app.services.ingestion import IngredientAliasStore, IngredientLineResolver, ResolveFn, canonical_name_of
+from app.services.parsing.recipe_parser import ParsedRecipe, infer_meal_type, parse_recipe_text, recipe_content_hash
+from app.storage.backfills import get_backfill_state
+from app.storage.repositories import (
+    bulk_insert_recipe_ingredients,
+    bulk_insert_recipes,
+    get_ingredients,
+    get_or_create_ingredients,
+    get_recipe_ids_by_content_hash,
+)
+from app.storage.recipe_search import refresh_recipe_search_vectors
+from app.workers.sku_enqueue import SkuEnqueuer
+
+logger = get_logger(__name__)
+
+# (source name, "text" or "jsonl", raw bytes). Decoding happens per source in run_import, so one bad file or line
+# is counted in failed_sources instead of stopping the import.
+Source = tuple[str, str, bytes]
+
+
+@dataclass
+class ImportStats:
+    sources: int = 0
+    skipped_sources: int = 0
+    failed_sources: int = 0
+    recipes: int = 0
+    duplicates_skipped: int = 0
+    links: int = 0
+    ingredients_created: int = 0
+    sku_jobs: int = 0
+    sku_jobs_coalesced: int = 0
+    batches: int = 0
+    elapsed_s: float = 0.0
+    resolver: dict = field(default_factory=dict)
+
+    @property
+    def recipes_per_s(self) -> float:
+        return self.recipes / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+def iter_sources(path: str | Path) -> Iterator[Source]:
+    """Yield sources in a deterministic order (the checkpoint counts positions in it)."""
+    path = Path(path)
+    if path.is_dir():
+        for file in sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() == ".txt"):
+            yield str(file.relative_to(path)), "text", file.read_bytes()
+    elif path.suffix.lower() == ".zip":
+        with zipfile.ZipFile(path) as zf:
+            for name in sorted(n for n in zf.namelist() if n.lower().endswith(".txt")):
+                yield name, "text", zf.read(name)
+    elif path.suffix.lower() == ".jsonl":
+        with path.open("rb") as fh:
+            for lineno, line in enumerate(fh, start=1):
+                if line.strip():
+                    yield f"{path.name}:{lineno}", "jsonl", line
+    else:
+        raise ValueError(f"unsupported import source {path} (expected a directory, .zip or .jsonl)")
+
+
+def _parse_source(kind: str, raw: bytes) -> list[ParsedRecipe]:
+    """Decode and parse one source; raises on invalid UTF-8, JSON or records."""
+    if kind == "text":
+        return parse_recipe_text(raw.decode("utf-8"))
+    payload = json.loads(raw.decode("utf-8"))
+    if "text" in payload:
+        return parse_recipe_text(payload["text"])
+    return [
+        ParsedRecipe(
+            name=payload["name"],
+            servings=int(payload.get("servings") or 1),
+            ingredients=[str(i).lstrip("-").strip() for i in payload.get("ingredients") or []],
+            instructions=payload.get("instructions") or "",
+        )
+    ]
+
+
+def checkpoint_name(path: str | Path) -> str:
+    return f"import:{Path(path).resolve()}"
+
+
+def run_import(
+    session: Session,
+    path: str | Path,
+    batch_size: int = 500,
+    resolve_fn: ResolveFn | None = None,
+    max_workers: int | None = None,
+    postal_code: str | None = None,
+    enqueue_skus: bool = True,
+    llm_allergens: bool = False,
+    restart: bool = False,
+) -> ImportStats:
+    """Import (or resume importing) every recipe under path. resolve_fn defaults to LLM match + normalize."""
+    state = get_backfill_state(session, checkpoint_name(path))
+    if restart:
+        state.last_id = 0
+        state.rows_updated = 0
+        state.completed_at = None
+    stats = ImportStats(skipped_sources=state.last_id)
+    if state.completed_at is not None:
+        logger.info("import.skip path=%s completed_at=%s", path, state.completed_at)
+        return stats
+
+    existing = {i.canonical_name: i for i in get_ingredients(session)}
+    resolver = IngredientLineResolver(
+        list(existing), resolve_fn=resolve_fn, max_workers=max_workers, alias_store=IngredientAliasStore(session)
+    )
+    postal = (postal_code or "").strip() or settings.default_postal_code
+    enqueuer = SkuEnqueuer()
+    logger.info("import.start path=%s resume_from=%s batch_size=%s", path, state.last_id, batch_size)
+    start = time.perf_counter()
+
+    sources = itertools.islice(iter_sources(path), state.last_id, None)
+    while True:
+        batch: list[tuple[str, ParsedRecipe]] = []
+        consumed = 0
+        for name, kind, raw in sources:
+            consumed += 1
+            try:
+                batch.extend((name, parsed) for parsed in _parse_source(kind, raw))
+            except Exception as e:
+                stats.failed_sources += 1
+                logger.warning("import.source_failed source=%s error=%s", name, e)
+            if len(batch) >= batch_size:
+                break
+        if not consumed:
+            break
+        created = _import_batch(session, batch, resolver, existing, stats, llm_allergens)
+        state.last_id += consumed
+        state.rows_updated += len(batch)
+        state.updated_at = datetime.utcnow()
+        session.add(state)
+        session.commit()
+        stats.sources += consumed
+        stats.batches += 1
+        if enqueue_skus and created:
+            stats.sku_jobs += enqueuer.enqueue((i.id, i.canonical_name, postal) for i in created)
+            stats.sku_jobs_coalesced = enqueuer.coalesced
+        stats.elapsed_s = time.perf_counter() - start
+        logger.info(
+            "import.progress sources=%s recipes=%s links=%s new_ingredients=%s recipes_per_s=%.1f resolver=%s",
+            state.last_id,
+            stats.recipes,
+            stats.links,
+            stats.ingredients_created,
+            stats.recipes_per_s,
+            resolver.stats(),
+        )
+
+    state.completed_at = datetime.utcnow()
+    session.add(state)
+    session.commit()
+    stats.elapsed_s = time.perf_counter() - start
+    stats.resolver = resolver.stats()
+    logger.info(
+        "import.end sources=%s recipes=%s duplicates_skipped=%s elapsed_s=%.1f recipes_per_s=%.1f",
+        stats.sources,
+        stats.recipes,
+        stats.duplicates_skipped,
+        stats.elapsed_s,
+        stats.recipes_per_s,
+    )
+    return stats
+
+
+def _import_batch(
+    session: Session,
+    batch: list[tuple[str, ParsedRecipe]],
+    resolver: IngredientLineResolver,
+    existing: dict,
+    stats: ImportStats,
+    llm_allergens: bool,
+) -> list:
+    """Resolve, create ingredients and stage recipe + link inserts for one batch. Returns new ingredients."""
+    hashed = [(source_name, parsed, recipe_content_hash(parsed)) for source_name, parsed in batch]
+    known = set(get_recipe_ids_by_content_hash(session, (content_hash for _, _, content_hash in hashed)))
+    fresh = []
+    for source_name, parsed, content_hash in hashed:
+        if content_hash in known:
+            stats.duplicates_skipped += 1
+            continue
+        known.add(content_hash)
+        fresh.append((source_name, parsed, content_hash))
+    if not fresh:
+        return []
+    results = resolver.resolve(line for _, parsed, _ in fresh for line in parsed.ingredients)
+
+    new_rows: dict[str, dict] = {}
+    for match, normalized in results.values():
+        canonical_name = canonical_name_of(match)
+        if canonical_name not in existing and canonical_name not in new_rows:
+            new_rows[canonical_name] = {
+                "name": canonical_name,
+                "canonical_name": canonical_name,
+                "base_unit": (normalized.get("base_unit") or "count").strip().lower(),
+                "base_unit_qty": normalized.get("base_unit_qty", 1.0),
+            }
+    created = []
+    if new_rows:
+        resolved, just_created = get_or_create_ingredients(session, list(new_rows.values()), commit=False)
+        existing.update(resolved)
+        resolver.existing_names.extend(resolved)
+        created = [resolved[name] for name in just_created]
+        stats.ingredients_created += len(created)
+
+    now = datetime.utcnow()
+    recipe_rows = []
+    link_rows: list[list[dict]] = []
+    for source_name, parsed, content_hash in fresh:
+        links = []
+        names = []
+        for text in parsed.ingredients:
+            if text not in results:
+                continue
+            match, normalized = results[text]
+            canonical_name = canonical_name_of(match)
+            names.append(canonical_name)
+            links.append({
+                "ingredient_id": existing[canonical_name].id,
+                "quantity": normalized["normalized_qty"],
+                "unit": normalized["normalized_unit"],
+                "original_text": text,
+            })
+        recipe_rows.append({
+            "name": parsed.name,
+            "servings": parsed.servings,
+            "instructions": parsed.instructions,
+            "source_file": source_name,
+            "meal_type": infer_meal_type(parsed.name, parsed.instructions),
+            "allergens": infer_allergens_from_ingredients(names, use_llm=llm_allergens),
+            "content_hash": content_hash,
+            "created_at": now,
+        })
+        link_rows.append(links)
+
+    resolver.save_aliases(existing)
+    recipe_ids = bulk_insert_recipes(session, recipe_rows)
+    flat_links = [
+        {"recipe_id": recipe_id, **link} for recipe_id, links in zip(recipe_ids, link_rows) for link in links
+    ]
+    stats.links += bulk_insert_recipe_ingredients(session, flat_links)
+    # bulk_insert_recipe_ingredients refreshes search_vector for linked recipes; the rest still need theirs
+    linked_ids = {row["recipe_id"] for row in flat_links}
+    refresh_recipe_search_vectors(session, [rid for rid in recipe_ids if rid not in linked_ids])
+    stats.recipes += len(recipe_ids)
+    return created
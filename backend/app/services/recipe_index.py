@@ -0,0 +1,198 @@
+"""
+Inverted ingredient -> recipe index over RecipeIngredient.
+
+Posting lists are Python ints used as bitsets (bit n = n-th recipe seen), so "recipes using any/all of
+these ingredients" is a handful of OR/AND operations instead of a scan over every recipe. by_recipe and
+by_ingredient hold the link rows themselves for per-recipe requirements and per-ingredient demand.
+
+plan() and cook-with queries use the process-wide recipe_index_cache, which is kept current incrementally
+from new RecipeIngredient ids.
+"""
+
+import math
+import threading
+import time
+from typing import Any, Iterable
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.logging import get_logger
+from app.storage.models import RecipeIngredient
+
+logger = get_logger(__name__)
+
+
+class RecipeIngredientIndex:
+    def __init__(self) -> None:
+        self.by_recipe: dict[int, list[Any]] = {}
+        self.by_ingredient: dict[int, list[Any]] = {}
+        self._recipe_bit: dict[int, int] = {}
+        self._recipe_at: list[int] = []
+        self._postings: dict[int, int] = {}
+
+    @classmethod
+    def build(cls, rows: Iterable[Any]) -> "RecipeIngredientIndex":
+        """rows: anything with recipe_id and ingredient_id (RecipeIngredient, projection records)."""
+        index = cls()
+        for row in rows:
+            index.add(row)
+        return index
+
+    def extended(self, rows: Iterable[Any]) -> "RecipeIngredientIndex":
+        """A new index with rows appended; this one is left unchanged for readers still holding it."""
+        index = RecipeIngredientIndex()
+        index.by_recipe = dict(self.by_recipe)
+        index.by_ingredient = dict(self.by_ingredient)
+        index._recipe_bit = dict(self._recipe_bit)
+        index._recipe_at = list(self._recipe_at)
+        index._postings = dict(self._postings)
+        copied: set[tuple[str, int]] = set()
+        for row in rows:
+            # Copy each posting row list once before the first append to it
+            for name, key in (("by_recipe", row.recipe_id), ("by_ingredient", row.ingredient_id)):
+                table = getattr(index, name)
+                if (name, key) not in copied and key in table:
+                    table[key] = list(table[key])
+                copied.add((name, key))
+            index.add(row)
+        return index
+
+    def add(self, row: Any) -> None:
+        bit = self._recipe_bit.get(row.recipe_id)
+        if bit is None:
+            bit = self._recipe_bit[row.recipe_id] = len(self._recipe_at)
+            self._recipe_at.append(row.recipe_id)
+        self.by_recipe.setdefault(row.recipe_id, []).append(row)
+        self.by_ingredient.setdefault(row.ingredient_id, []).append(row)
+        self._postings[row.ingredient_id] = self._postings.get(row.ingredient_id, 0) | (1 << bit)
+
+    def __len__(self) -> int:
+        return len(self._recipe_at)
+
+    def requirements(self, recipe_id: int) -> dict[int, float]:
+        """ingredient_id -> quantity for one recipe (later rows win, as in the original per-recipe scan)."""
+        return {row.ingredient_id: row.quantity for row in self.by_recipe.get(recipe_id, [])}
+
+    def ingredient_ids(self, recipe_id: int) -> set[int]:
+        return {row.ingredient_id for row in self.by_recipe.get(recipe_id, [])}
+
+    def recipes_using_any(self, ingredient_ids: Iterable[int]) -> set[int]:
+        mask = 0
+        for ingredient_id in ingredient_ids:
+            mask |= self._postings.get(ingredient_id, 0)
+        return self._decode(mask)
+
+    def recipes_using_all(self, ingredient_ids: Iterable[int]) -> set[int]:
+        ids = list(ingredient_ids)
+        if not ids:
+            return set()
+        mask = -1
+        for ingredient_id in ids:
+            mask &= self._postings.get(ingredient_id, 0)
+        return self._decode(mask)
+
+    def cook_with(self, have: set[int], max_missing: int | None = None, limit: int = 20) -> list[dict]:
+        """
+        Recipes using at least one of `have`, ranked by coverage (share of their ingredients on hand),
+        then fewest missing. Only candidate recipes from the posting lists are examined.
+        """
+        ranked = []
+        for recipe_id in self.recipes_using_any(have):
+            required = self.ingredient_ids(recipe_id)
+            missing = required - have
+            if max_missing is not None and len(missing) > max_missing:
+                continue
+            ranked.append({
+                "recipe_id": recipe_id,
+                "coverage": round((len(required) - len(missing)) / len(required), 4),
+                "matched": len(required) - len(missing),
+                "missing": len(missing),
+                "required": len(required),
+                "missing_ingredient_ids": sorted(missing),
+            })
+        ranked.sort(key=lambda r: (-r["coverage"], r["missing"], r["recipe_id"]))
+        return ranked[:limit]
+
+    def _decode(self, mask: int) -> set[int]:
+        out = set()
+        while mask:
+            low = mask & -mask
+            out.add(self._recipe_at[low.bit_length() - 1])
+            mask ^= low
+        return out
+
+
+class RecipeIndexCache:
+    """
+    Process-wide index for plan() and the read APIs, replaced copy-on-write so a returned index never changes.
+
+    Each get() reads max(RecipeIngredient.id) (a primary-key lookup); new links are appended to a copy of the
+    index. The full signature (count, max id, sum of ingredient ids and quantities) is compared at most once per
+    check_interval_s, so deletes, duplicate merges and quantity fixes made by other processes show up within that
+    interval; anything but appended links triggers a full rebuild. Unit/text-only edits do not change the
+    signature: callers that make them call invalidate().
+    """
+
+    def __init__(self, check_interval_s: float | None = None) -> None:
+        self.check_interval_s = settings.recipe_index_check_interval_s if check_interval_s is None else check_interval_s
+        self._lock = threading.Lock()
+        self._index = RecipeIngredientIndex()
+        self._signature: tuple[int, int, int, float] = (0, 0, 0, 0.0)
+        self._checked_at = 0.0
+
+    def get(self, session: Session) -> RecipeIngredientIndex:
+        max_id = int(session.exec(select(func.coalesce(func.max(RecipeIngredient.id), 0))).one())
+        with self._lock:
+            index, signature, checked_at = self._index, self._signature, self._checked_at
+        if max_id == signature[1] and time.monotonic() - checked_at < self.check_interval_s:
+            return index
+
+        checked_at = time.monotonic()
+        count, max_id, id_sum, qty_sum = session.exec(
+            select(
+                func.count(),
+                func.coalesce(func.max(RecipeIngredient.id), 0),
+                func.coalesce(func.sum(RecipeIngredient.ingredient_id), 0),
+                func.coalesce(func.sum(RecipeIngredient.quantity), 0.0),
+            )
+        ).one()
+        fresh = (int(count), int(max_id), int(id_sum), float(qty_sum))
+        if fresh != signature:
+            old_count, old_max, old_sum, old_qty = signature
+            new_rows = list(session.exec(self._links().where(RecipeIngredient.id > old_max)))
+            if (
+                old_count + len(new_rows) == fresh[0]
+                and old_sum + sum(r.ingredient_id for r in new_rows) == fresh[2]
+                and math.isclose(old_qty + sum(r.quantity for r in new_rows), fresh[3], rel_tol=1e-9, abs_tol=1e-9)
+            ):
+                index = index.extended(new_rows)
+            else:
+                rows = list(session.exec(self._links()))
+                logger.info("recipe_index.rebuild links=%s", len(rows))
+                index = RecipeIngredientIndex.build(rows)
+        with self._lock:
+            # Don't overwrite a concurrent refresh or invalidate() that happened while this one ran
+            if self._signature == signature:
+                self._index, self._signature, self._checked_at = index, fresh, checked_at
+        return index
+
+    def invalidate(self) -> None:
+        """Rebuild on the next get(); call after editing or deleting links in-process (e.g. overseer corrections)."""
+        with self._lock:
+            self._index, self._signature, self._checked_at = RecipeIngredientIndex(), (0, 0, 0, 0.0), 0.0
+
+    @staticmethod
+    def _links():
+        return select(
+            RecipeIngredient.id,
+            RecipeIngredient.recipe_id,
+            RecipeIngredient.ingredient_id,
+            RecipeIngredient.quantity,
+            RecipeIngredient.unit,
+            RecipeIngredient.original_text,
+        ).order_by(RecipeIngredient.id)
+
+
+recipe_index_cache = RecipeIndexCache()
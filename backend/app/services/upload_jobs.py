@@ -0,0 +1,263 @@
+"""
+Async recipe upload jobs (POST /api/recipes/upload), run by the ingest_upload Celery task on the ingestion queue.
+
+Job state lives in Redis, so any API replica can accept the upload or serve its SSE stream and any ingestion
+worker can run it. Keys, all expiring after UPLOAD_JOB_TTL_S:
+
+- upload:<job_id>:files     uploaded files ({"name", "content" base64}, in upload order) for the worker
+- upload:<job_id>:events    every SSE event ({"event", "data"}) in order; readers keep their own cursor, so
+                            reconnecting clients resume from Last-Event-ID
+- upload:<job_id>:progress  latest {"files", "complete", "ingredient_ids", "ingested_at"} snapshot
+
+run_upload_job is the task body: the ingestion pipeline, ending with upload_complete. SKU coverage of the
+upload's ingredients is not waited for on the worker (that would hold an ingestion slot while Instacart fetches
+run); job_status computes it when progress is read (GET /api/progress, the SSE stream), and the job is complete
+once every ingredient has SKUs or is marked unavailable, or SKU_POLL_TIMEOUT after ingestion finished.
+"""
+
+import base64
+import json
+import threading
+import time
+
+from redis import Redis
+
+from app.config import settings
+from app.logging import get_logger
+from app.services.allergens import infer_allergens_from_ingredients
+from app.services.ingestion import match_and_normalize
+from app.services.ingestion_pipeline import IngestItem, IngestionPipeline
+from app.services.llm.dspy_client import configure_dspy
+from app.storage.db import get_read_session
+from app.storage.repositories import get_ingredient_ids_with_active_skus, get_unavailable_ingredient_ids
+from app.utils.timing import time_span
+from app.workers.sku_enqueue import SkuEnqueuer, submit_sku_fetches
+
+logger = get_logger(__name__)
+
+# SSE streams re-check SKU coverage this often; a job stops waiting for SKUs this long after ingestion
+SKU_POLL_INTERVAL = 1.5
+SKU_POLL_TIMEOUT = 300
+# Heartbeat sku_progress event so idle SSE connections stay open during SKU fetch backoff/retries
+SKU_HEARTBEAT_S = 15
+# Emit an ingredients_resolved event every N distinct lines resolved
+RESOLVE_PROGRESS_EVERY = 10
+
+_redis_lock = threading.Lock()
+_redis_client: Redis | None = None
+
+
+def _redis() -> Redis:
+    global _redis_client
+    with _redis_lock:
+        if _redis_client is None:
+            _redis_client = Redis.from_url(settings.redis_url)
+        return _redis_client
+
+
+class UploadJobStore:
+    """Redis-backed upload job files, event log and progress snapshot."""
+
+    def __init__(self, ttl_s: int | None = None) -> None:
+        self.redis = _redis()
+        self.ttl_s = ttl_s or settings.upload_job_ttl_s
+
+    @staticmethod
+    def _key(job_id: str, part: str) -> str:
+        return f"upload:{job_id}:{part}"
+
+    def create(self, job_id: str, files: list[tuple[bytes, str]], progress: dict) -> None:
+        """Store the uploaded files and the initial progress snapshot."""
+        pipe = self.redis.pipeline()
+        files_key = self._key(job_id, "files")
+        pipe.delete(files_key)
+        for content, name in files:
+            pipe.rpush(files_key, json.dumps({"name": name, "content": base64.b64encode(content).decode("ascii")}))
+        pipe.expire(files_key, self.ttl_s)
+        pipe.set(self._key(job_id, "progress"), json.dumps(progress), ex=self.ttl_s)
+        pipe.execute()
+
+    def files(self, job_id: str) -> list[tuple[bytes, str]]:
+        raw = self.redis.lrange(self._key(job_id, "files"), 0, -1)
+        out = []
+        for item in raw:
+            entry = json.loads(item)
+            out.append((base64.b64decode(entry["content"]), entry["name"]))
+        return out
+
+    def drop_files(self, job_id: str) -> None:
+        self.redis.delete(self._key(job_id, "files"))
+
+    def publish(self, job_id: str, event: str, data: dict, progress: dict | None = None) -> None:
+        """Append an event (and replace the progress snapshot when given)."""
+        events_key = self._key(job_id, "events")
+        pipe = self.redis.pipeline()
+        pipe.rpush(events_key, json.dumps({"event": event, "data": data}))
+        pipe.expire(events_key, self.ttl_s)
+        if progress is not None:
+            pipe.set(self._key(job_id, "progress"), json.dumps(progress), ex=self.ttl_s)
+        pipe.execute()
+
+    def set_progress(self, job_id: str, progress: dict) -> None:
+        self.redis.set(self._key(job_id, "progress"), json.dumps(progress), ex=self.ttl_s)
+
+    def events(self, job_id: str, start: int = 0) -> list[tuple[str, dict]]:
+        """Events from index start on."""
+        return [
+            (entry["event"], entry["data"])
+            for entry in map(json.loads, self.redis.lrange(self._key(job_id, "events"), start, -1))
+        ]
+
+    def progress(self, job_id: str) -> dict | None:
+        raw = self.redis.get(self._key(job_id, "progress"))
+        return json.loads(raw) if raw else None
+
+
+def _get_ingredient_ids_with_skus(ingredient_ids: set[int]) -> set:
+    with get_read_session() as session:
+        return get_ingredient_ids_with_active_skus(session, ingredient_ids)
+
+
+def _get_ingredient_ids_unavailable(ingredient_ids: set[int]) -> set:
+    """Ingredient IDs explicitly marked sku_unavailable (SKU fetch returned 0)."""
+    with get_read_session() as session:
+        return get_unavailable_ingredient_ids(session, ingredient_ids)
+
+
+def _snapshot(files_progress: list[dict]) -> list[dict]:
+    return [
+        {
+            "name": f["name"],
+            "ingredients_added": f["ingredients_added"],
+            "ingredients_total": f["ingredients_total"],
+            "ingredients_with_skus": f["ingredients_with_skus"],
+            "ingredients_unavailable": f.get("ingredients_unavailable", 0),
+            "sku_total": len(set(f.get("ingredient_ids") or [])),
+        }
+        for f in files_progress
+    ]
+
+
+def job_status(store: UploadJobStore, job_id: str) -> dict | None:
+    """
+    The job's progress with SKU coverage computed now: {"files", "complete", "sku"}, where sku has
+    job_ingredients_with_skus / job_ingredients_unavailable / job_sku_total. None when the job is unknown or expired.
+    """
+    progress = store.progress(job_id)
+    if progress is None:
+        return None
+    files = progress.get("files") or []
+    ids_by_file = [set(ids) for ids in progress.get("ingredient_ids") or []]
+    job_ids = set().union(*ids_by_file)
+    with_skus = _get_ingredient_ids_with_skus(job_ids) if job_ids else set()
+    unavailable = _get_ingredient_ids_unavailable(job_ids) if job_ids else set()
+    for f, ids in zip(files, ids_by_file):
+        f["ingredients_with_skus"] = len(ids & with_skus)
+        f["ingredients_unavailable"] = len(ids & unavailable)
+    sku = {
+        "job_ingredients_with_skus": len(job_ids & with_skus),
+        "job_ingredients_unavailable": len(job_ids & unavailable),
+        "job_sku_total": len(job_ids),
+    }
+    complete = bool(progress.get("complete"))  # set when the task failed
+    ingested_at = progress.get("ingested_at")
+    if ingested_at is not None:
+        covered = sku["job_ingredients_with_skus"] + sku["job_ingredients_unavailable"] >= len(job_ids)
+        complete = complete or covered or time.time() - ingested_at >= SKU_POLL_TIMEOUT
+    return {"files": files, "complete": complete, "sku": sku}
+
+
+def run_upload_job(
+    job_id: str,
+    file_contents: list[tuple[bytes, str]],
+    ingredient_totals: dict[str, int],
+    effective_postal: str,
+    store: UploadJobStore,
+) -> None:
+    """
+    Sync processing loop. Publishes (event, data) to the job's event log after each significant step and returns
+    after upload_complete; SKU coverage is tracked by job_status.
+    """
+    configure_dspy()
+    files_progress = [
+        {
+            "name": name,
+            "ingredients_added": 0,
+            "ingredients_total": ingredient_totals.get(name, 1),
+            "ingredients_with_skus": 0,
+            "ingredients_unavailable": 0,
+            "sku_total": 0,
+            "ingredient_ids": [],
+        }
+        for _, name in file_contents
+    ]
+
+    def _put(event: str, data: dict, **extra):
+        progress = {
+            "files": _snapshot(files_progress),
+            "complete": False,
+            "ingredient_ids": [sorted(set(f["ingredient_ids"])) for f in files_progress],
+            **extra,
+        }
+        store.publish(job_id, event, data, progress)
+
+    _put("upload_started", {"files": _snapshot(files_progress)})
+
+    def _on_resolved(done: int, total: int) -> None:
+        if done == total or done % RESOLVE_PROGRESS_EVERY == 0:
+            _put("ingredients_resolved", {"resolved": done, "unique_total": total})
+
+    def _on_ingredient(item: IngestItem, canonical_name: str, ingredient_id: int) -> None:
+        files_progress[item.file_idx]["ingredients_added"] += 1
+        files_progress[item.file_idx]["ingredient_ids"].append(ingredient_id)
+        _put("ingredient_added", {
+            "ingredients_added": pipeline.ingredients_created,
+            "name": canonical_name,
+            "files": _snapshot(files_progress),
+        })
+
+    def _on_skipped(item: IngestItem, recipe_id: int | None) -> None:
+        # Already-known recipe: its lines will never be added, so stop counting them toward the file total
+        fp = files_progress[item.file_idx]
+        fp["ingredients_total"] = max(0, fp["ingredients_total"] - len(item.parsed.ingredients))
+        _put("recipe_skipped", {"name": item.parsed.name, "file": fp["name"], "recipe_id": recipe_id})
+
+    # parse -> resolve -> allergen -> persist -> SKU enqueue, overlapped across recipes and files
+    pipeline = IngestionPipeline(
+        resolve_fn=match_and_normalize,
+        allergen_fn=infer_allergens_from_ingredients,
+        sku_enqueuer=SkuEnqueuer(submit_sku_fetches),
+        postal_code=effective_postal,
+        enqueue_existing=True,
+        on_resolved=_on_resolved,
+        on_ingredient=_on_ingredient,
+        on_skipped=_on_skipped,
+    )
+    with time_span("ingredient.pipeline", files=len(file_contents)):
+        pipeline.run(file_contents)
+    dedupe = pipeline.dedupe_stats()
+
+    logger.info(
+        "recipes.upload.dedupe job=%s lines=%s unique_lines=%s alias_hits=%s resolutions_saved=%s",
+        job_id,
+        dedupe["lines"],
+        dedupe["unique_lines"],
+        dedupe["alias_hits"],
+        dedupe["resolutions_saved"],
+    )
+    # ingested_at starts job_status's SKU coverage timeout
+    _put("upload_complete", {
+        "recipes_created": pipeline.recipes_created,
+        "duplicates_skipped": pipeline.duplicates_skipped,
+        "skipped_recipes": pipeline.skipped,
+        "ingredients_created": pipeline.ingredients_created,
+        "sku_jobs_enqueued": pipeline.sku_jobs,
+        "sku_jobs_coalesced": pipeline.sku_jobs_coalesced,
+        "ingredient_lines": dedupe["lines"],
+        "unique_ingredient_lines": dedupe["unique_lines"],
+        "alias_hits": dedupe["alias_hits"],
+        "lexical_matches": dedupe["lexical_matches"],
+        "resolutions_saved": dedupe["resolutions_saved"],
+        "pipeline": pipeline.stats(),
+        "files": _snapshot(files_progress),
+    }, ingested_at=time.time())
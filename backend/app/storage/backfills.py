@@ -0,0 +1,124 @@
+"""
+Resumable data backfills.
+
+Each backfill walks its table in primary-key order (keyset pagination), commits per batch and
+records its position in backfillstate, so an interrupted run continues where it stopped.
+Run with `python -m app.cli backfill <name>`.
+"""
+
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import exists, update
+from sqlmodel import Session, select
+
+from app.logging import get_logger
+from app.services.parsing.recipe_parser import ParsedRecipe, recipe_content_hash
+from app.storage.models import BackfillState, Ingredient, Recipe, RecipeIngredient, SKU
+from app.storage.repositories import get_recipe_ids_by_content_hash, refresh_price_summaries
+
+logger = get_logger(__name__)
+
+
+def _backfill_sku_unavailable(session: Session, ids: list[int]) -> int:
+    """Mark ingredients with no unexpired SKUs as sku_unavailable (was run on every startup)."""
+    now = datetime.utcnow()
+    has_valid_sku = exists().where(SKU.ingredient_id == Ingredient.id, SKU.expires_at > now)
+    result = session.execute(
+        update(Ingredient)
+        .where(Ingredient.id.in_(ids), Ingredient.sku_unavailable == False, ~has_valid_sku)  # noqa: E712
+        .values(sku_unavailable=True)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def _backfill_price_summary(session: Session, ids: list[int]) -> int:
+    """Build ingredient_price_summary rows for ingredients that had SKUs before the table existed."""
+    return refresh_price_summaries(session, ids)
+
+
+def _backfill_recipe_content_hash(session: Session, ids: list[int]) -> int:
+    """
+    Hash recipes stored before migration 0010 from their stored lines (RecipeIngredient.original_text in
+    insert order). A recipe duplicating an earlier one keeps NULL, so the unique index still holds.
+    """
+    recipes = list(session.exec(select(Recipe).where(Recipe.id.in_(ids), Recipe.content_hash == None)))  # noqa: E711
+    if not recipes:
+        return 0
+    lines: dict[int, list[str]] = {recipe.id: [] for recipe in recipes}
+    links = session.exec(
+        select(RecipeIngredient.recipe_id, RecipeIngredient.original_text)
+        .where(RecipeIngredient.recipe_id.in_(lines))
+        .order_by(RecipeIngredient.id)
+    )
+    for recipe_id, original_text in links:
+        lines[recipe_id].append(original_text)
+    hashes = {
+        recipe.id: recipe_content_hash(
+            ParsedRecipe(recipe.name, recipe.servings, lines[recipe.id], recipe.instructions)
+        )
+        for recipe in recipes
+    }
+    taken = set(get_recipe_ids_by_content_hash(session, hashes.values()))
+    updated = 0
+    for recipe in recipes:
+        if hashes[recipe.id] in taken:
+            continue
+        taken.add(hashes[recipe.id])
+        recipe.content_hash = hashes[recipe.id]
+        session.add(recipe)
+        updated += 1
+    return updated
+
+
+# name -> (model whose integer id is walked, per-batch update)
+BACKFILLS: dict[str, tuple[type, Callable[[Session, list[int]], int]]] = {
+    "sku_unavailable": (Ingredient, _backfill_sku_unavailable),
+    "price_summary": (Ingredient, _backfill_price_summary),
+    "recipe_content_hash": (Recipe, _backfill_recipe_content_hash),
+}
+
+
+def get_backfill_state(session: Session, name: str) -> BackfillState:
+    state = session.get(BackfillState, name)
+    if state is None:
+        state = BackfillState(name=name)
+        session.add(state)
+        session.commit()
+    return state
+
+
+def run_backfill(session: Session, name: str, batch_size: int = 1000, restart: bool = False) -> BackfillState:
+    """Run (or resume) a named backfill to completion. restart=True discards the saved position."""
+    if name not in BACKFILLS:
+        raise KeyError(f"unknown backfill {name!r}; available: {', '.join(sorted(BACKFILLS))}")
+    model, apply_batch = BACKFILLS[name]
+    state = get_backfill_state(session, name)
+    if restart:
+        state.last_id = 0
+        state.rows_updated = 0
+        state.completed_at = None
+    elif state.completed_at is not None:
+        logger.info("backfill.skip name=%s completed_at=%s", name, state.completed_at)
+        return state
+
+    logger.info("backfill.start name=%s from_id=%s batch_size=%s", name, state.last_id, batch_size)
+    while True:
+        ids = list(
+            session.exec(select(model.id).where(model.id > state.last_id).order_by(model.id).limit(batch_size))
+        )
+        if not ids:
+            break
+        updated = apply_batch(session, ids)
+        state.last_id = ids[-1]
+        state.rows_updated += updated
+        state.updated_at = datetime.utcnow()
+        session.add(state)
+        session.commit()
+        logger.info("backfill.batch name=%s last_id=%s updated=%s", name, state.last_id, updated)
+    state.completed_at = datetime.utcnow()
+    session.add(state)
+    session.commit()
+    logger.info("backfill.end name=%s rows_updated=%s", name, state.rows_updated)
+    return state
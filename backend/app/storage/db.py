@@ -1,72 +1,184 @@
-from sqlalchemy import text
+import threading
+import time
+from typing import Iterator
 
-from sqlmodel import SQLModel, Session, create_engine
+from sqlalchemy import exc as sa_exc
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import scoped_session
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, create_engine
 
 from app.config import settings
+from app.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Checkouts slower than this are logged individually.
+SLOW_CHECKOUT_MS = 100
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each connection checkout waited (pool exhaustion shows up here)."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            logger.warning("db.pool.timeout size=%s overflow=%s checked_out=%s", self.size(), self.overflow(), self.checkedout())
+            raise
+        finally:
+            waited_ms = (time.perf_counter() - start) * 1000
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_ms_total += waited_ms
+                self.wait_ms_max = max(self.wait_ms_max, waited_ms)
+                if waited_ms >= SLOW_CHECKOUT_MS:
+                    self.slow_checkouts += 1
+            if waited_ms >= SLOW_CHECKOUT_MS:
+                logger.info("db.pool.slow_checkout wait_ms=%d checked_out=%s", waited_ms, self.checkedout())
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "checkouts": self.checkouts,
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 2) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 2),
+                "slow_checkouts": self.slow_checkouts,
+                "timeouts": self.timeouts,
+            }
+
+
+def _create_engine(dsn: str) -> Engine:
+    return create_engine(
+        dsn,
+        pool_pre_ping=True,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle_s,
+        pool_timeout=settings.db_pool_timeout_s,
+    )
+
+
+engine = _create_engine(settings.postgres_dsn)
+replica_engine: Engine | None = _create_engine(settings.postgres_replica_dsn) if settings.postgres_replica_dsn else None
+
+# Replay lag in seconds; 0 when caught up (receive == replay LSN) or when connected to a primary.
+_REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class ReplicaHealth:
+    """
+    Cached replica health: reachable and replay lag within max_staleness_s.
+    Checked at most once per check_interval_s so read routing adds no per-request round trip.
+    """
+
+    def __init__(self, max_staleness_s: float, check_interval_s: float) -> None:
+        self.max_staleness_s = max_staleness_s
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._usable = False
+        self.lag_s: float | None = None
+
+    def usable(self, replica: Engine) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval_s:
+            return self._usable
+        with self._lock:
+            if now - self._checked_at < self.check_interval_s:
+                return self._usable
+            self._usable = self._check(replica)
+            self._checked_at = time.monotonic()
+            return self._usable
+
+    def stats(self) -> dict:
+        return {"usable": self._usable, "lag_s": self.lag_s, "max_staleness_s": self.max_staleness_s}
+
+    def _check(self, replica: Engine) -> bool:
+        try:
+            with replica.connect() as conn:
+                if replica.dialect.name == "postgresql":
+                    self.lag_s = float(conn.execute(_REPLICA_LAG_SQL).scalar() or 0)
+                else:
+                    conn.execute(text("SELECT 1"))
+                    self.lag_s = 0.0
+        except Exception as exc:  # noqa: BLE001 - any failure means "use the primary"
+            if self._usable or self._checked_at == 0.0:
+                logger.warning("db.replica.unavailable error=%s falling back to primary", exc)
+            self.lag_s = None
+            return False
+        if self.lag_s > self.max_staleness_s:
+            logger.warning("db.replica.stale lag_s=%.1f max=%.1f falling back to primary", self.lag_s, self.max_staleness_s)
+            return False
+        return True
+
+
+replica_health = ReplicaHealth(
+    max_staleness_s=settings.replica_max_staleness_s,
+    check_interval_s=settings.replica_check_interval_s,
+)
 
 
-engine = create_engine(settings.postgres_dsn, pool_pre_ping=True)
-
-
-def create_db_and_tables() -> None:
-    SQLModel.metadata.create_all(engine)
-    _migrate_recipe_meal_type()
-    _migrate_recipe_allergens()
-    _migrate_sku_base_unit()
-    _migrate_ingredient_sku_unavailable()
-
-
-def _migrate_recipe_meal_type() -> None:
-    """Add meal_type column if missing (for existing deployments)."""
-    try:
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE recipe ADD COLUMN IF NOT EXISTS meal_type VARCHAR(32) DEFAULT 'entree'"))
-            conn.commit()
-    except Exception:
-        pass
-
-
-def _migrate_recipe_allergens() -> None:
-    """Add allergens JSON column if missing (for existing deployments)."""
-    try:
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE recipe ADD COLUMN IF NOT EXISTS allergens JSONB DEFAULT NULL"))
-            conn.commit()
-    except Exception:
-        pass
-
-
-def _migrate_sku_base_unit() -> None:
-    """Add quantity_in_base_unit, size_display to sku if missing."""
-    try:
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE sku ADD COLUMN IF NOT EXISTS quantity_in_base_unit DOUBLE PRECISION DEFAULT NULL"))
-            conn.execute(text("ALTER TABLE sku ADD COLUMN IF NOT EXISTS size_display VARCHAR(64) DEFAULT NULL"))
-            conn.commit()
-    except Exception:
-        pass
-
-
-def _migrate_ingredient_sku_unavailable() -> None:
-    """Add sku_unavailable to ingredient if missing (tracks count=0 SKU fetch)."""
-    try:
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE ingredient ADD COLUMN IF NOT EXISTS sku_unavailable BOOLEAN DEFAULT FALSE"))
-            conn.commit()
-            # Backfill: mark ingredients with 0 valid SKUs as unavailable
-            conn.execute(text("""
-                UPDATE ingredient SET sku_unavailable = true
-                WHERE id IN (
-                    SELECT i.id FROM ingredient i
-                    LEFT JOIN sku s ON s.ingredient_id = i.id AND s.expires_at > now()
-                    WHERE s.id IS NULL
-                    AND i.sku_unavailable = false
-                )
-            """))
-            conn.commit()
-    except Exception:
-        pass
+def get_session() -> Session:
+    return Session(engine)
 
 
-def get_session() -> Session:
+def pool_stats() -> dict:
+    """Checkout wait/usage stats for the primary (and replica) pools."""
+    out = {}
+    for name, eng in (("primary", engine), ("replica", replica_engine)):
+        if eng is not None and isinstance(eng.pool, InstrumentedQueuePool):
+            out[name] = eng.pool.stats()
+    return out
+
+
+def get_read_session() -> Session:
+    """
+    Session for read-only endpoints. Uses the replica when configured, reachable and within the
+    staleness tolerance; otherwise the primary. Never write through this session.
+    """
+    if replica_engine is not None and replica_health.usable(replica_engine):
+        return Session(replica_engine)
     return Session(engine)
+
+
+def request_session() -> Iterator[Session]:
+    """FastAPI dependency: one primary session per request, closed when the response is done."""
+    with get_session() as session:
+        yield session
+
+
+def request_read_session() -> Iterator[Session]:
+    """FastAPI dependency: one read session (replica when healthy) per request."""
+    with get_read_session() as session:
+        yield session
+
+
+# Thread-local sessions for worker threads (Celery tasks, background pollers): each thread gets its own
+# Session, reused for the thread's unit of work. Call worker_session.remove() when that work ends.
+worker_session = scoped_session(lambda: get_session())
@@ -0,0 +1,168 @@
+"""
+Write-behind sink for LLMCallLog rows.
+
+LLM calls enqueue their log row and return immediately; a background flusher
+drains the bounded queue and writes batches with a single multi-row INSERT when
+either the batch size or the flush interval is reached. When the queue is full
+rows are dropped (and counted) rather than blocking the caller. Input payload
+encoding (see prompt_payloads) also runs on the flusher thread.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable
+
+from sqlmodel import Session
+
+from app.config import settings
+from app.logging import get_logger
+from app.storage.db import get_session
+from app.storage.prompt_payloads import encode_input_payload
+from app.storage.repositories import log_llm_calls
+from app.utils.counters import Counters
+
+logger = get_logger(__name__)
+
+
+class LLMCallLogSink:
+    """Bounded in-memory queue of LLMCallLog rows plus a background batch flusher."""
+
+    def __init__(
+        self,
+        max_queue: int = 10_000,
+        batch_size: int = 200,
+        flush_interval_s: float = 1.0,
+        session_factory: Callable[[], Session] | None = None,
+    ) -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_s = flush_interval_s
+        self._session_factory = session_factory or get_session
+        self._queue: queue.Queue[dict] = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._counts = Counters("enqueued", "written", "dropped", "failed", "batches")
+
+    def submit(self, **row: object) -> bool:
+        """
+        Queue one row without blocking. Returns False (and counts a drop) when the queue is full.
+        Pass input_kwargs (the raw call kwargs) to have the input stored deduplicated and compressed.
+        """
+        row.setdefault("created_at", datetime.utcnow())
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._counts.record(dropped=1)
+            dropped = self._counts.snapshot()["dropped"]
+            # Log sparsely: every drop under sustained backpressure would flood the logs
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning("llm_log_sink.dropped total=%s queue_max=%s", dropped, self._queue.maxsize)
+            return False
+        self._counts.record(enqueued=1)
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def flush(self) -> int:
+        """Drain everything currently queued and write it. Returns rows written."""
+        total = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return total
+            total += self._write(batch)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the flusher and write whatever is still queued (called on shutdown)."""
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "queue_max": self._queue.maxsize, **self._counts.snapshot()}
+
+    def _ensure_started(self) -> None:
+        # Celery prefork children inherit the object but not the thread; start one per process.
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="llm-log-sink", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self.flush_interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as exc:  # noqa: BLE001 - the flusher must never die
+                logger.warning("llm_log_sink.flush_failed error=%s", exc)
+
+    def _drain(self, limit: int) -> list[dict]:
+        batch: list[dict] = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _prepare(self, batch: list[dict]) -> tuple[list[dict], dict[str, str]]:
+        rows: list[dict] = []
+        blobs: dict[str, str] = {}
+        for raw in batch:
+            row = dict(raw)
+            kwargs = row.pop("input_kwargs", None)
+            row.setdefault("input_payload", "")
+            row["input_compressed"] = None
+            row["input_blob_hashes"] = None
+            if kwargs is not None:
+                compressed, used = encode_input_payload(kwargs)
+                row["input_compressed"] = compressed
+                row["input_blob_hashes"] = sorted(used)
+                # Always sent: the insert skips stored hashes, and a per-process "already written" cache would go
+                # stale when promptblob is truncated (/api/clear) under a running process
+                blobs.update(used)
+            rows.append(row)
+        return rows, blobs
+
+    def _write(self, batch: list[dict]) -> int:
+        start = time.perf_counter()
+        try:
+            rows, blobs = self._prepare(batch)
+            with self._session_factory() as session:
+                log_llm_calls(session, rows, blobs=blobs)
+        except Exception as exc:  # noqa: BLE001 - logging must not break LLM callers
+            self._counts.record(failed=len(batch))
+            logger.warning("llm_log_sink.write_failed rows=%s error=%s", len(batch), exc)
+            return 0
+        self._counts.record(written=len(batch), batches=1)
+        logger.debug(
+            "llm_log_sink.flushed rows=%s elapsed_ms=%s",
+            len(batch),
+            int((time.perf_counter() - start) * 1000),
+        )
+        return len(batch)
+
+
+llm_call_log_sink = LLMCallLogSink(
+    max_queue=settings.llm_log_queue_max,
+    batch_size=settings.llm_log_batch_size,
+    flush_interval_s=settings.llm_log_flush_interval_s,
+)
+atexit.register(llm_call_log_sink.close)
@@ -1,25 +1,48 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON, LargeBinary, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlmodel import Field, SQLModel
 
 
 MEAL_TYPES = ("appetizer", "entree", "dessert", "side")
 
+# JSONB on Postgres (indexable, binary), plain JSON elsewhere (SQLite in tests)
+JSONVariant = JSON().with_variant(JSONB(), "postgresql")
+# tsvector on Postgres; migrations add it there only (info["dialects"]), create_all adds an unused TEXT elsewhere
+TSVectorVariant = Text().with_variant(TSVECTOR(), "postgresql")
+
 
 class Recipe(SQLModel, table=True):
+    # One row per recipe content; uploads and imports skip sections whose hash is already stored.
+    # search_vector (migration 0007) is written and read only in SQL (app.storage.recipe_search), so it is part of
+    # the table but not mapped: select(Recipe) never loads it.
+    __table_args__ = (
+        Index("ux_recipe_content_hash", "content_hash", unique=True),
+        Column("search_vector", TSVectorVariant, nullable=True, info={"dialects": ("postgresql",)}),
+        Index("ix_recipe_search_vector", "search_vector", postgresql_using="gin"),
+    )
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     servings: int
     instructions: str
     source_file: str
     meal_type: str = "entree"  # appetizer | entree | dessert | side
-    allergens: Optional[list] = Field(default=None, sa_column=Column(JSON, default=None))  # set on upload
+    # Set on upload. JSONB + GIN index on Postgres (migration 0008) for exclude_allergens filters
+    allergens: Optional[list] = Field(default=None, sa_column=Column(JSONVariant, default=None))
+    # recipe_parser.recipe_content_hash of the parsed section; NULL for rows predating migration 0010 until
+    # `python -m app.cli backfill recipe_content_hash` fills them in
+    content_hash: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class Ingredient(SQLModel, table=True):
+    # One row per canonical name; get_or_create_ingredients relies on it for ON CONFLICT DO NOTHING
+    __table_args__ = (Index("ux_ingredient_canonical_name", "canonical_name", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     canonical_name: str
@@ -31,16 +54,58 @@ class Ingredient(SQLModel, table=True):
 
 class RecipeIngredient(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    recipe_id: int = Field(foreign_key="recipe.id")
-    ingredient_id: int = Field(foreign_key="ingredient.id")
+    recipe_id: int = Field(foreign_key="recipe.id", index=True)
+    ingredient_id: int = Field(foreign_key="ingredient.id", index=True)
     quantity: float
     unit: str
     original_text: str
 
 
+class IngredientAlias(SQLModel, table=True):
+    """
+    Persistent resolution of one ingredient line, keyed by its normalized text (ingestion.normalize_line):
+    the canonical ingredient plus the unit normalization. Uploads and imports consult it before calling
+    match_ingredient / normalize_units; rows written under other prompt versions are ignored and overwritten.
+    """
+
+    alias_key: str = Field(primary_key=True)
+    ingredient_id: int = Field(foreign_key="ingredient.id", index=True)
+    normalized_qty: float
+    normalized_unit: str
+    base_unit: str
+    base_unit_qty: float = 1.0
+    prompt_version: str
+    hits: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: Optional[datetime] = None
+
+
+class Product(SQLModel, table=True):
+    """
+    One retailer listing (e.g. an Instacart item), shared by every ingredient and postal code it shows up for.
+    SKU rows are the per-ingredient price observations and reference it via product_id.
+    quantity_by_unit caches the parsed size per base unit ({"g": 2267.95}) so convert_sku_size runs once
+    per product and unit instead of on every refresh.
+    """
+
+    __table_args__ = (UniqueConstraint("retailer_slug", "item_id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    retailer_slug: str = ""
+    item_id: str
+    name: str
+    brand: Optional[str] = None
+    size: Optional[str] = None
+    size_display: Optional[str] = None
+    quantity_by_unit: Optional[dict] = Field(default=None, sa_column=Column(JSONVariant, default=None))
+    first_seen_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class SKU(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     ingredient_id: int = Field(foreign_key="ingredient.id")
+    product_id: Optional[int] = Field(default=None, foreign_key="product.id", index=True)
     name: str
     brand: Optional[str] = None
     size: Optional[str] = None
@@ -54,11 +119,43 @@ class SKU(SQLModel, table=True):
     expires_at: datetime
 
 
+class IngredientPriceSummary(SQLModel, table=True):
+    """
+    Cheapest option per (ingredient, retailer, postal_code) over unexpired SKUs.
+    Maintained incrementally on SKU writes/deletes and by the expiry sweep; see refresh_price_summaries.
+    """
+
+    __tablename__ = "ingredient_price_summary"
+    __table_args__ = (UniqueConstraint("ingredient_id", "retailer_slug", "postal_code"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    ingredient_id: int = Field(foreign_key="ingredient.id")
+    retailer_slug: str = ""  # "" when the SKU had no retailer
+    postal_code: str = ""
+    min_price_per_base_unit: Optional[float] = None  # price / quantity_in_base_unit of cheapest SKU
+    min_price_sku_id: Optional[int] = None
+    min_price: Optional[float] = None
+    sku_count: int = 0
+    fetched_at: datetime  # most recent SKU fetch in the group
+    expires_at: datetime  # latest SKU expiry in the group; row is stale after this
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class MenuPlan(SQLModel, table=True):
+    __table_args__ = (Index("ix_menuplan_fingerprint_created_at", "request_fingerprint", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     target_servings: int
-    plan_payload: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    plan_payload: Optional[str] = None  # legacy Python repr; new rows use payload
+    request_fingerprint: Optional[str] = None  # sha256 of the normalized PlanRequest
+    request: Optional[dict] = Field(default=None, sa_column=Column(JSONVariant, default=None))
+    payload: Optional[dict] = Field(default=None, sa_column=Column(JSONVariant, default=None))
+    status: Optional[str] = None
+    objective: Optional[float] = None
+    solve_ms: Optional[int] = None  # ILP solve time, summed over overseer re-solves
+    total_ms: Optional[int] = None  # /plan wall time up to persisting this row
+    catalog_version: Optional[str] = None  # see get_catalog_version
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
 
 class LLMCallLog(SQLModel, table=True):
@@ -66,7 +163,27 @@ class LLMCallLog(SQLModel, table=True):
     prompt_name: str
     prompt_version: str
     model: str
-    input_payload: str
+    input_payload: str = ""  # legacy str(kwargs); empty when input_compressed is set
+    input_blob_hashes: Optional[list] = Field(default=None, sa_column=Column(JSON, default=None))  # promptblob refs
+    input_compressed: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, default=None))  # zlib JSON
     output_payload: str
     latency_ms: int
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class PromptBlob(SQLModel, table=True):
+    """Static prompt context (templates, ontology) stored once, keyed by sha256 of content."""
+
+    hash: str = Field(primary_key=True, max_length=64)
+    content: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class BackfillState(SQLModel, table=True):
+    """Checkpoint for a resumable data backfill: keyset position, progress and completion."""
+
+    name: str = Field(primary_key=True)
+    last_id: int = 0
+    rows_updated: int = 0
+    completed_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,120 @@
+"""
+Compact encoding of LLMCallLog input payloads.
+
+Static prompt context (templates, the unit ontology) is content-addressed: each fragment is stored
+once in promptblob keyed by its sha256 and replaced in the logged kwargs by a short token. The
+remaining variable inputs are JSON-encoded and zlib-compressed onto the log row.
+"""
+
+import hashlib
+import json
+import re
+import string
+import zlib
+from typing import Any, Iterable
+
+from app.services.llm.prompts import STATIC_PROMPT_CONTEXT, STATIC_PROMPT_TEMPLATES
+
+# Literal template chunks shorter than this are not worth a blob reference
+MIN_FRAGMENT_CHARS = 48
+
+_TOKEN_RE = re.compile(r"\x00blob:([0-9a-f]{64})\x00")
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _token(blob_hash: str) -> str:
+    return f"\x00blob:{blob_hash}\x00"
+
+
+def template_fragments(template: str) -> list[str]:
+    """Literal (non-placeholder) chunks of a str.format template, as they appear after formatting."""
+    chunks = []
+    for literal, _field, _spec, _conv in string.Formatter().parse(template):
+        if literal and len(literal.strip()) >= MIN_FRAGMENT_CHARS:
+            chunks.append(literal)
+    return chunks
+
+
+def _build_fragments(templates: Iterable[str], context: Iterable[str]) -> list[tuple[str, str]]:
+    fragments: dict[str, str] = {}
+    for text in context:
+        fragments[content_hash(text)] = text
+    for template in templates:
+        try:
+            chunks = template_fragments(template)
+        except ValueError:
+            # Not a format template (e.g. contains stray braces); store it verbatim
+            chunks = [template]
+        for chunk in chunks:
+            fragments[content_hash(chunk)] = chunk
+    # Longest first so a fragment is never split by a shorter one contained in it
+    return sorted(fragments.items(), key=lambda kv: len(kv[1]), reverse=True)
+
+
+_FRAGMENTS = _build_fragments(STATIC_PROMPT_TEMPLATES, STATIC_PROMPT_CONTEXT)
+
+
+def _substitute(value: Any, used: dict[str, str]) -> Any:
+    if isinstance(value, str):
+        for blob_hash, fragment in _FRAGMENTS:
+            if fragment in value:
+                value = value.replace(fragment, _token(blob_hash))
+                used[blob_hash] = fragment
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_substitute(v, used) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _substitute(v, used) for k, v in value.items()}
+    return value
+
+
+def encode_input_payload(kwargs: dict) -> tuple[bytes, dict[str, str]]:
+    """
+    Encode LLM call kwargs for storage.
+    Returns (compressed variable payload, {blob_hash: static content} referenced by it).
+    """
+    used: dict[str, str] = {}
+    doc = {str(k): _substitute(v, used) for k, v in kwargs.items()}
+    raw = json.dumps(doc, default=str, separators=(",", ":"))
+    return zlib.compress(raw.encode("utf-8"), 6), used
+
+
+class MissingPromptBlobError(LookupError):
+    """A logged payload references prompt blobs that are no longer stored (e.g. promptblob was cleared)."""
+
+    def __init__(self, hashes: set[str]) -> None:
+        self.hashes = sorted(hashes)
+        super().__init__(f"missing prompt blobs: {', '.join(self.hashes)}")
+
+
+def _expand(value: Any, blobs: dict[str, str], missing: set[str]) -> Any:
+    if isinstance(value, str):
+
+        def _sub(m: re.Match) -> str:
+            if m.group(1) not in blobs:
+                missing.add(m.group(1))
+                return m.group(0)
+            return blobs[m.group(1)]
+
+        return _TOKEN_RE.sub(_sub, value)
+    if isinstance(value, list):
+        return [_expand(v, blobs, missing) for v in value]
+    if isinstance(value, dict):
+        return {k: _expand(v, blobs, missing) for k, v in value.items()}
+    return value
+
+
+def decode_input_payload(compressed: bytes, blobs: dict[str, str]) -> dict:
+    """
+    Inverse of encode_input_payload: decompress and re-inline static blobs.
+    Raises MissingPromptBlobError when a referenced blob is not in blobs.
+    """
+    doc = json.loads(zlib.decompress(compressed).decode("utf-8"))
+    missing: set[str] = set()
+    out = _expand(doc, blobs, missing)
+    if missing:
+        raise MissingPromptBlobError(missing)
+    return out
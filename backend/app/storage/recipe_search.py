@@ -0,0 +1,153 @@
+"""
+Recipe search: Postgres full-text (recipe.search_vector) plus pg_trgm fuzzy name matching.
+
+search_vector is a Postgres-only column (migration 0007; declared on the recipe table but not mapped on
+Recipe), weighted name (A) > ingredient names (B) > instructions (C). It is refreshed by the repository write path whenever a recipe or its ingredient
+links are created. Off Postgres (SQLite in tests) search falls back to LIKE matching with the same
+filters and response shape.
+
+Allergen exclusion is pushed into SQL for every recipe listing (see exclude_allergens_clause):
+recipe.allergens is JSONB with a GIN index on Postgres (migration 0008).
+"""
+
+from sqlalchemy import Text, case, exists, func, or_, text
+from sqlalchemy.dialects.postgresql import array
+from sqlmodel import Session, select
+
+from app.storage.models import Ingredient, Recipe, RecipeIngredient
+
+SEARCH_CONFIG = "english"
+
+_REFRESH_SQL = text(
+    f"""
+    UPDATE recipe r SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(r.name, '')), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+            SELECT string_agg(i.canonical_name, ' ')
+            FROM recipeingredient ri JOIN ingredient i ON i.id = ri.ingredient_id
+            WHERE ri.recipe_id = r.id
+        ), '')), 'B')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(r.instructions, '')), 'C')
+    WHERE r.id = ANY(:ids)
+    """
+)
+
+# name % :q / canonical_name % :q are pg_trgm similarity matches (threshold pg_trgm.similarity_threshold,
+# default 0.3) served by the gin_trgm_ops indexes; search_vector @@ query by the GIN index on search_vector.
+_MATCH_SQL = f"""
+    FROM recipe r, websearch_to_tsquery('{SEARCH_CONFIG}', :q) AS q(query)
+    WHERE (
+        r.search_vector @@ q.query
+        OR r.name % :q
+        OR r.id IN (
+            SELECT ri.recipe_id FROM recipeingredient ri JOIN ingredient i ON i.id = ri.ingredient_id
+            WHERE i.canonical_name % :q
+        )
+    )
+      {{filters}}
+"""
+# search_vector is NULL until refresh_recipe_search_vectors runs; an uncoalesced NULL rank would sort first under DESC
+_SEARCH_SQL = f"""
+    SELECT r.id, r.name, r.servings, r.meal_type, r.allergens, r.source_file,
+           coalesce(ts_rank(r.search_vector, q.query), 0) + similarity(r.name, :q) AS score,
+           count(*) OVER () AS total
+    {_MATCH_SQL}
+    ORDER BY score DESC, r.id
+    LIMIT :limit OFFSET :offset
+"""
+# count(*) OVER () has no row to ride on past the last page; those requests count separately
+_COUNT_SQL = f"SELECT count(*) {_MATCH_SQL}"
+
+
+def _is_postgres(session: Session) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def exclude_allergens_clause(session: Session, excluded: list[str]):
+    """
+    WHERE clause keeping recipes with none of the excluded allergen codes (or no allergens recorded).
+    Postgres: NOT (allergens ?| ARRAY[...]), the jsonb overlap operator; SQLite: NOT EXISTS over json_each.
+    """
+    if _is_postgres(session):
+        overlaps = Recipe.allergens.op("?|", is_comparison=True)(array(excluded, type_=Text))
+        return or_(Recipe.allergens.is_(None), ~overlaps)
+    codes = func.json_each(Recipe.allergens).table_valued("value")
+    return ~exists().where(codes.c.value.in_(excluded))
+
+
+def refresh_recipe_search_vectors(session: Session, recipe_ids: list[int]) -> None:
+    """Recompute search_vector for these recipes (Postgres only; no-op elsewhere). Does not commit."""
+    if recipe_ids and _is_postgres(session):
+        session.execute(_REFRESH_SQL, {"ids": list(set(recipe_ids))})
+
+
+def search_recipes(
+    session: Session,
+    q: str,
+    meal_type: str | None = None,
+    exclude_allergens: list[str] | None = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> tuple[list[dict], int]:
+    """
+    Ranked recipe matches for q (name, ingredient names, instructions; fuzzy on name).
+    Filters run in the same query. Returns (page of rows without instructions, total matches).
+    """
+    if _is_postgres(session):
+        return _search_postgres(session, q, meal_type, exclude_allergens, limit, offset)
+    return _search_fallback(session, q, meal_type, exclude_allergens, limit, offset)
+
+
+def _search_postgres(session, q, meal_type, exclude_allergens, limit, offset) -> tuple[list[dict], int]:
+    filters = []
+    params = {"q": q, "limit": limit, "offset": offset}
+    if meal_type:
+        filters.append("AND r.meal_type = :meal_type")
+        params["meal_type"] = meal_type
+    if exclude_allergens:
+        filters.append("AND NOT (coalesce(r.allergens, '[]'::jsonb) ?| CAST(:excluded AS text[]))")
+        params["excluded"] = list(exclude_allergens)
+    rows = session.execute(text(_SEARCH_SQL.format(filters=" ".join(filters))), params).mappings().all()
+    if rows:
+        total = rows[0]["total"]
+    elif offset:
+        count_params = {k: v for k, v in params.items() if k not in ("limit", "offset")}
+        total = session.execute(text(_COUNT_SQL.format(filters=" ".join(filters))), count_params).scalar_one()
+    else:
+        total = 0
+    return [_row(r, round(float(r["score"]), 4)) for r in rows], total
+
+
+def _search_fallback(session, q, meal_type, exclude_allergens, limit, offset) -> tuple[list[dict], int]:
+    pattern = f"%{q.strip().lower()}%"
+    in_name = func.lower(Recipe.name).like(pattern)
+    in_ingredients = exists().where(
+        RecipeIngredient.recipe_id == Recipe.id,
+        RecipeIngredient.ingredient_id == Ingredient.id,
+        func.lower(Ingredient.canonical_name).like(pattern),
+    )
+    in_instructions = func.lower(Recipe.instructions).like(pattern)
+    score = case((in_name, 1.0), else_=0.0) + case((in_ingredients, 0.4), else_=0.0) + case((in_instructions, 0.1), else_=0.0)
+    stmt = (
+        select(Recipe.id, Recipe.name, Recipe.servings, Recipe.meal_type, Recipe.allergens, Recipe.source_file, score.label("score"))
+        .where(or_(in_name, in_ingredients, in_instructions))
+        .order_by(score.desc(), Recipe.id)
+    )
+    if meal_type:
+        stmt = stmt.where(Recipe.meal_type == meal_type)
+    if exclude_allergens:
+        stmt = stmt.where(exclude_allergens_clause(session, list(exclude_allergens)))
+    rows = session.execute(stmt).mappings().all()
+    return [_row(r, r["score"]) for r in rows[offset : offset + limit]], len(rows)
+
+
+def _row(r, score: float) -> dict:
+    return {
+        "id": r["id"],
+        "name": r["name"],
+        "servings": r["servings"],
+        "meal_type": r["meal_type"],
+        "allergens": r["allergens"] or [],
+        "source_file": r["source_file"],
+        "score": score,
+    }
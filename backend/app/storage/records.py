@@ -0,0 +1,55 @@
+"""
+Lightweight read records for column-projection queries.
+
+Full-table reads (catalog listings, refresh sweeps, progress polling) select only these columns
+instead of hydrating ORM objects with instructions text and JSON columns nobody reads. Field names
+match the model attributes so callers can use them interchangeably with the ORM rows.
+"""
+
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+
+class IngredientRef(NamedTuple):
+    id: int
+    canonical_name: str
+
+
+class IngredientRow(NamedTuple):
+    id: int
+    name: str
+    canonical_name: str
+    base_unit: str
+    sku_unavailable: bool
+
+
+class RecipeIngredientLink(NamedTuple):
+    recipe_id: int
+    ingredient_id: int
+
+
+class SkuRow(NamedTuple):
+    """SKU columns shown in catalog listings."""
+
+    id: int
+    ingredient_id: int
+    name: str
+    brand: Optional[str]
+    size: Optional[str]
+    size_display: Optional[str]
+    price: Optional[float]
+    quantity_in_base_unit: Optional[float]
+    retailer_slug: Optional[str]
+
+
+class SkuPriceRow(NamedTuple):
+    """SKU columns needed to compute price summaries."""
+
+    id: int
+    ingredient_id: int
+    retailer_slug: Optional[str]
+    postal_code: Optional[str]
+    price: Optional[float]
+    quantity_in_base_unit: Optional[float]
+    fetched_at: datetime
+    expires_at: datetime
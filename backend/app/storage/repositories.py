@@ -1,32 +1,188 @@
 from datetime import datetime, timedelta
-from typing import Iterable, Optional
+from typing import Iterable, Iterator, Optional, TypeVar
 
+from sqlalchemy import delete, exists, func, insert, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Session, select
 
 from app.config import settings
 from app.logging import get_logger
-from app.storage.models import Ingredient, LLMCallLog, MenuPlan, Recipe, RecipeIngredient, SKU
+from app.storage.models import (
+    BackfillState,
+    Ingredient,
+    IngredientAlias,
+    IngredientPriceSummary,
+    LLMCallLog,
+    MenuPlan,
+    Product,
+    PromptBlob,
+    Recipe,
+    RecipeIngredient,
+    SKU,
+)
+from app.storage.prompt_payloads import decode_input_payload
+from app.storage.recipe_search import refresh_recipe_search_vectors
+from app.storage.records import (
+    IngredientRef,
+    IngredientRow,
+    RecipeIngredientLink,
+    SkuPriceRow,
+    SkuRow,
+)
 
 logger = get_logger(__name__)
 
+# Rows fetched per round trip when streaming large projections (server-side cursor on Postgres).
+STREAM_BATCH_SIZE = 1000
+
+_R = TypeVar("_R", bound=tuple)
+
+
+def _upsert_insert(session: Session, model):
+    """Dialect-specific INSERT supporting ON CONFLICT (Postgres in prod, SQLite in tests)."""
+    if session.get_bind().dialect.name == "postgresql":
+        return pg_insert(model)
+    return sqlite_insert(model)
+
+
+def _project(model, record: type[_R]):
+    """SELECT only the model columns named by the record's fields."""
+    return select(*(getattr(model, field) for field in record._fields))
+
+
+def _stream(session: Session, stmt, record: type[_R]) -> Iterator[_R]:
+    """
+    Yield records in STREAM_BATCH_SIZE chunks. yield_per enables a server-side cursor on Postgres so
+    large scans do not buffer the whole result; consume the iterator before the session closes.
+    """
+    for row in session.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE)):
+        yield record._make(row)
+
+
+def iter_ingredient_rows(session: Session, ingredient_ids: Iterable[int] | None = None) -> Iterator[IngredientRow]:
+    stmt = _project(Ingredient, IngredientRow).order_by(Ingredient.id)
+    if ingredient_ids is not None:
+        stmt = stmt.where(Ingredient.id.in_(set(ingredient_ids)))
+    return _stream(session, stmt, IngredientRow)
+
+
+def iter_recipe_ingredient_links(session: Session) -> Iterator[RecipeIngredientLink]:
+    return _stream(session, _project(RecipeIngredient, RecipeIngredientLink), RecipeIngredientLink)
+
+
+def iter_active_sku_rows(session: Session, ingredient_ids: Iterable[int] | None = None) -> Iterator[SkuRow]:
+    """Unexpired SKUs (expiry filtered in SQL), display columns only."""
+    stmt = _project(SKU, SkuRow).where(SKU.expires_at > datetime.utcnow()).order_by(SKU.id)
+    if ingredient_ids is not None:
+        stmt = stmt.where(SKU.ingredient_id.in_(set(ingredient_ids)))
+    return _stream(session, stmt, SkuRow)
+
+
+def get_ingredient_ids_with_active_skus(session: Session, ingredient_ids: Iterable[int] | None = None) -> set[int]:
+    stmt = select(SKU.ingredient_id).where(SKU.expires_at > datetime.utcnow())
+    if ingredient_ids is not None:
+        stmt = stmt.where(SKU.ingredient_id.in_(set(ingredient_ids)))
+    return set(session.exec(stmt.distinct()))
+
+
+def get_unavailable_ingredient_ids(session: Session, ingredient_ids: Iterable[int] | None = None) -> set[int]:
+    stmt = select(Ingredient.id).where(Ingredient.sku_unavailable == True)  # noqa: E712
+    if ingredient_ids is not None:
+        stmt = stmt.where(Ingredient.id.in_(set(ingredient_ids)))
+    return set(session.exec(stmt))
+
+
+def count_rows(session: Session, model) -> int:
+    return session.exec(select(func.count()).select_from(model)).one()
+
+
+def estimate_rows(session: Session, model) -> int:
+    """
+    Planner row estimate from pg_class.reltuples (maintained by VACUUM/ANALYZE; no table scan).
+    Falls back to COUNT(*) off Postgres or when the table has never been analyzed (reltuples < 0).
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        estimate = session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": model.__tablename__},
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    return count_rows(session, model)
+
+
+def get_catalog_stats(session: Session, estimate: bool = False) -> dict:
+    """
+    Catalog counts via COUNT(*) (or reltuples estimates for the large tables when estimate=True).
+    Active-SKU coverage is always exact: it depends on expires_at, which estimates cannot see.
+    """
+    count = estimate_rows if estimate else count_rows
+    return {
+        "recipes": count(session, Recipe),
+        "ingredients": count(session, Ingredient),
+        "recipe_ingredients": count(session, RecipeIngredient),
+        "skus": count(session, SKU),
+        "ingredients_with_skus": session.exec(
+            select(func.count(func.distinct(SKU.ingredient_id))).where(SKU.expires_at > datetime.utcnow())
+        ).one(),
+        "ingredients_sku_unavailable": session.exec(
+            select(func.count()).select_from(Ingredient).where(Ingredient.sku_unavailable == True)  # noqa: E712
+        ).one(),
+        "estimated": estimate,
+    }
+
 
 def create_recipe(session: Session, recipe: Recipe) -> Recipe:
     session.add(recipe)
+    session.flush()
+    refresh_recipe_search_vectors(session, [recipe.id])
     session.commit()
     session.refresh(recipe)
     logger.info("recipe.created id=%s name=%s servings=%s", recipe.id, recipe.name, recipe.servings)
     return recipe
 
 
+def get_recipe_ids_by_content_hash(session: Session, hashes: Iterable[str]) -> dict[str, int]:
+    """content_hash -> recipe id for the hashes already stored."""
+    keys = set(hashes)
+    if not keys:
+        return {}
+    rows = session.exec(select(Recipe.content_hash, Recipe.id).where(Recipe.content_hash.in_(keys)))
+    return {content_hash: recipe_id for content_hash, recipe_id in rows}
+
+
 def create_recipe_ingredients(
     session: Session, recipe_ingredients: Iterable[RecipeIngredient]
 ) -> None:
     items = list(recipe_ingredients)
     session.add_all(items)
+    session.flush()
+    refresh_recipe_search_vectors(session, [ri.recipe_id for ri in items])
     session.commit()
     logger.info("recipe_ingredients.created count=%s", len(items))
 
 
+def bulk_insert_recipes(session: Session, rows: list[dict]) -> list[int]:
+    """
+    Insert many recipes in one executemany INSERT ... RETURNING id; ids come back in row order.
+    Rows need every non-null column (created_at included). Does not commit.
+    """
+    if not rows:
+        return []
+    stmt = insert(Recipe).returning(Recipe.id, sort_by_parameter_order=True)
+    return list(session.scalars(stmt, rows))
+
+
+def bulk_insert_recipe_ingredients(session: Session, rows: list[dict]) -> int:
+    """Insert recipe-ingredient links in one executemany and refresh the recipes' search vectors. Does not commit."""
+    if not rows:
+        return 0
+    session.execute(insert(RecipeIngredient), rows)
+    refresh_recipe_search_vectors(session, [row["recipe_id"] for row in rows])
+    return len(rows)
+
+
 def get_ingredients(session: Session) -> list[Ingredient]:
     return list(session.exec(select(Ingredient)))
 
@@ -47,21 +203,199 @@ def set_ingredient_sku_unavailable(session: Session, ingredient_id: int, unavail
 def get_or_create_ingredient(
     session: Session, name: str, canonical_name: str, base_unit: str, base_unit_qty: float
 ) -> Ingredient:
-    ingredient = session.exec(
-        select(Ingredient).where(Ingredient.canonical_name == canonical_name)
-    ).first()
-    if ingredient:
-        return ingredient
-    ingredient = Ingredient(
-        name=name,
-        canonical_name=canonical_name,
-        base_unit=base_unit,
-        base_unit_qty=base_unit_qty,
+    ingredients, _ = get_or_create_ingredients(
+        session,
+        [{"name": name, "canonical_name": canonical_name, "base_unit": base_unit, "base_unit_qty": base_unit_qty}],
+    )
+    return ingredients[canonical_name]
+
+
+def get_or_create_ingredients(
+    session: Session, rows: list[dict], commit: bool = True
+) -> tuple[dict[str, Ingredient], set[str]]:
+    """
+    Race-free batch get-or-create keyed on the unique canonical_name.
+    rows: dicts with name, canonical_name, base_unit, base_unit_qty (first row wins per canonical_name).
+    One INSERT ... ON CONFLICT (canonical_name) DO NOTHING RETURNING for the batch, then one SELECT.
+    Concurrent uploads inserting the same name get the existing row instead of a duplicate; rows are inserted in
+    canonical_name order so two uploads with overlapping names take the unique-index locks in the same order and
+    cannot deadlock. Returns (canonical_name -> Ingredient, canonical names inserted by this call). Commits unless commit=False
+    (the caller's unit of work commits; concurrent inserts of the same names wait for it).
+    """
+    by_name: dict[str, dict] = {}
+    for row in rows:
+        by_name.setdefault(row["canonical_name"], row)
+    if not by_name:
+        return {}, set()
+    now = datetime.utcnow()
+    values = [
+        {
+            "name": row["name"],
+            "canonical_name": canonical_name,
+            "base_unit": row["base_unit"],
+            "base_unit_qty": row["base_unit_qty"],
+            "created_at": now,
+            "sku_unavailable": False,
+        }
+        for canonical_name, row in sorted(by_name.items())
+    ]
+    stmt = (
+        _upsert_insert(session, Ingredient)
+        .values(values)
+        .on_conflict_do_nothing(index_elements=["canonical_name"])
+        .returning(Ingredient.canonical_name)
     )
-    session.add(ingredient)
+    created = set(session.execute(stmt).scalars())
+    if commit:
+        session.commit()
+    ingredients = {
+        i.canonical_name: i
+        for i in session.exec(select(Ingredient).where(Ingredient.canonical_name.in_(by_name)))
+    }
+    return ingredients, created
+
+
+def merge_duplicate_ingredients(session: Session) -> dict:
+    """
+    Collapse ingredients sharing a canonical_name onto the lowest id: repoint RecipeIngredient, SKU and
+    IngredientAlias rows, drop the duplicates and recompute the survivors' price summaries. Commits.
+    Needed for databases populated before the unique index (migration 0005 does the same in SQL).
+    """
+    groups = session.exec(
+        select(Ingredient.canonical_name, func.min(Ingredient.id))
+        .group_by(Ingredient.canonical_name)
+        .having(func.count() > 1)
+    ).all()
+    merged = 0
+    for canonical_name, keeper_id in groups:
+        dup_ids = list(
+            session.exec(
+                select(Ingredient.id).where(Ingredient.canonical_name == canonical_name, Ingredient.id != keeper_id)
+            )
+        )
+        for model in (RecipeIngredient, SKU, IngredientAlias):
+            session.execute(update(model).where(model.ingredient_id.in_(dup_ids)).values(ingredient_id=keeper_id))
+        session.execute(delete(IngredientPriceSummary).where(IngredientPriceSummary.ingredient_id.in_(dup_ids)))
+        session.execute(delete(Ingredient).where(Ingredient.id.in_(dup_ids)))
+        refresh_price_summaries(session, [keeper_id])
+        has_active_sku = session.exec(
+            select(SKU.id).where(SKU.ingredient_id == keeper_id, SKU.expires_at > datetime.utcnow()).limit(1)
+        ).first()
+        if has_active_sku is not None:
+            session.execute(update(Ingredient).where(Ingredient.id == keeper_id).values(sku_unavailable=False))
+        merged += len(dup_ids)
+        logger.info("ingredient.merged name=%s keeper_id=%s duplicate_ids=%s", canonical_name, keeper_id, dup_ids)
     session.commit()
-    session.refresh(ingredient)
-    return ingredient
+    return {"groups": len(groups), "merged": merged}
+
+
+# Bound IN-list sizes (SQLite caps bound parameters per statement)
+ALIAS_LOOKUP_CHUNK = 500
+
+
+def get_ingredient_aliases(session: Session, keys: Iterable[str]) -> list[tuple[IngredientAlias, str]]:
+    """(alias, canonical_name of its ingredient) for the given alias keys, any prompt version."""
+    keys = list(set(keys))
+    out = []
+    for i in range(0, len(keys), ALIAS_LOOKUP_CHUNK):
+        chunk = keys[i : i + ALIAS_LOOKUP_CHUNK]
+        out.extend(
+            session.exec(
+                select(IngredientAlias, Ingredient.canonical_name)
+                .join(Ingredient, Ingredient.id == IngredientAlias.ingredient_id)
+                .where(IngredientAlias.alias_key.in_(chunk))
+            ).all()
+        )
+    return out
+
+
+def record_ingredient_alias_hits(session: Session, keys: Iterable[str]) -> None:
+    """Bump hits and last_used_at for aliases that answered a lookup. Does not commit."""
+    keys = list(set(keys))
+    now = datetime.utcnow()
+    for i in range(0, len(keys), ALIAS_LOOKUP_CHUNK):
+        session.execute(
+            update(IngredientAlias)
+            .where(IngredientAlias.alias_key.in_(keys[i : i + ALIAS_LOOKUP_CHUNK]))
+            .values(hits=IngredientAlias.hits + 1, last_used_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def upsert_ingredient_aliases(session: Session, rows: list[dict]) -> int:
+    """
+    Insert or replace aliases keyed on alias_key (rows: alias_key, ingredient_id, normalized_qty,
+    normalized_unit, base_unit, base_unit_qty, prompt_version). Replacing keeps the hit count. Does not commit.
+    """
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    values = [{**row, "hits": 0, "created_at": now} for row in {row["alias_key"]: row for row in rows}.values()]
+    stmt = _upsert_insert(session, IngredientAlias).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["alias_key"],
+        set_={
+            field: getattr(stmt.excluded, field)
+            for field in (
+                "ingredient_id",
+                "normalized_qty",
+                "normalized_unit",
+                "base_unit",
+                "base_unit_qty",
+                "prompt_version",
+                "created_at",
+            )
+        },
+    )
+    session.execute(stmt)
+    return len(values)
+
+
+def get_products(session: Session, keys: Iterable[tuple[str, str]]) -> dict[tuple[str, str], Product]:
+    """Products by (retailer_slug, item_id)."""
+    keys = set(keys)
+    if not keys:
+        return {}
+    item_ids = {item_id for _, item_id in keys}
+    products = session.exec(select(Product).where(Product.item_id.in_(item_ids)))
+    return {(p.retailer_slug, p.item_id): p for p in products if (p.retailer_slug, p.item_id) in keys}
+
+
+def upsert_products(session: Session, rows: list[dict]) -> dict[tuple[str, str], int]:
+    """
+    Insert or refresh products keyed by (retailer_slug, item_id) in one statement.
+    rows: retailer_slug, item_id, name, brand, size, size_display, quantity_by_unit (full dict; callers merge).
+    Returns (retailer_slug, item_id) -> product id. Does not commit.
+    """
+    by_key: dict[tuple[str, str], dict] = {}
+    for row in rows:
+        by_key[(row.get("retailer_slug") or "", row["item_id"])] = row
+    if not by_key:
+        return {}
+    now = datetime.utcnow()
+    values = [
+        {
+            "retailer_slug": slug,
+            "item_id": item_id,
+            "name": row.get("name") or "",
+            "brand": row.get("brand"),
+            "size": row.get("size"),
+            "size_display": row.get("size_display"),
+            "quantity_by_unit": row.get("quantity_by_unit"),
+            "first_seen_at": now,
+            "updated_at": now,
+        }
+        for (slug, item_id), row in by_key.items()
+    ]
+    stmt = _upsert_insert(session, Product).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["retailer_slug", "item_id"],
+        set_={
+            col: getattr(stmt.excluded, col)
+            for col in ("name", "brand", "size", "size_display", "quantity_by_unit", "updated_at")
+        },
+    ).returning(Product.retailer_slug, Product.item_id, Product.id)
+    return {(slug, item_id): product_id for slug, item_id, product_id in session.execute(stmt)}
 
 
 def upsert_skus(
@@ -74,6 +408,7 @@ def upsert_skus(
         slug = sku.get("retailer_slug") or retailer_slug
         model = SKU(
             ingredient_id=ingredient_id,
+            product_id=sku.get("product_id"),
             name=sku.get("name", ""),
             brand=sku.get("brand"),
             size=sku.get("size"),
@@ -87,6 +422,8 @@ def upsert_skus(
         )
         session.add(model)
         created.append(model)
+    session.flush()
+    refresh_price_summaries(session, [ingredient_id])
     session.commit()
     for sku in created:
         session.refresh(sku)
@@ -111,7 +448,7 @@ def get_active_skus(session: Session, ingredient_id: int) -> list[SKU]:
     )
 
 
-def delete_skus_for_ingredients(session: Session, ingredient_ids: list[int]) -> int:
+def delete_skus_for_ingredients(session: Session, ingredient_ids: list[int], commit: bool = True) -> int:
     """
     Delete all SKU rows for the given ingredient IDs. Use to reset/re-fetch prices.
     Leaves Recipe/Ingredient/RecipeIngredient intact. Returns count deleted.
@@ -119,39 +456,219 @@ def delete_skus_for_ingredients(session: Session, ingredient_ids: list[int]) ->
     if not ingredient_ids:
         return 0
     ids_set = set(ingredient_ids)
-    skus = list(session.exec(select(SKU).where(SKU.ingredient_id.in_(ids_set))))
-    for s in skus:
-        session.delete(s)
-    session.commit()
-    return len(skus)
+    deleted = session.execute(delete(SKU).where(SKU.ingredient_id.in_(ids_set))).rowcount
+    refresh_price_summaries(session, list(ids_set))
+    if commit:
+        session.commit()
+    return deleted
+
+
+def price_summary_backfilled(session: Session) -> bool:
+    """Whether ingredient_price_summary covers all SKUs (`backfill price_summary` done, or nothing to backfill)."""
+    state = session.get(BackfillState, "price_summary")
+    return state is not None and state.completed_at is not None
 
 
 def get_ingredients_needing_sku_refresh(
     session: Session, ingredient_ids: list[int] | None = None
-) -> list[Ingredient]:
+) -> list[IngredientRef]:
     """
-    Ingredients that have no valid (expires_at > now) SKUs.
+    Ingredients (id, canonical_name) that have no valid (expires_at > now) SKUs.
     Use for TTL-based refresh: when prices expire, we re-fetch.
     Optionally filter to specific ingredient_ids.
+    Reads ingredient_price_summary (one row per live ingredient/retailer/postal) instead of scanning SKUs.
+    Until the price_summary backfill has completed, SKUs from before the table existed have no summary row, so
+    an ingredient also needs a refresh only when it has no valid SKU either.
+    """
+    now = datetime.utcnow()
+    has_live_summary = exists().where(
+        IngredientPriceSummary.ingredient_id == Ingredient.id,
+        IngredientPriceSummary.expires_at > now,
+    )
+    stmt = _project(Ingredient, IngredientRef).where(~has_live_summary)
+    if not price_summary_backfilled(session):
+        has_valid_sku = exists().where(SKU.ingredient_id == Ingredient.id, SKU.expires_at > now)
+        stmt = stmt.where(~has_valid_sku)
+    if ingredient_ids is not None:
+        stmt = stmt.where(Ingredient.id.in_(set(ingredient_ids)))
+    return list(_stream(session, stmt, IngredientRef))
+
+
+def refresh_price_summaries(session: Session, ingredient_ids: list[int]) -> int:
+    """
+    Recompute ingredient_price_summary rows for the given ingredients from their unexpired SKUs.
+    Incremental: only touches these ingredients. Rows are upserted on (ingredient_id, retailer_slug,
+    postal_code) and only groups with no unexpired SKU left are deleted, so concurrent refreshes of the
+    same ingredient (SKU fetches for other postal codes, overseer corrections) don't collide on the
+    unique constraint. Does not commit. Returns summary rows written.
+    """
+    if not ingredient_ids:
+        return 0
+    now = datetime.utcnow()
+    ids = set(ingredient_ids)
+    skus = _stream(
+        session,
+        _project(SKU, SkuPriceRow).where(SKU.ingredient_id.in_(ids), SKU.expires_at > now),
+        SkuPriceRow,
+    )
+    groups: dict[tuple[int, str, str], dict] = {}
+    for sku in skus:
+        key = (sku.ingredient_id, sku.retailer_slug or "", sku.postal_code or "")
+        summary = groups.get(key)
+        if summary is None:
+            summary = groups[key] = {
+                "ingredient_id": key[0],
+                "retailer_slug": key[1],
+                "postal_code": key[2],
+                "min_price_per_base_unit": None,
+                "min_price_sku_id": None,
+                "min_price": None,
+                "sku_count": 0,
+                "fetched_at": sku.fetched_at,
+                "expires_at": sku.expires_at,
+                "updated_at": now,
+            }
+        summary["sku_count"] += 1
+        summary["fetched_at"] = max(summary["fetched_at"], sku.fetched_at)
+        summary["expires_at"] = max(summary["expires_at"], sku.expires_at)
+        qty = sku.quantity_in_base_unit
+        if sku.price is None or not qty or qty <= 0:
+            continue
+        ppu = sku.price / qty
+        if summary["min_price_per_base_unit"] is None or ppu < summary["min_price_per_base_unit"]:
+            summary["min_price_per_base_unit"] = round(ppu, 6)
+            summary["min_price_sku_id"] = sku.id
+            summary["min_price"] = sku.price
+    existing = session.execute(
+        select(
+            IngredientPriceSummary.id,
+            IngredientPriceSummary.ingredient_id,
+            IngredientPriceSummary.retailer_slug,
+            IngredientPriceSummary.postal_code,
+        ).where(IngredientPriceSummary.ingredient_id.in_(ids))
+    ).all()
+    gone = [row.id for row in existing if (row.ingredient_id, row.retailer_slug, row.postal_code) not in groups]
+    if gone:
+        session.execute(delete(IngredientPriceSummary).where(IngredientPriceSummary.id.in_(gone)))
+    if groups:
+        # Sorted so concurrent upserts over overlapping ingredients take row locks in the same order
+        values = [groups[key] for key in sorted(groups)]
+        stmt = _upsert_insert(session, IngredientPriceSummary).values(values)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["ingredient_id", "retailer_slug", "postal_code"],
+                set_={
+                    col: getattr(stmt.excluded, col)
+                    for col in (
+                        "min_price_per_base_unit",
+                        "min_price_sku_id",
+                        "min_price",
+                        "sku_count",
+                        "fetched_at",
+                        "expires_at",
+                        "updated_at",
+                    )
+                },
+            )
+        )
+    return len(groups)
+
+
+def refresh_expired_price_summaries(session: Session) -> int:
+    """
+    Expiry sweep: recompute summaries that are past expires_at or whose cheapest SKU has expired.
+    Commits. Returns the number of ingredients recomputed.
     """
     now = datetime.utcnow()
-    ingredients = list(session.exec(select(Ingredient)))
+    cheapest_expired = exists().where(
+        SKU.id == IngredientPriceSummary.min_price_sku_id,
+        SKU.expires_at <= now,
+    )
+    stale_ids = set(
+        session.exec(
+            select(IngredientPriceSummary.ingredient_id).where(
+                (IngredientPriceSummary.expires_at <= now) | cheapest_expired
+            )
+        )
+    )
+    if stale_ids:
+        refresh_price_summaries(session, list(stale_ids))
+        session.commit()
+    return len(stale_ids)
+
+
+def get_price_summaries(
+    session: Session, ingredient_ids: list[int] | None = None, postal_code: str | None = None
+) -> list[IngredientPriceSummary]:
+    """Live (unexpired) price summaries, optionally limited to ingredients and/or a postal code."""
+    stmt = select(IngredientPriceSummary).where(IngredientPriceSummary.expires_at > datetime.utcnow())
     if ingredient_ids is not None:
-        ids_set = set(ingredient_ids)
-        ingredients = [i for i in ingredients if i.id in ids_set]
-    skus = list(session.exec(select(SKU)))
-    ids_with_valid_skus = {s.ingredient_id for s in skus if s.expires_at > now}
-    return [i for i in ingredients if i.id not in ids_with_valid_skus]
+        stmt = stmt.where(IngredientPriceSummary.ingredient_id.in_(set(ingredient_ids)))
+    if postal_code is not None:
+        stmt = stmt.where(IngredientPriceSummary.postal_code == postal_code)
+    return list(session.exec(stmt))
 
 
-def create_menu_plan(session: Session, target_servings: int, plan_payload: str) -> MenuPlan:
-    plan = MenuPlan(target_servings=target_servings, plan_payload=plan_payload)
+def create_menu_plan(
+    session: Session,
+    target_servings: int,
+    payload: dict,
+    *,
+    request_fingerprint: str | None = None,
+    request: dict | None = None,
+    status: str | None = None,
+    objective: float | None = None,
+    solve_ms: int | None = None,
+    total_ms: int | None = None,
+    catalog_version: str | None = None,
+) -> MenuPlan:
+    plan = MenuPlan(
+        target_servings=target_servings,
+        payload=payload,
+        request_fingerprint=request_fingerprint,
+        request=request,
+        status=status,
+        objective=objective,
+        solve_ms=solve_ms,
+        total_ms=total_ms,
+        catalog_version=catalog_version,
+    )
     session.add(plan)
     session.commit()
     session.refresh(plan)
     return plan
 
 
+def list_menu_plans(
+    session: Session,
+    limit: int = 20,
+    before_id: int | None = None,
+    request_fingerprint: str | None = None,
+) -> list[MenuPlan]:
+    """Newest-first page of plans. Keyset pagination: pass the last id seen as before_id."""
+    stmt = select(MenuPlan)
+    if before_id is not None:
+        stmt = stmt.where(MenuPlan.id < before_id)
+    if request_fingerprint:
+        stmt = stmt.where(MenuPlan.request_fingerprint == request_fingerprint)
+    return list(session.exec(stmt.order_by(MenuPlan.id.desc()).limit(limit)))
+
+
+def get_catalog_version(session: Session) -> str:
+    """
+    Cheap version stamp of the planning catalog, recorded with each plan for history: max ids of recipes,
+    ingredients and recipe links (PK index lookups) plus the last ingredient_price_summary update (changes on
+    every SKU write). Edits and deletes (overseer corrections, merges) do not change it, so it is informational
+    only and must not be used to reuse a stored plan.
+    """
+    max_recipe = session.exec(select(func.max(Recipe.id))).one() or 0
+    max_ingredient = session.exec(select(func.max(Ingredient.id))).one() or 0
+    max_link = session.exec(select(func.max(RecipeIngredient.id))).one() or 0
+    prices_at = session.exec(select(func.max(IngredientPriceSummary.updated_at))).one()
+    prices = prices_at.strftime("%Y%m%dT%H%M%S") if prices_at else "0"
+    return f"r{max_recipe}.i{max_ingredient}.l{max_link}.p{prices}"
+
+
 def log_llm_call(
     session: Session,
     prompt_name: str,
@@ -172,3 +689,45 @@ def log_llm_call(
         )
     )
     session.commit()
+
+
+def log_llm_calls(session: Session, rows: list[dict], blobs: dict[str, str] | None = None) -> int:
+    """
+    Insert many LLMCallLog rows in one multi-row INSERT. Used by the write-behind log sink.
+    blobs: {hash: content} static prompt context referenced by the rows; inserted if not already stored.
+    """
+    if not rows:
+        return 0
+    if blobs:
+        insert_prompt_blobs(session, blobs)
+    session.execute(insert(LLMCallLog).values(rows))
+    session.commit()
+    return len(rows)
+
+
+def insert_prompt_blobs(session: Session, blobs: dict[str, str]) -> None:
+    """Store content-addressed prompt blobs; existing hashes are left untouched. Does not commit."""
+    if not blobs:
+        return
+    stmt = _upsert_insert(session, PromptBlob).values(
+        [{"hash": h, "content": c, "created_at": datetime.utcnow()} for h, c in blobs.items()]
+    )
+    session.execute(stmt.on_conflict_do_nothing(index_elements=["hash"]))
+
+
+def get_llm_call_input(session: Session, log_id: int) -> dict | str | None:
+    """
+    Reconstruct the full input payload of a logged LLM call.
+    Returns the kwargs dict for compressed rows, the legacy str(kwargs) for old rows, None if missing.
+    Raises MissingPromptBlobError when static context it references is no longer stored.
+    """
+    log = session.get(LLMCallLog, log_id)
+    if log is None:
+        return None
+    if log.input_compressed is None:
+        return log.input_payload
+    hashes = list(log.input_blob_hashes or [])
+    blobs = {}
+    if hashes:
+        blobs = {b.hash: b.content for b in session.exec(select(PromptBlob).where(PromptBlob.hash.in_(hashes)))}
+    return decode_input_payload(log.input_compressed, blobs)
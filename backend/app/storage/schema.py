@@ -0,0 +1,72 @@
+"""
+Schema version management on top of Alembic.
+
+Startup runs a single version check (ensure_schema_current). DDL migrations live in
+app/migrations/versions; slow data backfills are separate and run explicitly via
+`python -m app.cli backfill <name>` (see app/storage/backfills.py).
+"""
+
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.logging import get_logger
+
+logger = get_logger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "migrations"
+
+
+class SchemaOutOfDateError(RuntimeError):
+    """Database schema revision does not match the code's migration head."""
+
+
+def alembic_config(url: str | None = None) -> Config:
+    cfg = Config()
+    cfg.set_main_option("script_location", str(MIGRATIONS_DIR))
+    if url:
+        cfg.set_main_option("sqlalchemy.url", url)
+    return cfg
+
+
+def head_revision() -> str | None:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(engine: Engine) -> str | None:
+    with engine.connect() as conn:
+        return MigrationContext.configure(conn).get_current_revision()
+
+
+def upgrade_to_head(engine: Engine) -> None:
+    """Apply pending DDL migrations on the given engine."""
+    cfg = alembic_config()
+    with engine.begin() as conn:
+        cfg.attributes["connection"] = conn
+        command.upgrade(cfg, "head")
+
+
+def ensure_schema_current(engine: Engine, auto_migrate: bool | None = None) -> str | None:
+    """
+    Compare the recorded schema revision with the migration head (one query).
+    When behind: upgrade if auto_migrate (default Settings.db_auto_migrate), else raise.
+    """
+    if auto_migrate is None:
+        auto_migrate = settings.db_auto_migrate
+    head = head_revision()
+    current = current_revision(engine)
+    if current == head:
+        logger.info("db.schema.current revision=%s", current)
+        return current
+    if not auto_migrate:
+        raise SchemaOutOfDateError(
+            f"database schema at {current or 'unversioned'}, code expects {head}; run `python -m app.cli migrate`"
+        )
+    logger.info("db.schema.upgrade from=%s to=%s", current, head)
+    upgrade_to_head(engine)
+    return head
@@ -1,3 +1,4 @@
+from app.utils.counters import Counters, ratio
 from app.utils.timing import TimingTracker, time_span
 
-__all__ = ["TimingTracker", "time_span"]
+__all__ = ["Counters", "TimingTracker", "ratio", "time_span"]
@@ -0,0 +1,27 @@
+"""Thread-safe counters behind the process-wide metrics in GET /api/utilization."""
+
+import threading
+
+
+class Counters:
+    """Named integer counters incremented under one lock. Subclasses add derived fields in stats()."""
+
+    def __init__(self, *names: str) -> None:
+        self._lock = threading.Lock()
+        self._counts: dict[str, int] = dict.fromkeys(names, 0)
+
+    def record(self, **increments: int) -> None:
+        with self._lock:
+            for name, n in increments.items():
+                self._counts[name] = self._counts.get(name, 0) + n
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def stats(self) -> dict:
+        return self.snapshot()
+
+
+def ratio(part: int, total: int) -> float | None:
+    return round(part / total, 4) if total else None
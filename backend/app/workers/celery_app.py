@@ -1,11 +1,16 @@
 from celery import Celery
+from celery.signals import task_postrun, worker_process_shutdown
 
 from app.config import settings
 from app.logging import configure_logging, get_logger
 
 
 celery_app = Celery("tandem", broker=settings.redis_url, backend=settings.redis_url)
-celery_app.conf.task_routes = {"app.workers.tasks.*": {"queue": "celery"}}
+celery_app.conf.task_routes = {
+    # Uploads get their own queue so a large upload never sits behind (or starves) SKU fetches
+    "app.workers.tasks.ingest_upload": {"queue": settings.ingestion_queue_name},
+    "app.workers.tasks.*": {"queue": "celery"},
+}
 celery_app.conf.worker_concurrency = settings.celery_worker_concurrency
 
 # Celery Beat: refresh expired SKUs every 30 minutes
@@ -22,6 +27,24 @@ from app.workers import tasks  # noqa: F401
 
 configure_logging()
 logger = get_logger(__name__)
+
+
+@task_postrun.connect
+def _release_worker_session(**_kwargs) -> None:
+    # Each task gets a fresh thread-local session; drop this one so identity maps never leak across tasks.
+    from app.storage.db import worker_session
+
+    worker_session.remove()
+
+
+@worker_process_shutdown.connect
+def _flush_llm_log_sink(**_kwargs) -> None:
+    # Prefork children exit via os._exit, which skips atexit; flush buffered LLM logs explicitly.
+    from app.storage.llm_log_sink import llm_call_log_sink
+
+    llm_call_log_sink.close()
+
+
 logger.info(
     "celery.configured broker=%s worker_concurrency=%s (fetch_skus_for_ingredient workers)",
     settings.redis_url,
@@ -0,0 +1,175 @@
+"""
+Deduplicated, batched enqueueing of fetch_skus_for_ingredient jobs.
+
+Uploads, the bulk import and refresh_expired_skus all submit through SkuEnqueuer. A job is identified by
+(ingredient_id, postal_code): before submitting, the enqueuer claims "sku:fetch:<ingredient_id>:<postal_code>"
+with SET NX EX; a job whose key is already held (queued or running, from any process) is coalesced instead of
+queued again, so the Celery queue length reflects unique work. The task deletes its key when it finishes, so the
+TTL (SKU_ENQUEUE_DEDUPE_TTL_S) only bounds how long a lost task suppresses new ones.
+
+Unique jobs are submitted as one Celery group per batch (one broker connection for the batch). Without Redis
+(local runs, tests) dedupe is per enqueuer only; Redis is retried after SKU_ENQUEUE_REDIS_RETRY_S.
+"""
+
+import threading
+import time
+from typing import Callable, Iterable
+
+from celery import group
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.logging import get_logger
+from app.utils.counters import Counters, ratio
+
+logger = get_logger(__name__)
+
+# (ingredient_id, canonical_name, postal_code): fetch_skus_for_ingredient's arguments
+SkuJob = tuple[int, str, str]
+
+
+def dedupe_key(ingredient_id: int, postal_code: str) -> str:
+    return f"sku:fetch:{ingredient_id}:{postal_code}"
+
+
+class SkuEnqueueMetrics(Counters):
+    """Process-wide SKU enqueue counters (exposed in GET /api/utilization)."""
+
+    def __init__(self) -> None:
+        super().__init__("requested", "enqueued", "coalesced", "batches", "redis_errors")
+
+    def stats(self) -> dict:
+        counts = self.snapshot()
+        return {
+            **counts,
+            "coalesce_rate": ratio(counts["coalesced"], counts["requested"]),
+            "dedupe_ttl_s": settings.sku_enqueue_dedupe_ttl_s,
+        }
+
+
+sku_enqueue_metrics = SkuEnqueueMetrics()
+
+_redis_lock = threading.Lock()
+_redis_client: Redis | None = None
+_redis_down_until = 0.0
+
+
+def _redis() -> Redis | None:
+    """Shared client, or None while Redis is marked unreachable."""
+    global _redis_client
+    if time.monotonic() < _redis_down_until:
+        return None
+    with _redis_lock:
+        if _redis_client is None:
+            _redis_client = Redis.from_url(settings.redis_url, socket_connect_timeout=1, socket_timeout=1)
+        return _redis_client
+
+
+def _mark_redis_down(error: Exception) -> None:
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + settings.sku_enqueue_redis_retry_s
+    sku_enqueue_metrics.record(redis_errors=1)
+    logger.warning("sku.enqueue.redis_unavailable error=%s (dedupe is per-process until retry)", error)
+
+
+def release_sku_fetch(ingredient_id: int, postal_code: str) -> None:
+    """Drop a job's dedupe key once it has run, so the next request for it is queued again."""
+    client = _redis()
+    if client is None:
+        return
+    try:
+        client.delete(dedupe_key(ingredient_id, postal_code))
+    except RedisError as e:
+        _mark_redis_down(e)
+
+
+def submit_sku_fetches(jobs: list[SkuJob]) -> None:
+    """Submit fetch_skus_for_ingredient jobs as one Celery group."""
+    from app.workers.tasks import fetch_skus_for_ingredient
+
+    group(fetch_skus_for_ingredient.s(*job) for job in jobs).apply_async()
+
+
+class SkuEnqueuer:
+    """
+    Buffer SKU fetch jobs and submit the unique ones in batches. add() buffers (dropping repeats within the
+    buffer), flush() claims dedupe keys and submits; enqueue() does both. submit(jobs) defaults to
+    submit_sku_fetches; callers pass their own (patchable) one. Counters cover this enqueuer's lifetime.
+    """
+
+    def __init__(
+        self,
+        submit: Callable[[list[SkuJob]], object] | None = None,
+        batch_size: int | None = None,
+        ttl_s: int | None = None,
+    ) -> None:
+        self.submit = submit or submit_sku_fetches
+        self.batch_size = max(1, batch_size or settings.sku_enqueue_batch_size)
+        self.ttl_s = ttl_s or settings.sku_enqueue_dedupe_ttl_s
+        self.requested = 0
+        self.enqueued = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[int, str], SkuJob] = {}
+        self._submitted: set[tuple[int, str]] = set()  # fallback dedupe while Redis is unavailable
+
+    def add(self, ingredient_id: int, canonical_name: str, postal_code: str) -> None:
+        key = (ingredient_id, postal_code)
+        with self._lock:
+            self.requested += 1
+            if key in self._pending:
+                self.coalesced += 1
+                sku_enqueue_metrics.record(requested=1, coalesced=1)
+                return
+            self._pending[key] = (ingredient_id, canonical_name, postal_code)
+        sku_enqueue_metrics.record(requested=1)
+
+    def enqueue(self, jobs: Iterable[SkuJob]) -> int:
+        for ingredient_id, canonical_name, postal_code in jobs:
+            self.add(ingredient_id, canonical_name, postal_code)
+        return self.flush()
+
+    def flush(self) -> int:
+        """Claim and submit every buffered job. Returns the number submitted (the rest were coalesced)."""
+        with self._lock:
+            jobs, self._pending = list(self._pending.values()), {}
+            if not jobs:
+                return 0
+            claimed = self._claim(jobs)
+            coalesced = len(jobs) - len(claimed)
+            self.coalesced += coalesced
+            sku_enqueue_metrics.record(coalesced=coalesced)
+            for start in range(0, len(claimed), self.batch_size):
+                batch = claimed[start : start + self.batch_size]
+                try:
+                    self.submit(batch)
+                except Exception:
+                    # Not queued: free the keys so these jobs are not suppressed until the TTL runs out
+                    for ingredient_id, _, postal_code in claimed[start:]:
+                        release_sku_fetch(ingredient_id, postal_code)
+                        self._submitted.discard((ingredient_id, postal_code))
+                    raise
+                self.enqueued += len(batch)
+                sku_enqueue_metrics.record(enqueued=len(batch), batches=1)
+        logger.info("sku.enqueue jobs=%s enqueued=%s coalesced=%s", len(jobs), len(claimed), coalesced)
+        return len(claimed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requested": self.requested, "enqueued": self.enqueued, "coalesced": self.coalesced}
+
+    def _claim(self, jobs: list[SkuJob]) -> list[SkuJob]:
+        """Jobs whose dedupe key this call acquired (SET NX EX); falls back to per-enqueuer dedupe."""
+        client = _redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for ingredient_id, _, postal_code in jobs:
+                    pipe.set(dedupe_key(ingredient_id, postal_code), 1, nx=True, ex=self.ttl_s)
+                return [job for job, acquired in zip(jobs, pipe.execute()) if acquired]
+            except RedisError as e:
+                _mark_redis_down(e)
+        claimed = [job for job in jobs if (job[0], job[2]) not in self._submitted]
+        self._submitted.update((job[0], job[2]) for job in claimed)
+        return claimed
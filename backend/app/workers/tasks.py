@@ -7,14 +7,19 @@ from app.services.llm.dspy_client import configure_dspy
 from app.services.llm.sku_filter import filter_skus
 from app.services.llm.sku_size_converter import convert_sku_size
 from app.services.sku.instacart_client import instacart_client
-from app.storage.db import get_session
+from app.services.upload_jobs import UploadJobStore, run_upload_job
+from app.storage.db import worker_session
 from app.storage.repositories import (
     get_ingredient_by_id,
     get_ingredients_needing_sku_refresh,
+    get_products,
+    refresh_expired_price_summaries,
     set_ingredient_sku_unavailable,
+    upsert_products,
     upsert_skus,
 )
 from app.workers.celery_app import celery_app
+from app.workers.sku_enqueue import SkuEnqueuer, release_sku_fetch
 
 logger = get_task_logger(__name__)
 app_logger = get_logger(__name__)
@@ -58,49 +63,83 @@ def fetch_skus_for_ingredient(self, ingredient_id: int, ingredient_name: str, po
                 filtered = [c for c in candidates if q in (c.get("name") or "").lower()]
                 if filtered:
                     app_logger.info("sku.fetch.llm_fallback keyword_match count=%s", len(filtered))
-            with get_session() as session:
-                ingredient = get_ingredient_by_id(session, ingredient_id)
-                if not ingredient:
-                    app_logger.warning(
-                        "sku.fetch.skip ingredient_id=%s not found (FK); likely stale task or DB reset",
-                        ingredient_id,
-                    )
-                    return {"status": "skipped", "ingredient_id": ingredient_id, "reason": "ingredient_not_found"}
-                base_unit = (ingredient.base_unit or "").strip().lower() or "count"
-                count = len(filtered)
-                if count == 0:
-                    set_ingredient_sku_unavailable(session, ingredient_id, unavailable=True)
-                    app_logger.info(
-                        "sku.fetch.success task_id=%s ingredient_id=%s count=0 retailer=%s (marked sku_unavailable)",
-                        task_id,
-                        ingredient_id,
-                        retailer_slug,
-                    )
-                    return {"status": "success", "ingredient_id": ingredient_id, "count": 0}
-                skus_to_upsert = []
-                for sku in filtered:
-                    size_str = sku.get("size") or ""
-                    product_name = sku.get("name") or ""
+            session = worker_session()  # released by task_postrun (celery_app)
+            ingredient = get_ingredient_by_id(session, ingredient_id)
+            if not ingredient:
+                app_logger.warning(
+                    "sku.fetch.skip ingredient_id=%s not found (FK); likely stale task or DB reset",
+                    ingredient_id,
+                )
+                return {"status": "skipped", "ingredient_id": ingredient_id, "reason": "ingredient_not_found"}
+            base_unit = (ingredient.base_unit or "").strip().lower() or "count"
+            count = len(filtered)
+            if count == 0:
+                set_ingredient_sku_unavailable(session, ingredient_id, unavailable=True)
+                app_logger.info(
+                    "sku.fetch.success task_id=%s ingredient_id=%s count=0 retailer=%s (marked sku_unavailable)",
+                    task_id,
+                    ingredient_id,
+                    retailer_slug,
+                )
+                return {"status": "success", "ingredient_id": ingredient_id, "count": 0}
+            product_keys = [_product_key(sku, retailer_slug) for sku in filtered]
+            known_products = get_products(session, [k for k in product_keys if k])
+            skus_to_upsert = []
+            product_rows = []
+            conversions = 0
+            for sku, key in zip(filtered, product_keys):
+                size_str = sku.get("size") or ""
+                product_name = sku.get("name") or ""
+                product = known_products.get(key) if key else None
+                # Same listing and pack size seen before: reuse its parsed quantity instead of re-converting
+                same_size = product is not None and (product.size or "") == size_str
+                cached_qty = (product.quantity_by_unit or {}).get(base_unit) if same_size else None
+                if cached_qty:
+                    qty, display = cached_qty, product.size_display
+                else:
                     qty, display = convert_sku_size(size_str, base_unit, product_name)
-                    # DB size_display is VARCHAR(64); truncate in case LLM leaked reasoning
-                    safe_display = (display or size_str or "")[:64]
-                    skus_to_upsert.append({
-                        "name": sku.get("name"),
+                    conversions += 1
+                # DB size_display is VARCHAR(64); truncate in case LLM leaked reasoning
+                safe_display = (display or size_str or "")[:64]
+                skus_to_upsert.append({
+                    "name": sku.get("name"),
+                    "brand": sku.get("brand"),
+                    "size": sku.get("size"),
+                    "price": _parse_price(sku.get("price")),
+                    "price_per_unit": sku.get("price_per_unit"),
+                    "quantity_in_base_unit": qty,
+                    "size_display": safe_display or size_str,
+                })
+                if key:
+                    quantity_by_unit = dict(product.quantity_by_unit or {}) if same_size else {}
+                    if qty:
+                        quantity_by_unit[base_unit] = qty
+                    product_rows.append({
+                        "retailer_slug": key[0],
+                        "item_id": key[1],
+                        "name": product_name,
                         "brand": sku.get("brand"),
                         "size": sku.get("size"),
-                        "price": _parse_price(sku.get("price")),
-                        "price_per_unit": sku.get("price_per_unit"),
-                        "quantity_in_base_unit": qty,
                         "size_display": safe_display or size_str,
+                        "quantity_by_unit": quantity_by_unit or None,
                     })
-                upsert_skus(
-                    session=session,
-                    ingredient_id=ingredient_id,
-                    skus=skus_to_upsert,
-                    retailer_slug=retailer_slug,
-                    postal_code=postal_code,
-                )
-                set_ingredient_sku_unavailable(session, ingredient_id, unavailable=False)
+            product_ids = upsert_products(session, product_rows)
+            for row, key in zip(skus_to_upsert, product_keys):
+                row["product_id"] = product_ids.get(key) if key else None
+            app_logger.info(
+                "sku.fetch.size_conversions ingredient_id=%s converted=%s reused=%s",
+                ingredient_id,
+                conversions,
+                len(filtered) - conversions,
+            )
+            upsert_skus(
+                session=session,
+                ingredient_id=ingredient_id,
+                skus=skus_to_upsert,
+                retailer_slug=retailer_slug,
+                postal_code=postal_code,
+            )
+            set_ingredient_sku_unavailable(session, ingredient_id, unavailable=False)
             app_logger.info(
                 "sku.fetch.success task_id=%s ingredient_id=%s count=%s retailer=%s",
                 task_id,
@@ -119,25 +158,68 @@ def fetch_skus_for_ingredient(self, ingredient_id: int, ingredient_name: str, po
                 exc_info=True,
             )
             raise
+        finally:
+            release_sku_fetch(ingredient_id, postal_code)
 
 
 @celery_app.task
 def refresh_expired_skus(ingredient_ids: list[int] | None = None, postal_code: str | None = None):
     """
     Find ingredients with no valid (non-expired) SKUs and re-enqueue fetch jobs.
-    Run periodically (e.g. every 30 min) via Celery Beat, or manually via API.
+    Run periodically (e.g. every 30 min) via Celery Beat, or manually via API. Ingredients whose fetch is
+    still queued or running are coalesced (SkuEnqueuer), so overlapping runs do not pile up duplicates.
     - ingredient_ids: optional, limit to these IDs; None = all needing refresh
     - postal_code: optional, default_postal_code used if not provided
     """
     postal = postal_code or settings.default_postal_code
-    with get_session() as session:
-        ingredients = get_ingredients_needing_sku_refresh(session, ingredient_ids)
-    count = 0
-    for ing in ingredients:
-        fetch_skus_for_ingredient.delay(ing.id, ing.canonical_name, postal)
-        count += 1
-    app_logger.info("sku.refresh_expired queued=%s ingredient_ids=%s", count, [i.id for i in ingredients])
-    return {"queued": count, "ingredient_ids": [i.id for i in ingredients]}
+    session = worker_session()  # released by task_postrun (celery_app)
+    # Expiry sweep first so ingredient_price_summary reflects only unexpired SKUs
+    swept = refresh_expired_price_summaries(session)
+    if swept:
+        app_logger.info("sku.price_summary.swept ingredients=%s", swept)
+    ingredients = get_ingredients_needing_sku_refresh(session, ingredient_ids)
+    enqueuer = SkuEnqueuer()
+    count = enqueuer.enqueue((ing.id, ing.canonical_name, postal) for ing in ingredients)
+    app_logger.info(
+        "sku.refresh_expired queued=%s coalesced=%s ingredient_ids=%s",
+        count,
+        enqueuer.coalesced,
+        [i.id for i in ingredients],
+    )
+    return {"queued": count, "coalesced": enqueuer.coalesced, "ingredient_ids": [i.id for i in ingredients]}
+
+
+@celery_app.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def ingest_upload(self, job_id: str, ingredient_totals: dict[str, int], postal_code: str | None = None):
+    """
+    Run an async recipe upload (files stored by POST /api/recipes/upload), publishing its SSE events to Redis.
+    Acked only once finished, so an upload whose worker dies is redelivered; recipes it already wrote are
+    skipped by content hash on the second run.
+    """
+    postal = postal_code or settings.default_postal_code
+    store = UploadJobStore()
+    files = store.files(job_id)
+    app_logger.info("upload.ingest.start task_id=%s job=%s files=%s", self.request.id, job_id, len(files))
+    try:
+        with time_span("upload.ingest.total", job=job_id):
+            run_upload_job(job_id, files, ingredient_totals, postal, store)
+    except Exception as e:
+        app_logger.exception("upload.ingest.failed job=%s", job_id)
+        store.publish(job_id, "upload_failed", {"error": str(e)})
+        progress = store.progress(job_id) or {"files": []}
+        store.publish(job_id, "stream_complete", {}, {**progress, "complete": True})
+        raise
+    finally:
+        store.drop_files(job_id)
+    return {"job_id": job_id, "files": len(files)}
+
+
+def _product_key(sku: dict, retailer_slug: str) -> tuple[str, str] | None:
+    """(retailer_slug, item_id) for a search result; None when the listing has no id."""
+    item_id = sku.get("id")
+    if not item_id:
+        return None
+    return (sku.get("retailer_slug") or retailer_slug or "", str(item_id))
 
 
 def _parse_price(price: str | None) -> float | None:
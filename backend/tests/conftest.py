@@ -11,7 +11,22 @@ if str(BACKEND_ROOT) not in sys.path:
     sys.path.insert(0, str(BACKEND_ROOT))
 
 from app import main
+from app.api import optimize
+from app.services.recipe_index import RecipeIndexCache
 from app.storage import db as db_module
+from app.workers import sku_enqueue
+
+
+@pytest.fixture(autouse=True)
+def _no_shared_sku_dedupe(monkeypatch):
+    # SKU enqueue dedupe keys must not leak between tests through a real Redis; dedupe per enqueuer instead
+    monkeypatch.setattr(sku_enqueue, "_redis", lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_recipe_index(monkeypatch):
+    # Every test starts from an empty database, so the process-wide recipe index must not carry over
+    monkeypatch.setattr(optimize, "recipe_index_cache", RecipeIndexCache())
 
 
 @pytest.fixture(name="engine")
@@ -38,6 +53,7 @@ def client_fixture(monkeypatch, engine):
 
     monkeypatch.setattr(db_module, "engine", engine)
     monkeypatch.setattr(db_module, "get_session", _get_session_override)
+    monkeypatch.setattr(db_module, "replica_engine", None)
     monkeypatch.setattr(main, "configure_dspy", lambda: None)
 
     client = TestClient(main.app)
@@ -1,8 +1,17 @@
+import asyncio
+import io
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import httpx
+from fastapi import UploadFile
 from sqlmodel import select
 
+from app import main
+from app.api import recipes as recipes_api
+from app.config import settings
 from app.storage.models import Ingredient, Recipe, RecipeIngredient, SKU
 
 
@@ -49,7 +58,7 @@ def test_recipes_list_returns_allergens(client, session):
 
 def test_recipe_upload(client, monkeypatch):
     monkeypatch.setattr(
-        "app.api.recipes.match_ingredient",
+        "app.services.ingestion.match_ingredient",
         lambda ingredient_text, existing: {
             "decision": "new",
             "canonical_name": ingredient_text.split()[0],
@@ -57,7 +66,7 @@ def test_recipe_upload(client, monkeypatch):
         },
     )
     monkeypatch.setattr(
-        "app.api.recipes.normalize_units",
+        "app.services.ingestion.normalize_units",
         lambda ingredient_text, canonical_name="", target_base_unit=None: {
             "base_unit": "count",
             "base_unit_qty": 1.0,
@@ -69,10 +78,7 @@ def test_recipe_upload(client, monkeypatch):
         "app.api.recipes.infer_allergens_from_ingredients",
         lambda names: [],  # Avoid LLM call in test
     )
-    monkeypatch.setattr(
-        "app.api.recipes.fetch_skus_for_ingredient",
-        type("DummyTask", (), {"delay": staticmethod(lambda *_args, **_kwargs: None)}),
-    )
+    monkeypatch.setattr("app.api.recipes.submit_sku_fetches", lambda jobs: None)
     repo_root = Path(__file__).resolve().parents[2]
     file_path = repo_root / "intern-dataset-main" / "1.txt"
     with file_path.open("rb") as handle:
@@ -86,7 +92,7 @@ def test_recipe_upload(client, monkeypatch):
 def test_recipe_upload_sets_allergens(client, monkeypatch, session):
     """Verify allergens are computed and stored on recipe upload."""
     monkeypatch.setattr(
-        "app.api.recipes.match_ingredient",
+        "app.services.ingestion.match_ingredient",
         lambda ingredient_text, existing: {
             "decision": "new",
             "canonical_name": "milk" if "milk" in ingredient_text.lower() else "flour",
@@ -98,13 +104,10 @@ def test_recipe_upload_sets_allergens(client, monkeypatch, session):
         lambda names: ["milk", "wheat"] if names else [],
     )
     monkeypatch.setattr(
-        "app.api.recipes.normalize_units",
+        "app.services.ingestion.normalize_units",
         lambda _1, canonical_name="", target_base_unit=None: {"base_unit": "ml", "base_unit_qty": 1.0, "normalized_qty": 100, "normalized_unit": "ml"},
     )
-    monkeypatch.setattr(
-        "app.api.recipes.fetch_skus_for_ingredient",
-        type("DummyTask", (), {"delay": staticmethod(lambda *_args, **_kwargs: None)}),
-    )
+    monkeypatch.setattr("app.api.recipes.submit_sku_fetches", lambda jobs: None)
     content = b"""Test Milk Recipe (for 2 people)
 Ingredients:
 - 100 ml milk
@@ -122,6 +125,131 @@ Mix and cook.
     assert "wheat" in r.allergens
 
 
+def test_recipe_upload_dedupes_ingredient_lines(client, monkeypatch):
+    """Lines repeated across files and recipes are resolved once per upload."""
+    calls = []
+
+    def fake_match(ingredient_text, existing):
+        calls.append(ingredient_text)
+        return {"decision": "new", "canonical_name": ingredient_text.split()[-1], "rationale": "test"}
+
+    monkeypatch.setattr("app.services.ingestion.match_ingredient", fake_match)
+    monkeypatch.setattr(
+        "app.services.ingestion.normalize_units",
+        lambda _1, canonical_name="", target_base_unit=None: {"base_unit": "count", "base_unit_qty": 1.0, "normalized_qty": 1.0, "normalized_unit": "count"},
+    )
+    monkeypatch.setattr("app.api.recipes.infer_allergens_from_ingredients", lambda names: [])
+    monkeypatch.setattr("app.api.recipes.submit_sku_fetches", lambda jobs: None)
+    recipe = "{name} (for 2 people)\nIngredients:\n- 2 cloves garlic\n- Salt to taste\n- {extra}\nInstructions:\nCook.\n"
+    one = (recipe.format(name="A", extra="1 onion") + "---\n" + recipe.format(name="B", extra="1 lemon")).encode()
+    two = recipe.format(name="C", extra="2 Cloves  Garlic").encode()
+    response = client.post(
+        "/api/recipes/upload/sync",
+        files=[("files", ("one.txt", one, "text/plain")), ("files", ("two.txt", two, "text/plain"))],
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["recipes_created"] == 3
+    assert sorted(calls) == ["1 lemon", "1 onion", "2 cloves garlic", "Salt to taste"]
+    assert payload["ingredient_lines"] == 9
+    assert payload["unique_ingredient_lines"] == 4
+    assert payload["resolutions_saved"] == 5
+
+
+def test_recipe_reupload_skips_known_recipes(client, monkeypatch, session):
+    """Re-uploading a file creates no rows, LLM calls or SKU jobs; the response lists the skipped recipes."""
+    calls, enqueued = [], []
+
+    def fake_match(ingredient_text, existing):
+        calls.append(ingredient_text)
+        return {"decision": "new", "canonical_name": ingredient_text.split()[-1], "rationale": "test"}
+
+    monkeypatch.setattr("app.services.ingestion.match_ingredient", fake_match)
+    monkeypatch.setattr(
+        "app.services.ingestion.normalize_units",
+        lambda _1, canonical_name="", target_base_unit=None: {"base_unit": "count", "base_unit_qty": 1.0, "normalized_qty": 1.0, "normalized_unit": "count"},
+    )
+    monkeypatch.setattr("app.api.recipes.infer_allergens_from_ingredients", lambda names: [])
+    monkeypatch.setattr("app.api.recipes.submit_sku_fetches", enqueued.extend)
+    text = b"Toast (for 2 people)\nIngredients:\n- 1 slice bread\nInstructions:\nToast it.\n"
+    first = client.post("/api/recipes/upload/sync", files={"files": ("a.txt", text, "text/plain")}).json()
+    assert (first["recipes_created"], first["duplicates_skipped"]) == (1, 0)
+    assert len(calls) == 1 and len(enqueued) == 1
+
+    # Same content with different case/whitespace, twice in one file
+    again = text.replace(b"Toast it.", b"toast  it") + b"---\n" + text
+    second = client.post("/api/recipes/upload/sync", files={"files": ("b.txt", again, "text/plain")}).json()
+    assert second["recipes_created"] == 0 and second["duplicates_skipped"] == 2
+    toast = session.exec(select(Recipe)).one()
+    assert {r["recipe_id"] for r in second["skipped_recipes"]} == {toast.id}
+    assert second["unique_ingredient_lines"] == 0
+    assert len(calls) == 1 and len(enqueued) == 1
+    assert len(session.exec(select(RecipeIngredient)).all()) == 1
+
+
+def test_sync_upload_keeps_serving_health_checks(client, monkeypatch):
+    def slow_match(ingredient_text, existing):
+        time.sleep(0.1)  # an LLM round trip
+        return {"decision": "new", "canonical_name": ingredient_text.split()[0], "rationale": "test"}
+
+    monkeypatch.setattr("app.services.ingestion.match_ingredient", slow_match)
+    monkeypatch.setattr(
+        "app.services.ingestion.normalize_units",
+        lambda _1, canonical_name="", target_base_unit=None: {"base_unit": "count", "base_unit_qty": 1.0, "normalized_qty": 1.0, "normalized_unit": "count"},
+    )
+    monkeypatch.setattr("app.api.recipes.infer_allergens_from_ingredients", lambda names: [])
+    monkeypatch.setattr("app.api.recipes.submit_sku_fetches", lambda jobs: None)
+    monkeypatch.setattr(settings, "ingredient_batch_max_workers", 1)
+    content = (Path(__file__).resolve().parents[2] / "intern-dataset-main" / "1.txt").read_bytes()
+
+    async def upload_while_polling_health():
+        # One event loop serves both, as under uvicorn: health checks only run if the upload yields it
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as ac:
+            upload = asyncio.create_task(ac.post("/api/recipes/upload/sync", files={"files": ("1.txt", content, "text/plain")}))
+            await asyncio.sleep(0.05)
+            latencies = []
+            while not upload.done():
+                started = time.perf_counter()
+                assert (await ac.get("/api/health")).status_code == 200
+                latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.02)
+            return await upload, latencies
+
+    response, latencies = asyncio.run(upload_while_polling_health())
+    assert response.status_code == 200
+    assert response.json()["recipes_created"] == 3
+    assert len(latencies) >= 5
+    assert max(latencies) < 0.5
+
+
+def test_sync_upload_rejects_when_pending_limit_reached(client, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr("app.api.recipes._sync_upload_slots", slots)
+    response = client.post("/api/recipes/upload/sync", files={"files": ("1.txt", b"Recipe", "text/plain")})
+    assert response.status_code == 503
+
+
+def test_sync_upload_slot_held_until_work_finishes(monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    release_work = threading.Event()
+    monkeypatch.setattr(recipes_api, "_sync_upload_slots", slots)
+    monkeypatch.setattr(recipes_api, "_process_upload", lambda raw_files, postal: release_work.wait(5))
+
+    async def disconnect_mid_upload():
+        upload = asyncio.create_task(
+            recipes_api.upload_recipes(files=[UploadFile(io.BytesIO(b"Recipe"), filename="1.txt")], postal_code=None)
+        )
+        await asyncio.sleep(0.05)
+        upload.cancel()  # client went away; the executor keeps running _process_upload
+        await asyncio.gather(upload, return_exceptions=True)
+
+    asyncio.run(disconnect_mid_upload())
+    assert not slots.acquire(blocking=False)
+    release_work.set()
+    assert slots.acquire(timeout=5)
+
+
 def test_plan_endpoint(client, session):
     recipe = Recipe(name="Test", servings=2, instructions="Cook", source_file="unit")
     session.add(recipe)
@@ -0,0 +1,70 @@
+"""Pool checkout instrumentation, request-scoped session dependency and thread-local worker sessions."""
+import threading
+
+import pytest
+from sqlalchemy import exc as sa_exc
+from sqlmodel import create_engine
+
+from app.storage import db as db_module
+from app.storage.db import InstrumentedQueuePool
+
+
+def _pooled_engine(tmp_path, pool_size=1, timeout=0.2):
+    return create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=timeout,
+    )
+
+
+def test_pool_records_checkouts_and_timeouts(tmp_path):
+    engine = _pooled_engine(tmp_path)
+    held = engine.connect()
+    with pytest.raises(sa_exc.TimeoutError):
+        engine.connect()
+    held.close()
+    with engine.connect():
+        pass
+
+    stats = engine.pool.stats()
+    assert stats["checkouts"] == 3
+    assert stats["timeouts"] == 1
+    assert stats["slow_checkouts"] >= 1
+    assert stats["wait_ms_max"] >= 200
+
+
+def test_pool_stats_reports_primary(monkeypatch, tmp_path):
+    engine = _pooled_engine(tmp_path, pool_size=2)
+    monkeypatch.setattr(db_module, "engine", engine)
+    monkeypatch.setattr(db_module, "replica_engine", None)
+    with engine.connect():
+        assert db_module.pool_stats()["primary"]["checked_out"] == 1
+
+
+def test_request_session_closes_after_response(monkeypatch, engine):
+    monkeypatch.setattr(db_module, "engine", engine)
+    closed = []
+    dependency = db_module.request_session()
+    session = next(dependency)
+    monkeypatch.setattr(session, "close", lambda: closed.append(True))
+    with pytest.raises(StopIteration):
+        next(dependency)
+    assert closed
+
+
+def test_worker_session_is_thread_local(monkeypatch, engine):
+    monkeypatch.setattr(db_module, "engine", engine)
+    main_session = db_module.worker_session()
+    assert db_module.worker_session() is main_session
+
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(db_module.worker_session()))
+    thread.start()
+    thread.join()
+    assert seen[0] is not main_session
+
+    db_module.worker_session.remove()
+    assert db_module.worker_session() is not main_session
+    db_module.worker_session.remove()
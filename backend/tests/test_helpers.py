@@ -1,4 +1,7 @@
+import threading
+
 from app.api.optimize import _parse_size
+from app.utils.counters import Counters, ratio
 from app.workers.tasks import _parse_price
 
 
@@ -10,3 +13,15 @@ def test_parse_size():
 def test_parse_price():
     assert _parse_price("$2.50") == 2.50
     assert _parse_price(None) is None
+
+
+def test_counters_record_under_one_lock():
+    counters = Counters("hits", "misses")
+    threads = [threading.Thread(target=lambda: [counters.record(hits=1, misses=2) for _ in range(1000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counters.record(**{"rule:exact": 1})
+    assert counters.stats() == {"hits": 4000, "misses": 8000, "rule:exact": 1}
+    assert ratio(1, 3) == 0.3333 and ratio(1, 0) is None
@@ -0,0 +1,220 @@
+"""Streaming ingestion pipeline: stage overlap, backpressure, per-stage stats, error isolation, duplicate skips."""
+
+import threading
+import time
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app.services.ingestion_pipeline import IngestionPipeline
+from app.services.parsing.recipe_parser import parse_recipe_text, recipe_content_hash
+from app.storage.models import Ingredient, Recipe, RecipeIngredient
+from app.workers.sku_enqueue import SkuEnqueuer
+
+
+def _recipe(name: str, *lines: str) -> str:
+    body = "\n".join(f"- {line}" for line in lines)
+    return f"{name} (for 2 people)\nIngredients:\n{body}\nInstructions:\nCook.\n"
+
+
+def _resolve(text, existing):
+    name = text.split()[-1]
+    return {"canonical_name": name}, {"normalized_qty": 1.0, "normalized_unit": "count", "base_unit": "count", "base_unit_qty": 1.0}
+
+
+def _pipeline(engine, resolve_fn=_resolve, allergen_fn=lambda names: [], enqueued=None, **kwargs):
+    enqueued = [] if enqueued is None else enqueued
+    return IngestionPipeline(
+        resolve_fn=resolve_fn,
+        allergen_fn=allergen_fn,
+        sku_enqueuer=SkuEnqueuer(lambda jobs: enqueued.extend((name, postal) for _, name, postal in jobs)),
+        postal_code="10001",
+        session_factory=lambda: Session(engine),
+        **kwargs,
+    )
+
+
+def test_pipeline_ingests_files_and_reports_stage_stats(engine, session):
+    calls, enqueued = [], []
+
+    def resolve(text, existing):
+        calls.append(text)
+        return _resolve(text, existing)
+
+    files = [
+        (_recipe("Toast", "1 slice bread", "1 tbsp butter").encode(), "a.txt"),
+        (_recipe("Eggs", "2 eggs", "1 tbsp butter").encode() + b"---\n" + _recipe("Buttered Bread", "1 slice bread").encode(), "b.txt"),
+    ]
+    pipeline = _pipeline(
+        engine,
+        resolve_fn=resolve,
+        allergen_fn=lambda names: ["milk"] if "butter" in names else [],
+        enqueued=enqueued,
+        queue_size=2,
+        resolve_batch=2,
+    ).run(files)
+
+    assert (pipeline.files, pipeline.recipes_created, pipeline.ingredients_created) == (2, 3, 3)
+    assert sorted(calls) == ["1 slice bread", "1 tbsp butter", "2 eggs"]
+    assert pipeline.dedupe_stats()["memo_hits"] == 2
+    assert sorted(enqueued) == [("bread", "10001"), ("butter", "10001"), ("eggs", "10001")]
+    assert pipeline.sku_jobs == 3
+
+    recipes = {r.name: r for r in session.exec(select(Recipe))}
+    assert recipes["Toast"].allergens == ["milk"] and recipes["Buttered Bread"].allergens == []
+    assert recipes["Eggs"].source_file == "b.txt"
+    assert len(session.exec(select(RecipeIngredient)).all()) == 5
+
+    stages = pipeline.stats()["stages"]
+    assert list(stages) == ["resolve", "allergen", "persist", "sku_enqueue"]
+    assert all(s["processed"] == 3 and s["errors"] == 0 for s in stages.values())
+    assert all(s["queue_max_depth"] <= s["queue_capacity"] == 2 for s in stages.values())
+    assert all(s["queue_depth"] == 0 for s in stages.values())
+
+
+def test_pipeline_overlaps_persist_with_later_resolution(engine, session):
+    """With a one-slot queue the last recipe cannot be resolved until an earlier one has been persisted."""
+    first_persisted = threading.Event()
+    seen_persisted = []
+
+    def resolve(text, existing):
+        if text.startswith("9 "):
+            seen_persisted.append(first_persisted.wait(timeout=5))
+        return _resolve(text, existing)
+
+    files = [(_recipe(f"Dish {i}", f"{i} item{i}").encode(), f"{i}.txt") for i in range(1, 10)]
+    pipeline = _pipeline(engine, resolve_fn=resolve, queue_size=1, resolve_batch=1)
+    pipeline.on_ingredient = lambda item, name, ingredient_id: first_persisted.set()
+    pipeline.run(files)
+
+    assert seen_persisted == [True]
+    assert pipeline.recipes_created == 9
+    assert all(s["queue_max_depth"] <= 1 for s in pipeline.stats()["stages"].values())
+
+
+def test_pipeline_isolates_stage_failures(engine, session):
+    def allergens(names):
+        if "anchovy" in names:
+            raise RuntimeError("allergen service down")
+        return []
+
+    def resolve(text, existing):
+        if "mystery" in text:
+            raise ValueError("unparseable")
+        return _resolve(text, existing)
+
+    files = [
+        (_recipe("Caesar", "2 anchovy").encode(), "a.txt"),
+        (_recipe("Stew", "1 mystery", "2 carrot").encode(), "b.txt"),
+    ]
+    pipeline = _pipeline(engine, resolve_fn=resolve, allergen_fn=allergens).run(files)
+
+    assert pipeline.recipes_created == 1
+    assert pipeline.stats()["stages"]["allergen"]["errors"] == 1
+    assert pipeline.dedupe_stats()["failed"] == 1
+    stew = session.exec(select(Recipe)).one()
+    assert stew.name == "Stew"
+    assert [i.canonical_name for i in session.exec(select(Ingredient))] == ["carrot"]
+
+
+def test_pipeline_skips_known_and_concurrently_stored_recipes(engine, session):
+    toast = _recipe("Toast", "1 slice bread")
+    pipeline = _pipeline(engine).run([(toast.encode(), "a.txt")])
+    assert pipeline.recipes_created == 1
+    stored = session.exec(select(Recipe)).one()
+    assert stored.content_hash == recipe_content_hash(parse_recipe_text(toast)[0])
+
+    # Known recipe and an in-upload repeat are dropped before resolution
+    calls = []
+
+    def resolve(text, existing):
+        calls.append(text)
+        return _resolve(text, existing)
+
+    eggs = _recipe("Eggs", "2 eggs")
+    files = [(toast.encode(), "b.txt"), ((eggs + "---\n" + eggs).encode(), "c.txt")]
+    pipeline = _pipeline(engine, resolve_fn=resolve).run(files)
+    assert pipeline.recipes_created == 1 and calls == ["2 eggs"]
+    assert sorted((s["name"], s["recipe_id"]) for s in pipeline.skipped) == [("Eggs", None), ("Toast", stored.id)]
+
+    # Another upload stores the recipe between the hash check and persist: the unique index catches it
+    jam = _recipe("Jam", "1 jar jam")
+
+    def resolve_while_other_upload_commits(text, existing):
+        with Session(engine) as other:
+            other.add(Recipe(name="Jam", servings=2, instructions="Cook.", source_file="other.txt",
+                             content_hash=recipe_content_hash(parse_recipe_text(jam)[0])))
+            other.commit()
+        return _resolve(text, existing)
+
+    pipeline = _pipeline(engine, resolve_fn=resolve_while_other_upload_commits).run([(jam.encode(), "d.txt")])
+    assert pipeline.recipes_created == 0 and pipeline.duplicates_skipped == 1
+    assert pipeline.stats()["stages"]["persist"]["errors"] == 0
+    assert [r.source_file for r in session.exec(select(Recipe).where(Recipe.name == "Jam"))] == ["other.txt"]
+
+
+def _slow_first_insert(monkeypatch, chunks):
+    """Record bulk_insert_recipes chunk sizes; the first write is slow so later recipes queue up behind it."""
+    import app.services.ingestion_pipeline as ingestion_pipeline
+
+    real_insert = ingestion_pipeline.bulk_insert_recipes
+
+    def insert(write_session, rows):
+        chunks.append(len(rows))
+        if len(chunks) == 1:
+            time.sleep(0.2)
+        return real_insert(write_session, rows)
+
+    monkeypatch.setattr(ingestion_pipeline, "bulk_insert_recipes", insert)
+
+
+def test_persist_writes_queued_recipes_in_one_transaction(engine, session, monkeypatch):
+    chunks, commits = [], []
+    _slow_first_insert(monkeypatch, chunks)
+
+    def count_commit(write_session):
+        commits.append(write_session)
+
+    event.listen(Session, "after_commit", count_commit)
+    try:
+        files = [(_recipe(f"Dish {i}", f"{i} item{i}", "1 tbsp butter").encode(), f"{i}.txt") for i in range(10)]
+        pipeline = _pipeline(engine, queue_size=16, write_batch=16).run(files)
+    finally:
+        event.remove(Session, "after_commit", count_commit)
+
+    assert pipeline.recipes_created == 10 and sum(chunks) == 10
+    assert len(chunks) < 10 and max(chunks) > 1
+    assert pipeline.writes == len(chunks) == len(commits)
+    assert pipeline.stats()["write_transactions"] == len(chunks)
+    assert len(session.exec(select(RecipeIngredient)).all()) == 20
+    assert [r.name for r in session.exec(select(Recipe).order_by(Recipe.id))] == [f"Dish {i}" for i in range(10)]
+
+
+def test_failed_chunk_is_retried_per_recipe(engine, session, monkeypatch):
+    """A recipe stored concurrently fails its chunk's insert; the rest of the chunk is still written."""
+    chunks = []
+    _slow_first_insert(monkeypatch, chunks)
+    files = [(_recipe(f"Dish {i}", f"{i} item{i}").encode(), f"{i}.txt") for i in range(4)]
+    clash = recipe_content_hash(parse_recipe_text(files[2][0].decode())[0])
+
+    def allergens(names):
+        if names == ["item2"]:  # after the resolve stage's hash check, before persist
+            with Session(engine) as other:
+                other.add(Recipe(name="Dish 2", servings=2, instructions="Cook.", source_file="x", content_hash=clash))
+                other.commit()
+        return []
+
+    pipeline = _pipeline(engine, allergen_fn=allergens, allergen_workers=1, write_batch=16).run(files)
+    assert (pipeline.recipes_created, pipeline.duplicates_skipped) == (3, 1)
+    # The chunk holding Dish 2 fails, is retried recipe by recipe, and only Dish 2's own retry fails again
+    assert max(chunks) > 1 and len(chunks) == pipeline.writes + 2
+    assert pipeline.stats()["stages"]["persist"]["errors"] == 0
+    assert len(session.exec(select(Recipe).where(Recipe.name == "Dish 2")).all()) == 1
+
+
+def test_pipeline_coalesces_repeated_sku_jobs(engine, session):
+    enqueued = []
+    files = [(_recipe(f"Dish {i}", "1 tbsp butter", f"{i} item{i}").encode(), f"{i}.txt") for i in range(3)]
+    pipeline = _pipeline(engine, enqueued=enqueued, enqueue_existing=True).run(files)
+    assert sorted(enqueued) == [("butter", "10001"), ("item0", "10001"), ("item1", "10001"), ("item2", "10001")]
+    assert (pipeline.sku_jobs, pipeline.sku_jobs_coalesced) == (4, 2)
@@ -0,0 +1,92 @@
+"""Persistent ingredient-line aliases: zero-LLM re-ingestion, prompt-version invalidation, hit metrics."""
+
+from sqlmodel import select
+
+from app.services.ingestion import (
+    ALIAS_PROMPT_VERSION,
+    IngredientAliasStore,
+    IngredientLineResolver,
+    alias_metrics,
+)
+from app.storage.models import Ingredient, IngredientAlias
+
+RECIPE = b"""Garlic Toast (for 2 people)
+Ingredients:
+- 2 cloves garlic
+- 1 slice bread
+Instructions:
+Toast.
+"""
+
+
+def _patch_upload(monkeypatch, calls):
+    def fake_match(ingredient_text, existing):
+        calls.append(ingredient_text)
+        return {"decision": "new", "canonical_name": ingredient_text.split()[-1], "rationale": "test"}
+
+    monkeypatch.setattr("app.services.ingestion.match_ingredient", fake_match)
+    monkeypatch.setattr(
+        "app.services.ingestion.normalize_units",
+        lambda _1, canonical_name="", target_base_unit=None: {"base_unit": "count", "base_unit_qty": 1.0, "normalized_qty": 2.0, "normalized_unit": "count"},
+    )
+    monkeypatch.setattr("app.api.recipes.infer_allergens_from_ingredients", lambda names: [])
+    monkeypatch.setattr("app.api.recipes.submit_sku_fetches", lambda jobs: None)
+
+
+def test_reupload_resolves_from_aliases_without_llm(client, session, monkeypatch):
+    calls = []
+    _patch_upload(monkeypatch, calls)
+    first = client.post("/api/recipes/upload/sync", files={"files": ("a.txt", RECIPE, "text/plain")}).json()
+    assert len(calls) == 2 and first["alias_hits"] == 0
+    aliases = session.exec(select(IngredientAlias).order_by(IngredientAlias.alias_key)).all()
+    assert [(a.alias_key, a.prompt_version, a.hits) for a in aliases] == [
+        ("1 slice bread", ALIAS_PROMPT_VERSION, 0),
+        ("2 cloves garlic", ALIAS_PROMPT_VERSION, 0),
+    ]
+
+    before = alias_metrics.stats()
+    # Same lines in a different recipe (an identical recipe would be skipped by its content hash)
+    other = RECIPE.replace(b"Garlic Toast", b"Garlic Bread")
+    second = client.post("/api/recipes/upload/sync", files={"files": ("b.txt", other, "text/plain")}).json()
+    assert len(calls) == 2
+    assert second["recipes_created"] == 1
+    assert second["alias_hits"] == 2
+    assert second["resolutions_saved"] == 2
+    assert alias_metrics.stats()["hits"] - before["hits"] == 2
+    session.expire_all()
+    assert {a.hits for a in session.exec(select(IngredientAlias))} == {1}
+
+
+def test_aliases_from_other_prompt_versions_are_ignored_and_replaced(session):
+    garlic = Ingredient(name="garlic", canonical_name="garlic", base_unit="g", base_unit_qty=1.0)
+    session.add(garlic)
+    session.commit()
+    session.add(IngredientAlias(
+        alias_key="2 cloves garlic", ingredient_id=garlic.id, normalized_qty=8, normalized_unit="g",
+        base_unit="g", prompt_version="match:v0/normalize:v0",
+    ))
+    session.commit()
+
+    calls = []
+
+    def resolve(text, existing):
+        calls.append(text)
+        return {"canonical_name": "garlic"}, {"normalized_qty": 2.0, "normalized_unit": "count", "base_unit": "count", "base_unit_qty": 1.0}
+
+    before = alias_metrics.stats()
+    resolver = IngredientLineResolver([], resolve_fn=resolve, alias_store=IngredientAliasStore(session))
+    results = resolver.resolve(["2 Cloves Garlic"])
+    assert calls == ["2 Cloves Garlic"]
+    assert results["2 Cloves Garlic"][1]["normalized_qty"] == 2.0
+    assert alias_metrics.stats()["stale"] - before["stale"] == 1
+
+    assert resolver.save_aliases({"garlic": garlic}) == 1
+    session.commit()
+    session.expire_all()
+    alias = session.get(IngredientAlias, "2 cloves garlic")
+    assert (alias.prompt_version, alias.normalized_unit, alias.normalized_qty) == (ALIAS_PROMPT_VERSION, "count", 2.0)
+
+    again = IngredientLineResolver([], resolve_fn=resolve, alias_store=IngredientAliasStore(session))
+    assert again.resolve(["2 cloves garlic"])["2 cloves garlic"][0]["canonical_name"] == "garlic"
+    assert len(calls) == 1
+    assert again.stats()["alias_hits"] == 1
@@ -0,0 +1,129 @@
+"""Unique canonical ingredients: race-free batch get-or-create and merging pre-existing duplicates."""
+
+from datetime import datetime, timedelta
+
+from alembic import command
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.storage.models import Ingredient, IngredientAlias, Recipe, RecipeIngredient, SKU
+from app.storage.repositories import (
+    get_or_create_ingredient,
+    get_or_create_ingredients,
+    get_price_summaries,
+    merge_duplicate_ingredients,
+)
+from app.storage.schema import alembic_config
+
+
+def _row(name: str, base_unit: str = "g") -> dict:
+    return {"name": name, "canonical_name": name, "base_unit": base_unit, "base_unit_qty": 1.0}
+
+
+def test_batch_get_or_create_reports_only_new_names(session):
+    existing = get_or_create_ingredient(session, "flour", "flour", "g", 1.0)
+
+    ingredients, created = get_or_create_ingredients(session, [_row("flour"), _row("sugar"), _row("sugar", "ml")])
+    assert created == {"sugar"}
+    assert ingredients["flour"].id == existing.id
+    assert ingredients["sugar"].base_unit == "g"
+
+    again, created_again = get_or_create_ingredients(session, [_row("flour"), _row("sugar")])
+    assert created_again == set()
+    assert {n: i.id for n, i in again.items()} == {n: i.id for n, i in ingredients.items()}
+    assert len(list(session.exec(select(Ingredient)))) == 2
+
+
+def test_batch_get_or_create_inserts_in_name_order(session):
+    ingredients, _ = get_or_create_ingredients(session, [_row("sugar"), _row("flour"), _row("butter")])
+    assert sorted(ingredients, key=lambda n: ingredients[n].id) == ["butter", "flour", "sugar"]
+
+
+def test_concurrent_insert_returns_existing_row(engine):
+    # Another upload inserts the same name between this caller's lookup and insert
+    with Session(engine) as other:
+        other.add(Ingredient(name="salt", canonical_name="salt", base_unit="g", base_unit_qty=1.0))
+        other.commit()
+    with Session(engine) as session:
+        ingredients, created = get_or_create_ingredients(session, [_row("salt")])
+        assert created == set()
+        assert ingredients["salt"].canonical_name == "salt"
+
+
+def _engine_without_unique_index():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ux_ingredient_canonical_name"))
+    return engine
+
+
+def test_merge_duplicate_ingredients_repoints_links_and_skus():
+    engine = _engine_without_unique_index()
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        a, b, c = (Ingredient(name="egg", canonical_name="egg", base_unit="count", base_unit_qty=1.0) for _ in range(3))
+        a.sku_unavailable = True
+        other = Ingredient(name="milk", canonical_name="milk", base_unit="ml", base_unit_qty=1.0)
+        session.add_all([a, b, c, other])
+        session.commit()
+        recipe = Recipe(name="Omelette", servings=1, instructions="", source_file="x")
+        session.add(recipe)
+        session.commit()
+        session.add_all([
+            RecipeIngredient(recipe_id=recipe.id, ingredient_id=b.id, quantity=2, unit="count", original_text="2 eggs"),
+            SKU(ingredient_id=c.id, name="Eggs 12", price=3.0, quantity_in_base_unit=12, expires_at=now + timedelta(hours=1)),
+            IngredientAlias(
+                alias_key="2 eggs", ingredient_id=c.id, normalized_qty=2, normalized_unit="count",
+                base_unit="count", prompt_version="v",
+            ),
+        ])
+        session.commit()
+
+        assert merge_duplicate_ingredients(session) == {"groups": 1, "merged": 2}
+
+        ids = {i.canonical_name: i.id for i in session.exec(select(Ingredient))}
+        assert ids == {"egg": a.id, "milk": other.id}
+        assert session.exec(select(RecipeIngredient.ingredient_id)).all() == [a.id]
+        assert session.exec(select(SKU.ingredient_id)).all() == [a.id]
+        assert session.exec(select(IngredientAlias.ingredient_id)).all() == [a.id]
+        assert session.get(Ingredient, a.id).sku_unavailable is False
+        assert [s.ingredient_id for s in get_price_summaries(session)] == [a.id]
+        assert merge_duplicate_ingredients(session) == {"groups": 0, "merged": 0}
+
+
+def test_migration_merges_duplicates_before_unique_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dupes.db'}")
+    cfg = alembic_config()
+    with engine.begin() as conn:
+        cfg.attributes["connection"] = conn
+        command.upgrade(cfg, "0004")
+        conn.execute(text(
+            "INSERT INTO ingredient (id, name, canonical_name, base_unit, base_unit_qty, created_at, sku_unavailable) "
+            "VALUES (1, 'egg', 'egg', 'count', 1, '2024-01-01', 0), (2, 'egg', 'egg', 'count', 1, '2024-01-01', 0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO recipe (id, name, servings, instructions, source_file, meal_type, created_at) "
+            "VALUES (1, 'Omelette', 1, '', 'x', 'entree', '2024-01-01')"
+        ))
+        conn.execute(text(
+            "INSERT INTO recipeingredient (recipe_id, ingredient_id, quantity, unit, original_text) "
+            "VALUES (1, 2, 2, 'count', '2 eggs')"
+        ))
+        # The duplicate's cheap SKU must end up in the survivor's price summary
+        expires = (datetime.utcnow() + timedelta(hours=1)).isoformat(" ")
+        conn.execute(text(
+            "INSERT INTO sku (id, ingredient_id, name, price, quantity_in_base_unit, fetched_at, expires_at) "
+            f"VALUES (7, 2, 'Eggs 12', 3.0, 12, '2024-01-01', '{expires}')"
+        ))
+        command.upgrade(cfg, "head")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT id FROM ingredient")).scalars().all() == [1]
+        assert conn.execute(text("SELECT ingredient_id FROM recipeingredient")).scalar() == 1
+        summary = conn.execute(text(
+            "SELECT ingredient_id, min_price_sku_id, min_price_per_base_unit, sku_count FROM ingredient_price_summary"
+        )).all()
+        assert [tuple(row) for row in summary] == [(1, 7, 0.25, 1)]
+        indexes = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars().all()
+        assert "ux_ingredient_canonical_name" in indexes
@@ -0,0 +1,93 @@
+import pytest
+
+from app.services.ingestion import IngredientLineResolver
+from app.services.llm import ingredient_matcher
+from app.services.parsing.lexical_matcher import lexical_match, line_name
+
+EXISTING = [
+    "garlic", "olive oil", "lemon", "egg", "parmesan cheese", "green onion", "chickpea", "long grain rice", "tomatoes",
+    "cilantro", "red pepper",
+]
+
+
+@pytest.mark.parametrize(
+    "line,canonical,rule",
+    [
+        ("4 cloves garlic, minced", "garlic", "exact"),
+        ("1/4 cup olive oil", "olive oil", "exact"),
+        ("1/2 cup grated Parmesan cheese", "parmesan cheese", "exact"),
+        ("1.5 cups long-grain rice", "long grain rice", "exact"),
+        ("2 lemons, sliced", "lemon", "plural"),
+        ("2 large eggs", "egg", "plural"),
+        ("1 tomato, diced", "tomatoes", "plural"),
+        ("3 scallions, thinly sliced", "green onion", "synonym"),
+        ("1 can garbanzo beans, drained", "chickpea", "synonym"),
+        ("1/4 cup fresh coriander, chopped", "cilantro", "synonym"),
+    ],
+)
+def test_lexical_match_resolves_known_names(line, canonical, rule):
+    assert lexical_match(line, EXISTING) == {
+        "decision": "existing",
+        "canonical_name": canonical,
+        "rationale": f"lexical:{rule}",
+        "follow_up_action": "n/a",
+    }
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "2 pounds russet potatoes",
+        "4 tablespoons unsalted butter",
+        "Fresh basil leaves for garnish",
+        "Zest and juice of 1 lemon",
+        "2 tsp coriander",  # the ground seed spice, not cilantro
+        "1 tsp ground coriander",
+        "1 tsp crushed red pepper",  # chili flakes, not the vegetable
+        "1 can crushed tomatoes",  # canned, not fresh tomatoes
+        "2 cups diced tomatoes",
+    ],
+)
+def test_lexical_match_leaves_ambiguous_lines_to_llm(line):
+    assert lexical_match(line, EXISTING) is None
+
+
+def test_lexical_match_keeps_product_form_words():
+    existing = ["crushed tomatoes", "red pepper"]
+    assert lexical_match("1 can crushed tomato", existing)["canonical_name"] == "crushed tomatoes"
+    assert lexical_match("1 red pepper, crushed", existing)["canonical_name"] == "red pepper"
+    assert lexical_match("3 tomatoes", existing) is None
+    assert lexical_match("1 tsp crushed red pepper", existing) is None
+
+
+def test_line_name_strips_quantity_unit_and_notes():
+    assert line_name("Salt and pepper to taste") == "salt and pepper"
+    assert line_name("2 salmon fillets (6 ounces each)") == "salmon fillets"
+
+
+def test_match_ingredient_counts_lexical_and_llm_decisions(monkeypatch):
+    llm_calls = []
+
+    def fake_run_with_logging(**kwargs):
+        llm_calls.append(kwargs["ingredient_text"])
+        raise RuntimeError("stop after counting")
+
+    monkeypatch.setattr(ingredient_matcher, "run_with_logging", fake_run_with_logging)
+    before = ingredient_matcher.match_metrics.stats()
+    assert ingredient_matcher.match_ingredient("3 cloves garlic", EXISTING)["canonical_name"] == "garlic"
+    with pytest.raises(RuntimeError):
+        ingredient_matcher.match_ingredient("1 cup shredded kale", EXISTING)
+    after = ingredient_matcher.match_metrics.stats()
+    assert llm_calls == ["1 cup shredded kale"]
+    assert (after["lexical"] - before["lexical"], after["llm"] - before["llm"]) == (1, 1)
+    assert after["lexical_by_rule"]["exact"] - before["lexical_by_rule"].get("exact", 0) == 1
+
+
+def test_resolver_reports_lexical_matches():
+    def resolve(text, existing):
+        match = lexical_match(text, existing) or {"canonical_name": "kale", "rationale": "llm"}
+        return match, {"normalized_qty": 1.0, "normalized_unit": "count", "base_unit": "count", "base_unit_qty": 1.0}
+
+    resolver = IngredientLineResolver(["garlic"], resolve_fn=resolve)
+    resolver.resolve(["2 cloves garlic", "1 bunch kale", "2 cloves garlic"])
+    assert resolver.stats()["lexical_matches"] == 1
@@ -1,26 +1,18 @@
-from contextlib import contextmanager
-
 from app.services.llm.dspy_client import run_with_logging
 
 
 def test_run_with_logging(monkeypatch):
     logged = {}
 
-    def fake_log_llm_call(**kwargs):
-        logged.update(kwargs)
+    class FakeSink:
+        def submit(self, **kwargs):
+            logged.update(kwargs)
+            return True
 
     def dummy_fn(input_value):
         return {"output": input_value * 2}
 
-    @contextmanager
-    def fake_session():
-        yield None
-
-    monkeypatch.setattr(
-        "app.services.llm.dspy_client.log_llm_call",
-        lambda session, **kwargs: fake_log_llm_call(**kwargs),
-    )
-    monkeypatch.setattr("app.services.llm.dspy_client.get_session", fake_session)
+    monkeypatch.setattr("app.services.llm.dspy_client.llm_call_log_sink", FakeSink())
 
     result = run_with_logging(
         prompt_name="unit_test",
@@ -0,0 +1,119 @@
+"""Tests for the write-behind LLMCallLog sink."""
+
+import pytest
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from app.storage.llm_log_sink import LLMCallLogSink
+from app.storage.models import LLMCallLog
+
+
+def _row(i: int) -> dict:
+    return {
+        "prompt_name": "unit_test",
+        "prompt_version": "v1",
+        "model": "test-model",
+        "input_payload": f"in-{i}",
+        "output_payload": f"out-{i}",
+        "latency_ms": i,
+    }
+
+
+def test_sink_flush_writes_batches(engine):
+    sink = LLMCallLogSink(max_queue=100, batch_size=4, flush_interval_s=60, session_factory=lambda: Session(engine))
+    for i in range(10):
+        assert sink.submit(**_row(i))
+    sink.close()
+    with Session(engine) as session:
+        rows = list(session.exec(select(LLMCallLog)))
+    assert len(rows) == 10
+    stats = sink.stats()
+    assert stats["written"] == 10
+    assert stats["dropped"] == 0
+    assert stats["queued"] == 0
+
+
+def test_sink_drops_when_full(engine):
+    sink = LLMCallLogSink(max_queue=3, batch_size=100, flush_interval_s=60, session_factory=lambda: Session(engine))
+    # Hold the flusher off so the queue can fill
+    sink._ensure_started = lambda: None
+    accepted = [sink.submit(**_row(i)) for i in range(5)]
+    assert accepted == [True, True, True, False, False]
+    assert sink.stats()["dropped"] == 2
+    assert sink.flush() == 3
+
+
+def test_sink_counts_failed_writes():
+    def broken_session():
+        raise RuntimeError("db down")
+
+    sink = LLMCallLogSink(max_queue=10, batch_size=10, flush_interval_s=60, session_factory=broken_session)
+    sink._ensure_started = lambda: None
+    sink.submit(**_row(1))
+    assert sink.flush() == 0
+    assert sink.stats()["failed"] == 1
+
+
+def test_sink_stores_static_prompt_context_once(engine):
+    from app.services.llm.prompts import UNIT_CONVERSION_ONTOLOGY, UNIT_NORMALIZE_TEMPLATE
+    from app.storage.models import PromptBlob
+    from app.storage.repositories import get_llm_call_input
+
+    sink = LLMCallLogSink(max_queue=100, batch_size=10, flush_interval_s=60, session_factory=lambda: Session(engine))
+    sink._ensure_started = lambda: None
+    sent = []
+    for text in ("1 cup milk", "2 tbsp olive oil", "3 eggs"):
+        kwargs = {
+            "ingredient_text": text,
+            "canonical_name": "x",
+            "prompt": UNIT_NORMALIZE_TEMPLATE.format(
+                conversion_ontology=UNIT_CONVERSION_ONTOLOGY, ingredient_text=text, canonical_name="x"
+            ),
+        }
+        sent.append(kwargs)
+        row = _row(0)
+        row.pop("input_payload")
+        sink.submit(input_kwargs=kwargs, **row)
+    assert sink.flush() == 3
+
+    with Session(engine) as session:
+        logs = list(session.exec(select(LLMCallLog).order_by(LLMCallLog.id)))
+        blobs = list(session.exec(select(PromptBlob)))
+        assert blobs
+        assert any(b.content == UNIT_CONVERSION_ONTOLOGY for b in blobs)
+        for log, kwargs in zip(logs, sent):
+            assert log.input_payload == ""
+            assert len(log.input_compressed) < len(kwargs["prompt"])
+            assert get_llm_call_input(session, log.id) == kwargs
+
+
+def test_sink_rewrites_blobs_after_promptblob_is_cleared(engine):
+    from app.services.llm.prompts import UNIT_CONVERSION_ONTOLOGY, UNIT_NORMALIZE_TEMPLATE
+    from app.storage.models import PromptBlob
+    from app.storage.prompt_payloads import MissingPromptBlobError
+    from app.storage.repositories import get_llm_call_input
+
+    sink = LLMCallLogSink(max_queue=100, batch_size=10, flush_interval_s=60, session_factory=lambda: Session(engine))
+    sink._ensure_started = lambda: None
+    kwargs = {"prompt": UNIT_NORMALIZE_TEMPLATE.format(conversion_ontology=UNIT_CONVERSION_ONTOLOGY, ingredient_text="1 egg", canonical_name="egg")}
+
+    def log_call() -> int:
+        row = _row(0)
+        row.pop("input_payload")
+        sink.submit(input_kwargs=kwargs, **row)
+        sink.flush()
+        with Session(engine) as session:
+            return session.exec(select(LLMCallLog.id).order_by(LLMCallLog.id.desc())).first()
+
+    first = log_call()
+    with Session(engine) as session:
+        session.exec(delete(PromptBlob))  # what /api/clear does to promptblob
+        session.commit()
+        with pytest.raises(MissingPromptBlobError) as missing:
+            get_llm_call_input(session, first)
+        assert missing.value.hashes
+
+    # The same process logs the same context again: its blobs are stored again
+    second = log_call()
+    with Session(engine) as session:
+        assert get_llm_call_input(session, second) == kwargs
@@ -0,0 +1,110 @@
+"""Tests for versioned schema migrations and resumable backfills."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.storage.backfills import run_backfill
+from app.services.parsing.recipe_parser import ParsedRecipe, recipe_content_hash
+from app.storage.models import BackfillState, Ingredient, Recipe, RecipeIngredient, SKU
+from app.storage.schema import SchemaOutOfDateError, current_revision, ensure_schema_current, head_revision
+
+
+@pytest.fixture(name="file_engine")
+def file_engine_fixture(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+
+def test_upgrade_creates_schema_and_records_head(file_engine):
+    assert current_revision(file_engine) is None
+    assert ensure_schema_current(file_engine, auto_migrate=True) == head_revision()
+    assert current_revision(file_engine) == head_revision()
+    tables = set(inspect(file_engine).get_table_names())
+    assert set(SQLModel.metadata.tables) <= tables
+
+
+def test_migrated_schema_matches_models(file_engine):
+    ensure_schema_current(file_engine, auto_migrate=True)
+    inspector = inspect(file_engine)
+    dialect = file_engine.dialect.name
+    for name, table in SQLModel.metadata.tables.items():
+        columns = {c["name"] for c in inspector.get_columns(name)}
+        expected = {c.name for c in table.columns if dialect in c.info.get("dialects", (dialect,))}
+        assert expected <= columns, name
+
+
+def test_out_of_date_schema_raises_without_auto_migrate(file_engine):
+    with pytest.raises(SchemaOutOfDateError):
+        ensure_schema_current(file_engine, auto_migrate=False)
+
+
+def test_baseline_adopts_legacy_database(file_engine):
+    """A pre-migration DB (tables from the old startup path, missing later columns) upgrades cleanly."""
+    with file_engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE recipe (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, servings INTEGER NOT NULL, "
+            "instructions VARCHAR NOT NULL, source_file VARCHAR NOT NULL, created_at DATETIME NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO recipe (name, servings, instructions, source_file, created_at) "
+                          "VALUES ('Old', 2, 'Cook', 'x', '2024-01-01')"))
+    ensure_schema_current(file_engine, auto_migrate=True)
+    assert current_revision(file_engine) == head_revision()
+    columns = {c["name"] for c in inspect(file_engine).get_columns("recipe")}
+    assert {"meal_type", "allergens"} <= columns
+    with file_engine.connect() as conn:
+        assert conn.execute(text("SELECT meal_type FROM recipe")).scalar() == "entree"
+
+
+def test_backfill_sku_unavailable_resumes(session):
+    now = datetime.utcnow()
+    ingredients = [
+        Ingredient(name=n, canonical_name=n, base_unit="count", base_unit_qty=1.0) for n in ("a", "b", "c", "d")
+    ]
+    session.add_all(ingredients)
+    session.commit()
+    session.add(SKU(ingredient_id=ingredients[1].id, name="B", expires_at=now + timedelta(hours=1)))
+    session.add(SKU(ingredient_id=ingredients[2].id, name="C", expires_at=now - timedelta(hours=1)))
+    session.commit()
+
+    # Simulate an interrupted run that already processed the first ingredient
+    session.add(BackfillState(name="sku_unavailable", last_id=ingredients[0].id))
+    session.commit()
+
+    state = run_backfill(session, "sku_unavailable", batch_size=2)
+    assert state.completed_at is not None
+    assert state.rows_updated == 2
+    session.expire_all()
+    flags = {i.canonical_name: session.get(Ingredient, i.id).sku_unavailable for i in ingredients}
+    assert flags == {"a": False, "b": False, "c": True, "d": True}
+
+    # Completed backfills are not re-run unless restarted
+    assert run_backfill(session, "sku_unavailable").rows_updated == 2
+    assert run_backfill(session, "sku_unavailable", restart=True).rows_updated == 1
+
+
+def test_backfill_recipe_content_hash(session):
+    recipes = [
+        Recipe(name=name, servings=2, instructions="Cook.", source_file="x") for name in ("Toast", "Toast", "Eggs")
+    ]
+    session.add_all(recipes)
+    session.commit()
+    session.add_all(
+        RecipeIngredient(recipe_id=r.id, ingredient_id=1, quantity=1, unit="count", original_text="1 slice bread")
+        for r in recipes
+    )
+    session.commit()
+
+    state = run_backfill(session, "recipe_content_hash", batch_size=2)
+    assert state.rows_updated == 2
+    session.expire_all()
+    toast, duplicate, eggs = (session.get(Recipe, r.id) for r in recipes)
+    assert toast.content_hash == recipe_content_hash(ParsedRecipe("Toast", 2, ["1 slice bread"], "Cook."))
+    assert duplicate.content_hash is None  # would collide with the first Toast
+    assert eggs.content_hash and eggs.content_hash != toast.content_hash
+
+
+def test_unknown_backfill(session):
+    with pytest.raises(KeyError):
+        run_backfill(session, "nope")
@@ -0,0 +1,45 @@
+"""Tests for plan history storage and request fingerprints."""
+
+from app.schemas.plan import PlanRequest
+from app.services.optimization.fingerprint import plan_request_fingerprint
+from app.storage.repositories import create_menu_plan, get_catalog_version
+
+
+def test_fingerprint_ignores_order_and_formatting():
+    a = PlanRequest(target_servings=4, store_slugs=["Market Basket", "costco"], exclude_allergens=["milk", "eggs"])
+    b = PlanRequest(target_servings=4, store_slugs=["costco", "market-basket"], exclude_allergens=["eggs", "Milk"])
+    c = PlanRequest(target_servings=6, store_slugs=["costco", "market-basket"], exclude_allergens=["eggs", "milk"])
+    assert plan_request_fingerprint(a) == plan_request_fingerprint(b)
+    assert plan_request_fingerprint(a) != plan_request_fingerprint(c)
+    assert plan_request_fingerprint(PlanRequest(target_servings=2, meal_config={"entree": 1, "dessert": 0})) == (
+        plan_request_fingerprint(PlanRequest(target_servings=2, meal_config={"entree": 1}))
+    )
+
+
+def test_plan_history_pagination(client, session):
+    version = get_catalog_version(session)
+    for i in range(5):
+        create_menu_plan(
+            session,
+            2,
+            {"recipes": {"1": i}, "skus": {}},
+            request_fingerprint="fp-a" if i % 2 == 0 else "fp-b",
+            status="Optimal",
+            objective=float(i),
+            solve_ms=10,
+            catalog_version=version,
+        )
+
+    page = client.get("/api/plans?limit=2").json()
+    assert [p["objective"] for p in page["plans"]] == [4.0, 3.0]
+    assert "payload" not in page["plans"][0]
+    page2 = client.get(f"/api/plans?limit=2&before_id={page['next_before_id']}").json()
+    assert [p["objective"] for p in page2["plans"]] == [2.0, 1.0]
+
+    filtered = client.get("/api/plans?fingerprint=fp-a&include_payload=true").json()["plans"]
+    assert [p["objective"] for p in filtered] == [4.0, 2.0, 0.0]
+    assert filtered[0]["payload"] == {"recipes": {"1": 4}, "skus": {}}
+    assert filtered[0]["catalog_version"] == version
+
+    assert client.get(f"/api/plans/{filtered[0]['id']}").json()["payload"]["recipes"] == {"1": 4}
+    assert client.get("/api/plans/9999").status_code == 404
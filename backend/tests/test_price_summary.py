@@ -0,0 +1,126 @@
+"""Tests for the maintained ingredient_price_summary table."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlmodel import select
+
+from app.storage.backfills import run_backfill
+from app.storage.models import Ingredient, IngredientPriceSummary, SKU
+from app.storage.repositories import (
+    delete_skus_for_ingredients,
+    get_ingredients_needing_sku_refresh,
+    get_price_summaries,
+    refresh_expired_price_summaries,
+    refresh_price_summaries,
+    upsert_skus,
+)
+
+
+def _ingredient(session, name: str) -> Ingredient:
+    ing = Ingredient(name=name, canonical_name=name, base_unit="ml", base_unit_qty=1.0)
+    session.add(ing)
+    session.commit()
+    session.refresh(ing)
+    return ing
+
+
+def test_upsert_skus_maintains_summary(session):
+    milk = _ingredient(session, "milk")
+    upsert_skus(
+        session,
+        milk.id,
+        [
+            {"name": "Milk 1L", "price": 2.0, "quantity_in_base_unit": 1000},
+            {"name": "Milk 2L", "price": 3.0, "quantity_in_base_unit": 2000},
+            {"name": "Milk Organic", "price": 4.0, "quantity_in_base_unit": 1000, "retailer_slug": "costco"},
+        ],
+        retailer_slug="safeway",
+        postal_code="10001",
+    )
+    summaries = {s.retailer_slug: s for s in get_price_summaries(session, [milk.id])}
+    assert set(summaries) == {"safeway", "costco"}
+    assert summaries["safeway"].sku_count == 2
+    assert summaries["safeway"].min_price_per_base_unit == 0.0015
+    assert summaries["safeway"].min_price == 3.0
+    assert summaries["costco"].min_price_per_base_unit == 0.004
+    assert get_price_summaries(session, postal_code="90210") == []
+
+
+def test_summary_drives_refresh_and_clears_on_delete(session):
+    milk = _ingredient(session, "milk")
+    eggs = _ingredient(session, "eggs")
+    upsert_skus(session, milk.id, [{"name": "Milk", "price": 2.0, "quantity_in_base_unit": 1000}], "safeway", "10001")
+    assert [i.id for i in get_ingredients_needing_sku_refresh(session)] == [eggs.id]
+    assert get_ingredients_needing_sku_refresh(session, [milk.id]) == []
+
+    delete_skus_for_ingredients(session, [milk.id])
+    assert get_price_summaries(session, [milk.id]) == []
+    assert {i.id for i in get_ingredients_needing_sku_refresh(session)} == {milk.id, eggs.id}
+
+
+def test_refresh_falls_back_to_skus_until_summary_backfill_completes(session):
+    milk = _ingredient(session, "milk")
+    eggs = _ingredient(session, "eggs")
+    upsert_skus(session, milk.id, [{"name": "Milk", "price": 2.0, "quantity_in_base_unit": 1000}], "safeway", "10001")
+    # SKUs stored before ingredient_price_summary existed have no summary row
+    session.exec(delete(IngredientPriceSummary))
+    session.commit()
+    assert [i.id for i in get_ingredients_needing_sku_refresh(session)] == [eggs.id]
+
+    run_backfill(session, "price_summary")
+    assert get_price_summaries(session, [milk.id])
+    assert [i.id for i in get_ingredients_needing_sku_refresh(session)] == [eggs.id]
+
+
+def test_expiry_sweep_recomputes_when_cheapest_expires(session):
+    milk = _ingredient(session, "milk")
+    upsert_skus(
+        session,
+        milk.id,
+        [
+            {"name": "Cheap", "price": 1.0, "quantity_in_base_unit": 1000},
+            {"name": "Pricey", "price": 5.0, "quantity_in_base_unit": 1000},
+        ],
+        "safeway",
+        "10001",
+    )
+    cheap = session.exec(select(SKU).where(SKU.name == "Cheap")).one()
+    cheap.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    session.add(cheap)
+    session.commit()
+
+    assert refresh_expired_price_summaries(session) == 1
+    summary = session.exec(select(IngredientPriceSummary)).one()
+    assert summary.sku_count == 1
+    assert summary.min_price == 5.0
+    assert refresh_expired_price_summaries(session) == 0
+
+
+def test_ingredients_with_skus_includes_price_summary(client, session):
+    milk = _ingredient(session, "milk")
+    upsert_skus(session, milk.id, [{"name": "Milk", "price": 2.0, "quantity_in_base_unit": 1000}], "safeway", "10001")
+    response = client.get("/api/ingredients-with-skus")
+    assert response.status_code == 200
+    row = response.json()[0]
+    assert row["price_summary"][0]["retailer_slug"] == "safeway"
+    assert row["price_summary"][0]["min_price_per_base_unit"] == 0.002
+
+
+def test_refresh_upserts_in_place_and_drops_emptied_groups(session):
+    milk = _ingredient(session, "milk")
+    upsert_skus(session, milk.id, [{"name": "Milk", "price": 2.0, "quantity_in_base_unit": 1000}], "safeway", "10001")
+    upsert_skus(session, milk.id, [{"name": "Milk", "price": 3.0, "quantity_in_base_unit": 1000}], "safeway", "94103")
+    before = {s.postal_code: s.id for s in get_price_summaries(session, [milk.id])}
+
+    # Another postal code's fetch refreshes the same ingredient: existing rows are updated, not re-inserted
+    upsert_skus(session, milk.id, [{"name": "Milk", "price": 1.0, "quantity_in_base_unit": 1000}], "safeway", "10001")
+    session.expire_all()
+    after = {s.postal_code: s for s in get_price_summaries(session, [milk.id])}
+    assert {code: s.id for code, s in after.items()} == before
+    assert after["10001"].min_price == 1.0
+
+    session.execute(delete(SKU).where(SKU.postal_code == "94103"))
+    refresh_price_summaries(session, [milk.id])
+    session.commit()
+    assert [s.postal_code for s in get_price_summaries(session, [milk.id])] == ["10001"]
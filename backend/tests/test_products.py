@@ -0,0 +1,83 @@
+"""Shared Product listings: SKU observations link to them and cached size conversions are reused."""
+
+from datetime import datetime
+
+from sqlmodel import Session, select
+
+from app.storage.models import Ingredient, Product, SKU
+from app.storage.repositories import get_products, upsert_products
+from app.workers import tasks
+
+
+def _ingredient(session, name: str, base_unit: str) -> Ingredient:
+    ing = Ingredient(name=name, canonical_name=name, base_unit=base_unit, base_unit_qty=1.0)
+    session.add(ing)
+    session.commit()
+    session.refresh(ing)
+    return ing
+
+
+def test_upsert_products_is_keyed_by_retailer_and_item(session):
+    row = {"retailer_slug": "safeway", "item_id": "42", "name": "Milk", "size": "1 L", "quantity_by_unit": {"ml": 1000}}
+    first = upsert_products(session, [row, {**row, "retailer_slug": "costco"}])
+    again = upsert_products(session, [{**row, "name": "Milk 2%", "quantity_by_unit": {"ml": 1000, "g": 1030}}])
+    session.commit()
+
+    assert again[("safeway", "42")] == first[("safeway", "42")]
+    assert len(session.exec(select(Product)).all()) == 2
+    product = get_products(session, [("safeway", "42")])[("safeway", "42")]
+    session.refresh(product)
+    assert product.name == "Milk 2%"
+    assert product.quantity_by_unit == {"ml": 1000, "g": 1030}
+
+
+def _fake_fetch(monkeypatch, engine, products):
+    monkeypatch.setattr(tasks, "worker_session", lambda: Session(engine))
+    monkeypatch.setattr(tasks, "configure_dspy", lambda: None)
+    monkeypatch.setattr(tasks.instacart_client, "get_stores", lambda postal_code: {"data": {"stores": [{"slug": "safeway"}]}})
+    monkeypatch.setattr(
+        tasks.instacart_client,
+        "search_products",
+        lambda **_kw: {"data": {"products": products, "retailer": "safeway"}},
+    )
+    monkeypatch.setattr(tasks, "filter_skus", lambda query, candidates: [dict(c) for c in candidates])
+    conversions = []
+
+    def _convert(size, base_unit, product_name=""):
+        conversions.append((size, base_unit))
+        return 946.0, "32 fl oz"
+
+    monkeypatch.setattr(tasks, "convert_sku_size", _convert)
+    return conversions
+
+
+def test_fetch_reuses_product_size_conversion(monkeypatch, engine):
+    products = [{"id": "p1", "name": "Whole Milk", "brand": "Acme", "size": "32 fl oz", "price": "$3.49"}]
+    conversions = _fake_fetch(monkeypatch, engine, products)
+    with Session(engine) as session:
+        milk_id = _ingredient(session, "milk", "ml").id
+        cream_id = _ingredient(session, "cream", "ml").id
+
+    tasks.fetch_skus_for_ingredient(milk_id, "milk", "10001")
+    tasks.fetch_skus_for_ingredient(cream_id, "cream", "10001")
+    assert conversions == [("32 fl oz", "ml")]
+
+    with Session(engine) as session:
+        product = session.exec(select(Product)).one()
+        assert (product.retailer_slug, product.item_id, product.quantity_by_unit) == ("safeway", "p1", {"ml": 946.0})
+        skus = session.exec(select(SKU)).all()
+        assert {s.ingredient_id for s in skus} == {milk_id, cream_id}
+        assert all(s.product_id == product.id and s.quantity_in_base_unit == 946.0 for s in skus)
+        assert all(s.expires_at > datetime.utcnow() for s in skus)
+
+
+def test_fetch_reconverts_when_pack_size_changes(monkeypatch, engine):
+    products = [{"id": "p1", "name": "Whole Milk", "size": "32 fl oz", "price": "$3.49"}]
+    conversions = _fake_fetch(monkeypatch, engine, products)
+    with Session(engine) as session:
+        milk_id = _ingredient(session, "milk", "ml").id
+
+    tasks.fetch_skus_for_ingredient(milk_id, "milk", "10001")
+    products[0]["size"] = "64 fl oz"
+    tasks.fetch_skus_for_ingredient(milk_id, "milk", "10001")
+    assert conversions == [("32 fl oz", "ml"), ("64 fl oz", "ml")]
@@ -0,0 +1,81 @@
+"""Column-projection repository reads and COUNT-based catalog stats."""
+
+from datetime import datetime, timedelta
+
+from app.storage import repositories
+from app.storage.models import Ingredient, Recipe, RecipeIngredient, SKU
+from app.storage.records import IngredientRef, IngredientRow, RecipeIngredientLink, SkuRow
+from app.storage.repositories import (
+    count_rows,
+    get_ingredient_ids_with_active_skus,
+    get_ingredients_needing_sku_refresh,
+    get_unavailable_ingredient_ids,
+    iter_active_sku_rows,
+    iter_ingredient_rows,
+    iter_recipe_ingredient_links,
+)
+
+
+def _seed(session):
+    now = datetime.utcnow()
+    milk = Ingredient(name="milk", canonical_name="milk", base_unit="ml", base_unit_qty=1.0)
+    salt = Ingredient(name="salt", canonical_name="salt", base_unit="g", base_unit_qty=1.0, sku_unavailable=True)
+    session.add_all([milk, salt])
+    session.commit()
+    recipe = Recipe(name="Soup", servings=2, instructions="x" * 10_000, source_file="soup.txt")
+    session.add(recipe)
+    session.commit()
+    session.add_all([
+        RecipeIngredient(recipe_id=recipe.id, ingredient_id=milk.id, quantity=100, unit="ml", original_text="milk"),
+        SKU(ingredient_id=milk.id, name="Milk 1L", price=2.0, quantity_in_base_unit=1000, expires_at=now + timedelta(hours=1)),
+        SKU(ingredient_id=milk.id, name="Milk old", price=1.0, expires_at=now - timedelta(hours=1)),
+    ])
+    session.commit()
+    return milk, salt, recipe
+
+
+def test_projection_records(session):
+    milk, salt, recipe = _seed(session)
+
+    ingredients = list(iter_ingredient_rows(session))
+    assert all(isinstance(i, IngredientRow) for i in ingredients)
+    assert [(i.canonical_name, i.sku_unavailable) for i in ingredients] == [("milk", False), ("salt", True)]
+    assert list(iter_ingredient_rows(session, [salt.id])) == [ingredients[1]]
+
+    skus = list(iter_active_sku_rows(session))
+    assert len(skus) == 1 and isinstance(skus[0], SkuRow)
+    assert skus[0].name == "Milk 1L" and skus[0].quantity_in_base_unit == 1000
+
+    assert list(iter_recipe_ingredient_links(session)) == [RecipeIngredientLink(recipe.id, milk.id)]
+    assert get_ingredient_ids_with_active_skus(session) == {milk.id}
+    assert get_unavailable_ingredient_ids(session) == {salt.id}
+    assert count_rows(session, SKU) == 2
+
+    needing = get_ingredients_needing_sku_refresh(session)
+    assert all(isinstance(i, IngredientRef) for i in needing)
+
+
+def test_stream_spans_multiple_batches(session, monkeypatch):
+    monkeypatch.setattr(repositories, "STREAM_BATCH_SIZE", 2)
+    session.add_all(
+        Ingredient(name=f"i{n}", canonical_name=f"i{n}", base_unit="g", base_unit_qty=1.0) for n in range(5)
+    )
+    session.commit()
+    assert [i.canonical_name for i in iter_ingredient_rows(session)] == [f"i{n}" for n in range(5)]
+
+
+def test_stats_endpoint_counts(client, session):
+    _seed(session)
+    stats = client.get("/api/stats").json()
+    assert stats == {
+        "recipes": 1,
+        "ingredients": 2,
+        "recipe_ingredients": 1,
+        "skus": 2,
+        "ingredients_with_skus": 1,
+        "ingredients_sku_unavailable": 1,
+        "estimated": False,
+    }
+    # Off Postgres the estimate path falls back to exact counts
+    estimated = client.get("/api/stats", params={"estimate": "true"}).json()
+    assert estimated["estimated"] is True and estimated["skus"] == 2
@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import pytest
+
+from app.services.llm import unit_normalizer
+from app.services.parsing.quantity_parser import benchmark, parse_quantity
+from app.services.parsing.recipe_parser import parse_recipe_text
+
+
+@pytest.mark.parametrize(
+    "line,canonical,expected",
+    [
+        ("1/4 cup olive oil", "olive oil", ("ml", 60.0)),
+        ("2 pounds russet potatoes, peeled and cubed", "russet potato", ("g", 907.18)),
+        ("1 tablespoon lemon juice", "lemon juice", ("ml", 15.0)),
+        ("1½ cups heavy cream", "", ("ml", 360.0)),
+        ("1 1/2 tsp. milk", "", ("ml", 7.5)),
+        ("2-3 Tbsp olive oil", "", ("ml", 37.5)),
+        ("2 tablespoons fresh rosemary, chopped", "rosemary", ("tbsp", 2.0)),
+        ("4 tablespoons unsalted butter", "butter", ("g", 56.0)),
+        ("1/2 cup grated Parmesan cheese", "parmesan cheese", ("g", 50.0)),
+        ("3 cloves garlic, minced", "garlic", ("count", 3.0)),
+        ("2 large eggs", "egg", ("count", 2.0)),
+        ("1 whole chicken (approximately 4 pounds)", "chicken", ("count", 1.0)),
+        ("300 g onion", "onion", ("count", 2.0)),
+        ("Salt and pepper to taste", "salt", ("tsp", 0.0)),
+        ("a pinch of salt", "salt", ("tsp", 0.0)),
+        ("12 ounces egg noodles", "egg noodles", ("g", 340.2)),
+        ("1 dozen eggs", "egg", ("count", 12.0)),
+        ("2 dozen eggs", "egg", ("count", 24.0)),
+        ("a dozen eggs", "egg", ("count", 12.0)),
+        ("a half cup milk", "milk", ("ml", 120.0)),
+        ("half a cup milk", "milk", ("ml", 120.0)),
+        ("1 quarter pound butter", "butter", ("g", 113.3975)),
+        ("2 tablespoons softened unsalted butter", "", ("g", 28.0)),
+    ],
+)
+def test_parse_quantity_fast_path(line, canonical, expected):
+    parsed = parse_quantity(line, canonical)
+    assert parsed.confidence >= 0.8
+    out = parsed.as_normalized()
+    assert (out["base_unit"], out["normalized_qty"]) == expected
+    assert out["normalized_unit"] == out["base_unit"]
+
+
+@pytest.mark.parametrize(
+    "line,canonical",
+    [
+        ("1.5 cups basmati rice", "basmati rice"),  # no cup -> g density for rice
+        ("1 can (13.5 ounces) coconut milk", "coconut milk"),
+        ("1 pound asparagus, trimmed", "asparagus"),  # no per-spear weight
+        ("2 cups spinach, chopped", "spinach"),
+        ("Zest and juice of 1 lemon", "lemon"),
+        ("a few sprigs thyme", "thyme"),
+        ("2 tablespoons peanut butter", "peanut butter"),  # not butter's density
+        ("1 cup cream cheese", "cream cheese"),
+        ("1 stick peanut butter", ""),
+    ],
+)
+def test_parse_quantity_defers_to_llm_when_unsure(line, canonical):
+    assert parse_quantity(line, canonical).confidence < 0.8
+
+
+def test_target_base_unit_overrides_rules():
+    parsed = parse_quantity("2 tablespoons olive oil", "olive oil", target_base_unit="tbsp")
+    assert (parsed.base_unit, parsed.normalized_qty) == ("tbsp", 2.0)
+
+
+def test_normalize_units_only_calls_llm_for_low_confidence(monkeypatch):
+    calls = []
+    monkeypatch.setattr(unit_normalizer, "normalize_units_llm", lambda text, *a, **k: calls.append(text) or {"base_unit": "g"})
+    before = unit_normalizer.fast_path_metrics.stats()
+    assert unit_normalizer.normalize_units("1/4 cup olive oil", canonical_name="olive oil")["normalized_qty"] == 60.0
+    assert unit_normalizer.normalize_units("2 cups jasmine rice", canonical_name="jasmine rice") == {"base_unit": "g"}
+    assert calls == ["2 cups jasmine rice"]
+    after = unit_normalizer.fast_path_metrics.stats()
+    assert (after["fast_path"] - before["fast_path"], after["llm_fallback"] - before["llm_fallback"]) == (1, 1)
+
+
+def test_benchmark_on_sample_dataset():
+    dataset = Path(__file__).resolve().parents[2] / "intern-dataset-main"
+    lines = [
+        line
+        for path in sorted(dataset.glob("*.txt"))
+        for recipe in parse_recipe_text(path.read_text(encoding="utf-8"))
+        for line in recipe.ingredients
+    ]
+    result = benchmark(lines, min_confidence=0.8, llm_fn=lambda line, name: parse_quantity(line).as_normalized())
+    assert result["coverage"] >= 0.7
+    assert result["agreement"] == 1.0 and result["disagreements"] == []
+    assert "1.5 cups basmati rice" in result["fallback"]
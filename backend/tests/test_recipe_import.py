@@ -0,0 +1,153 @@
+"""Bulk recipe import (python -m app.cli import): sources, line dedupe, bulk writes and resume."""
+
+import json
+import zipfile
+
+import pytest
+from sqlmodel import select
+
+from app.services.ingestion import IngredientLineResolver, normalize_line
+from app.services.recipe_import import _parse_source, iter_sources, run_import
+from app.storage.models import Ingredient, Recipe, RecipeIngredient
+
+RECIPE = """{name} (for 2 people)
+Ingredients:
+- 2 cloves garlic
+- Salt to taste
+Instructions:
+Cook it.
+"""
+
+
+def _fake_resolve(calls):
+    def resolve(text, existing):
+        calls.append(text)
+        name = "garlic" if "garlic" in text.lower() else "salt"
+        return {"canonical_name": name}, {"normalized_qty": 2.0, "normalized_unit": "count", "base_unit": "count", "base_unit_qty": 1.0}
+
+    return resolve
+
+
+def test_resolver_dedupes_and_memoizes_lines():
+    calls = []
+    resolver = IngredientLineResolver([], resolve_fn=_fake_resolve(calls), max_workers=2)
+    first = resolver.resolve(["2 cloves garlic", "2 Cloves  Garlic.", "Salt to taste"])
+    assert set(first) == {"2 cloves garlic", "2 Cloves  Garlic.", "Salt to taste"}
+    resolver.resolve(["salt to taste"])
+    assert len(calls) == 2
+    assert resolver.stats() == {
+        "lines": 4,
+        "unique_lines": 2,
+        "unique_resolved": 2,
+        "lexical_matches": 0,
+        "memo_hits": 2,
+        "alias_hits": 0,
+        "failed": 0,
+        "resolutions_saved": 2,
+    }
+    assert normalize_line("  Salt,  to taste. ") == "salt, to taste"
+
+
+def test_iter_sources_dir_zip_jsonl(tmp_path):
+    (tmp_path / "d" / "sub").mkdir(parents=True)
+    (tmp_path / "d" / "b.txt").write_text(RECIPE.format(name="B"))
+    (tmp_path / "d" / "sub" / "a.txt").write_text(RECIPE.format(name="A"))
+    (tmp_path / "d" / "notes.md").write_text("ignored")
+    assert [name for name, _, _ in iter_sources(tmp_path / "d")] == ["b.txt", "sub/a.txt"]
+
+    with zipfile.ZipFile(tmp_path / "r.zip", "w") as zf:
+        zf.writestr("x/c.txt", RECIPE.format(name="C"))
+    assert [(name, kind) for name, kind, _ in iter_sources(tmp_path / "r.zip")] == [("x/c.txt", "text")]
+
+    (tmp_path / "r.jsonl").write_text(json.dumps({"name": "D", "ingredients": ["- salt"]}) + "\n\n")
+    [(name, kind, raw)] = iter_sources(tmp_path / "r.jsonl")
+    assert (name, kind) == ("r.jsonl:1", "jsonl")
+    assert [r.ingredients for r in _parse_source(kind, raw)] == [["salt"]]
+
+    with pytest.raises(ValueError):
+        list(iter_sources(tmp_path / "r.csv"))
+
+
+def test_import_bulk_writes_and_resumes(tmp_path, session):
+    for i in range(5):
+        (tmp_path / f"r{i}.txt").write_text(RECIPE.format(name=f"Recipe {i}"))
+    calls = []
+    resolve = _fake_resolve(calls)
+
+    def failing_resolve(text, existing):
+        raise RuntimeError("interrupted")
+
+    stats = run_import(session, tmp_path, batch_size=2, resolve_fn=resolve, enqueue_skus=False)
+    assert (stats.sources, stats.recipes, stats.links, stats.batches) == (5, 5, 10, 3)
+    assert stats.ingredients_created == 2
+    assert len(calls) == 2  # one resolution per distinct line for the whole run
+    recipes = session.exec(select(Recipe).order_by(Recipe.id)).all()
+    assert [r.name for r in recipes] == [f"Recipe {i}" for i in range(5)]
+    assert recipes[0].allergens == [] and recipes[0].source_file == "r0.txt"
+    assert len(session.exec(select(RecipeIngredient)).all()) == 10
+    assert {i.canonical_name for i in session.exec(select(Ingredient))} == {"garlic", "salt"}
+
+    again = run_import(session, tmp_path, batch_size=2, resolve_fn=failing_resolve, enqueue_skus=False)
+    assert again.recipes == 0 and again.skipped_sources == 5
+
+    # A restarted import of the same corpus skips every recipe by content hash, before resolution
+    rerun = run_import(session, tmp_path, batch_size=2, resolve_fn=failing_resolve, enqueue_skus=False, restart=True)
+    assert (rerun.recipes, rerun.duplicates_skipped) == (0, 5)
+    assert len(session.exec(select(Recipe)).all()) == 5
+    assert all(r.content_hash for r in recipes)
+
+
+def test_import_resumes_after_last_committed_batch(tmp_path, session, monkeypatch):
+    import app.services.recipe_import as recipe_import
+
+    for i in range(4):
+        (tmp_path / f"r{i}.txt").write_text(RECIPE.format(name=f"Recipe {i}"))
+    real_batch = recipe_import._import_batch
+    batches = []
+
+    def crash_on_second(*args, **kwargs):
+        batches.append(1)
+        if len(batches) == 2:
+            raise KeyboardInterrupt
+        return real_batch(*args, **kwargs)
+
+    monkeypatch.setattr(recipe_import, "_import_batch", crash_on_second)
+    with pytest.raises(KeyboardInterrupt):
+        run_import(session, tmp_path, batch_size=2, resolve_fn=_fake_resolve([]), enqueue_skus=False)
+    session.rollback()
+    assert len(session.exec(select(Recipe)).all()) == 2
+
+    monkeypatch.setattr(recipe_import, "_import_batch", real_batch)
+    stats = run_import(session, tmp_path, batch_size=2, resolve_fn=_fake_resolve([]), enqueue_skus=False)
+    assert (stats.skipped_sources, stats.recipes) == (2, 2)
+    assert [r.name for r in session.exec(select(Recipe).order_by(Recipe.id))] == [f"Recipe {i}" for i in range(4)]
+
+
+def test_import_refreshes_search_vectors_of_unlinked_recipes(tmp_path, session, monkeypatch):
+    import app.services.recipe_import as recipe_import
+
+    (tmp_path / "a.txt").write_text(RECIPE.format(name="Linked"))
+    (tmp_path / "b.txt").write_text("Bare (for 2 people)\nIngredients:\nInstructions:\nBoil water.\n")
+    refreshed = []
+    monkeypatch.setattr(recipe_import, "refresh_recipe_search_vectors", lambda _session, ids: refreshed.extend(ids))
+
+    stats = run_import(session, tmp_path, batch_size=10, resolve_fn=_fake_resolve([]), enqueue_skus=False)
+    assert stats.recipes == 2
+    bare = session.exec(select(Recipe).where(Recipe.name == "Bare")).one()
+    assert refreshed == [bare.id]  # linked recipes are refreshed by bulk_insert_recipe_ingredients
+
+
+def test_import_counts_undecodable_sources_and_moves_past_them(tmp_path, session):
+    good = json.dumps({"name": "First", "ingredients": ["salt"]})
+    (tmp_path / "r.jsonl").write_text(good + "\n{not json\n" + json.dumps({"name": "Third", "ingredients": ["salt"]}) + "\n")
+    stats = run_import(session, tmp_path / "r.jsonl", batch_size=1, resolve_fn=_fake_resolve([]), enqueue_skus=False)
+    assert (stats.sources, stats.failed_sources, stats.recipes) == (3, 1, 2)
+
+    (tmp_path / "d").mkdir()
+    (tmp_path / "d" / "a.txt").write_bytes(b"Bad \xff\xfe (for 2 people)\nIngredients:\n- salt\n")
+    (tmp_path / "d" / "b.txt").write_text(RECIPE.format(name="Good"))
+    stats = run_import(session, tmp_path / "d", batch_size=10, resolve_fn=_fake_resolve([]), enqueue_skus=False)
+    assert (stats.sources, stats.failed_sources, stats.recipes) == (2, 1, 1)
+    # The checkpoint moved past the bad sources: resuming finds nothing left to do
+    assert run_import(session, tmp_path / "d", resolve_fn=_fake_resolve([]), enqueue_skus=False).sources == 0
+    assert {r.name for r in session.exec(select(Recipe))} == {"First", "Third", "Good"}
@@ -0,0 +1,112 @@
+"""Inverted ingredient->recipe index (bitset postings) and POST /api/recipes/cook-with."""
+
+from sqlalchemy import delete
+from sqlmodel import select
+
+from app.services.recipe_index import RecipeIndexCache, RecipeIngredientIndex
+from app.storage.models import Ingredient, Recipe, RecipeIngredient
+from app.storage.records import RecipeIngredientLink
+
+
+def _index(links):
+    return RecipeIngredientIndex.build(RecipeIngredientLink(r, i) for r, i in links)
+
+
+def test_any_all_and_requirements():
+    index = RecipeIngredientIndex.build([
+        RecipeIngredient(recipe_id=1, ingredient_id=10, quantity=2, unit="g", original_text=""),
+        RecipeIngredient(recipe_id=1, ingredient_id=11, quantity=1, unit="g", original_text=""),
+        RecipeIngredient(recipe_id=2, ingredient_id=11, quantity=5, unit="g", original_text=""),
+        RecipeIngredient(recipe_id=1, ingredient_id=10, quantity=3, unit="g", original_text=""),
+    ])
+    assert len(index) == 2
+    assert index.recipes_using_any([10]) == {1}
+    assert index.recipes_using_any([11, 99]) == {1, 2}
+    assert index.recipes_using_all([10, 11]) == {1}
+    assert index.recipes_using_all([]) == set()
+    assert index.requirements(1) == {10: 3, 11: 1}
+    assert [ri.recipe_id for ri in index.by_ingredient[11]] == [1, 2]
+
+
+def test_cook_with_ranks_by_coverage_then_missing():
+    index = _index([(1, 10), (1, 11), (2, 10), (2, 11), (2, 12), (2, 13), (3, 10), (4, 20)])
+    ranked = index.cook_with({10, 11})
+    assert [(r["recipe_id"], r["coverage"], r["missing"]) for r in ranked] == [(1, 1.0, 0), (3, 1.0, 0), (2, 0.5, 2)]
+    assert ranked[2]["missing_ingredient_ids"] == [12, 13]
+    assert [r["recipe_id"] for r in index.cook_with({10, 11}, max_missing=1)] == [1, 3]
+    assert index.cook_with({99}) == []
+
+
+def _seed(session):
+    names = ["egg", "flour", "milk", "sugar"]
+    ings = [Ingredient(name=n, canonical_name=n, base_unit="g", base_unit_qty=1.0) for n in names]
+    session.add_all(ings)
+    pancakes = Recipe(name="Pancakes", servings=2, instructions="", source_file="p.txt", meal_type="dessert")
+    omelette = Recipe(name="Omelette", servings=1, instructions="", source_file="o.txt")
+    session.add_all([pancakes, omelette])
+    session.commit()
+    by_name = {i.canonical_name: i.id for i in ings}
+    links = [(pancakes.id, "egg"), (pancakes.id, "flour"), (pancakes.id, "milk"), (omelette.id, "egg")]
+    session.add_all(
+        RecipeIngredient(recipe_id=r, ingredient_id=by_name[n], quantity=1, unit="g", original_text=n) for r, n in links
+    )
+    session.commit()
+    return by_name, pancakes.id, omelette.id
+
+
+def test_cook_with_endpoint(client, session, monkeypatch):
+    by_name, pancakes_id, omelette_id = _seed(session)
+    body = client.post(
+        "/api/recipes/cook-with",
+        json={"ingredient_ids": [by_name["flour"]], "ingredient_names": ["Egg", "truffle"]},
+    ).json()
+    assert [(r["name"], r["matched"], r["missing_ingredients"]) for r in body["results"]] == [
+        ("Omelette", 1, []),
+        ("Pancakes", 2, ["milk"]),
+    ]
+    assert body["unknown_names"] == ["truffle"]
+
+
+def test_cache_appends_new_links_and_rebuilds_on_delete(session):
+    by_name, pancakes_id, omelette_id = _seed(session)
+    cache = RecipeIndexCache(check_interval_s=0)
+    first = cache.get(session)
+    assert first.recipes_using_any([by_name["egg"]]) == {pancakes_id, omelette_id}
+    assert first.requirements(pancakes_id) == {by_name["egg"]: 1, by_name["flour"]: 1, by_name["milk"]: 1}
+
+    session.add(RecipeIngredient(recipe_id=omelette_id, ingredient_id=by_name["milk"], quantity=1, unit="ml", original_text="milk"))
+    session.commit()
+    appended = cache.get(session)
+    assert appended is not first  # copy-on-write: readers holding the old index never see it change
+    assert appended.recipes_using_any([by_name["milk"]]) == {pancakes_id, omelette_id}
+    assert first.recipes_using_any([by_name["milk"]]) == {pancakes_id}
+    assert first.by_recipe[omelette_id] != appended.by_recipe[omelette_id]
+    assert cache.get(session) is appended
+
+    session.execute(delete(RecipeIngredient).where(RecipeIngredient.recipe_id == pancakes_id))
+    session.commit()
+    rebuilt = cache.get(session)
+    assert rebuilt.recipes_using_any([by_name["egg"], by_name["flour"]]) == {omelette_id}
+    assert len(session.exec(select(RecipeIngredient)).all()) == 2
+
+
+def test_cache_checks_full_signature_once_per_interval(session):
+    by_name, pancakes_id, omelette_id = _seed(session)
+    cache = RecipeIndexCache(check_interval_s=3600)
+    first = cache.get(session)
+
+    # Same max id: deletes and quantity edits wait for the interval (or invalidate())
+    link = session.exec(select(RecipeIngredient).where(RecipeIngredient.recipe_id == pancakes_id)).first()
+    link.quantity = 3
+    session.add(link)
+    session.commit()
+    assert cache.get(session) is first
+
+    cache.invalidate()
+    fixed = cache.get(session)
+    assert fixed.requirements(pancakes_id)[link.ingredient_id] == 3
+
+    # New links are picked up on the next get() regardless of the interval
+    session.add(RecipeIngredient(recipe_id=omelette_id, ingredient_id=by_name["sugar"], quantity=1, unit="g", original_text="sugar"))
+    session.commit()
+    assert cache.get(session).recipes_using_any([by_name["sugar"]]) == {omelette_id}
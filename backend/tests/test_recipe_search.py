@@ -0,0 +1,62 @@
+"""GET /api/recipes/search (SQLite runs the LIKE fallback; Postgres uses tsvector + pg_trgm)."""
+
+from sqlmodel import select
+
+from app.storage.models import Ingredient, Recipe, RecipeIngredient
+from app.storage.recipe_search import exclude_allergens_clause
+
+
+def _seed(session):
+    garlic = Ingredient(name="garlic", canonical_name="garlic", base_unit="g", base_unit_qty=1.0)
+    pasta = Ingredient(name="pasta", canonical_name="pasta", base_unit="g", base_unit_qty=1.0)
+    session.add_all([garlic, pasta])
+    session.commit()
+    recipes = [
+        Recipe(name="Garlic Bread", servings=4, instructions="Toast.", source_file="a.txt", meal_type="side", allergens=["gluten"]),
+        Recipe(name="Aglio e Olio", servings=2, instructions="Boil pasta.", source_file="b.txt", allergens=["gluten"]),
+        Recipe(name="Roast Chicken", servings=4, instructions="Rub with garlic butter.", source_file="c.txt", allergens=["milk"]),
+        Recipe(name="Fruit Salad", servings=2, instructions="Chop.", source_file="d.txt", meal_type="dessert", allergens=[]),
+    ]
+    session.add_all(recipes)
+    session.commit()
+    session.add_all([
+        RecipeIngredient(recipe_id=recipes[1].id, ingredient_id=garlic.id, quantity=10, unit="g", original_text="garlic"),
+        RecipeIngredient(recipe_id=recipes[1].id, ingredient_id=pasta.id, quantity=200, unit="g", original_text="pasta"),
+    ])
+    session.commit()
+
+
+def test_search_ranks_name_then_ingredient_then_instructions(client, session):
+    _seed(session)
+    body = client.get("/api/recipes/search", params={"q": "garlic"}).json()
+    assert [r["name"] for r in body["results"]] == ["Garlic Bread", "Aglio e Olio", "Roast Chicken"]
+    assert body["total"] == 3
+    assert "instructions" not in body["results"][0]
+
+
+def test_search_filters_and_paginates(client, session):
+    _seed(session)
+    by_meal = client.get("/api/recipes/search", params={"q": "garlic", "meal_type": "side"}).json()
+    assert [r["name"] for r in by_meal["results"]] == ["Garlic Bread"]
+
+    no_gluten = client.get("/api/recipes/search", params={"q": "garlic", "exclude_allergens": "gluten"}).json()
+    assert [r["name"] for r in no_gluten["results"]] == ["Roast Chicken"]
+
+    page = client.get("/api/recipes/search", params={"q": "garlic", "limit": 1, "offset": 1}).json()
+    assert [r["name"] for r in page["results"]] == ["Aglio e Olio"]
+    assert page["total"] == 3
+
+    past_end = client.get("/api/recipes/search", params={"q": "garlic", "limit": 1, "offset": 5}).json()
+    assert past_end["results"] == [] and past_end["total"] == 3
+
+
+def test_search_requires_query(client):
+    assert client.get("/api/recipes/search").status_code == 422
+
+
+def test_exclude_allergens_clause_runs_in_sql(session):
+    _seed(session)
+    session.add(Recipe(name="Plain Rice", servings=2, instructions="Steam.", source_file="e.txt"))
+    session.commit()
+    stmt = select(Recipe.name).where(exclude_allergens_clause(session, ["gluten", "milk"])).order_by(Recipe.id)
+    assert list(session.exec(stmt)) == ["Fruit Salad", "Plain Rice"]
@@ -0,0 +1,92 @@
+"""SKU fetch enqueueing: (ingredient, postal code) dedupe via Redis SET NX EX, batched submission, fallback."""
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import app.workers.sku_enqueue as sku_enqueue
+from app.workers.sku_enqueue import SkuEnqueuer, dedupe_key, release_sku_fetch, sku_enqueue_metrics
+
+
+class _Redis:
+    """Just the commands the enqueuer uses (SET NX EX through a pipeline, DELETE)."""
+
+    def __init__(self, fail: bool = False):
+        self.keys: dict[str, int] = {}
+        self.fail = fail
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    def delete(self, key):
+        self.keys.pop(key, None)
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def set(self, key, value, nx=False, ex=None):
+        self.ops.append((key, ex))
+
+    def execute(self):
+        if self.redis.fail:
+            raise RedisConnectionError("redis down")
+        out = []
+        for key, ex in self.ops:
+            out.append(key not in self.redis.keys or None)
+            self.redis.keys.setdefault(key, ex)
+        return out
+
+
+@pytest.fixture(name="redis")
+def redis_fixture(monkeypatch):
+    redis = _Redis()
+    monkeypatch.setattr(sku_enqueue, "_redis", lambda: redis)
+    return redis
+
+
+def test_enqueuer_coalesces_pending_jobs_and_submits_in_batches(redis):
+    batches = []
+    first = SkuEnqueuer(batches.append, batch_size=2, ttl_s=60)
+    first.add(1, "garlic", "10001")
+    first.add(1, "garlic", "10001")  # repeat within the buffer
+    first.add(2, "salt", "10001")
+    first.add(1, "garlic", "94105")  # other postal code: a separate job
+    assert first.flush() == 3
+    assert batches == [[(1, "garlic", "10001"), (2, "salt", "10001")], [(1, "garlic", "94105")]]
+    assert redis.keys == {dedupe_key(1, "10001"): 60, dedupe_key(2, "10001"): 60, dedupe_key(1, "94105"): 60}
+
+    # Another upload (or refresh run) asking for a queued job is coalesced into it
+    second = SkuEnqueuer(batches.append, batch_size=2)
+    assert second.enqueue([(1, "garlic", "10001"), (3, "lemon", "10001")]) == 1
+    assert batches[-1] == [(3, "lemon", "10001")]
+    assert second.stats() == {"requested": 2, "enqueued": 1, "coalesced": 1}
+    assert first.stats() == {"requested": 4, "enqueued": 3, "coalesced": 1}
+
+    # Once the task has run its key is released and the job can be queued again
+    release_sku_fetch(1, "10001")
+    assert second.enqueue([(1, "garlic", "10001")]) == 1
+
+
+def test_enqueuer_releases_keys_when_submit_fails(redis):
+    def broker_down(jobs):
+        raise OSError("broker unreachable")
+
+    with pytest.raises(OSError):
+        SkuEnqueuer(broker_down).enqueue([(1, "garlic", "10001")])
+    assert redis.keys == {}
+    assert SkuEnqueuer(lambda jobs: None).enqueue([(1, "garlic", "10001")]) == 1
+
+
+def test_enqueuer_falls_back_to_local_dedupe_without_redis(redis):
+    redis.fail = True
+    before = sku_enqueue_metrics.stats()
+    batches = []
+    enqueuer = SkuEnqueuer(batches.append)
+    assert enqueuer.enqueue([(1, "garlic", "10001"), (2, "salt", "10001")]) == 2
+    assert enqueuer.enqueue([(1, "garlic", "10001")]) == 0
+    assert batches == [[(1, "garlic", "10001"), (2, "salt", "10001")]]
+    after = sku_enqueue_metrics.stats()
+    assert after["redis_errors"] - before["redis_errors"] == 2
+    assert after["coalesced"] - before["coalesced"] == 1
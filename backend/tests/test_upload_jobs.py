@@ -0,0 +1,195 @@
+"""Async uploads: files/events/progress in Redis, processing in the ingest_upload task, SSE read from Redis."""
+
+import json
+import threading
+from pathlib import Path
+
+import pytest
+from sqlmodel import select
+
+import app.services.upload_jobs as upload_jobs
+from app.services import ingestion
+from app.services.upload_jobs import UploadJobStore
+from app.storage.models import Ingredient
+from app.storage.repositories import upsert_skus
+from app.workers import tasks
+
+RECIPES = Path(__file__).resolve().parents[2] / "intern-dataset-main" / "1.txt"
+
+
+class _Redis:
+    """Just the list/string commands the job store uses."""
+
+    def __init__(self):
+        self.data: dict = {}
+        self.ttl: dict[str, int] = {}
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value)
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start : end + 1]
+
+    def expire(self, key, seconds):
+        self.ttl[key] = seconds
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.ttl[key] = ex
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.ops.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.ops]
+
+
+@pytest.fixture(name="redis")
+def redis_fixture(monkeypatch):
+    redis = _Redis()
+    monkeypatch.setattr(upload_jobs, "_redis", lambda: redis)
+    return redis
+
+
+@pytest.fixture(name="inline_worker")
+def inline_worker_fixture(monkeypatch, redis):
+    """Run ingest_upload in-process when the endpoint queues it, with the LLM calls faked."""
+    monkeypatch.setattr(upload_jobs, "configure_dspy", lambda: None)
+    monkeypatch.setattr(
+        ingestion,
+        "match_ingredient",
+        lambda ingredient_text, existing: {"decision": "new", "canonical_name": ingredient_text.split()[0], "rationale": "test"},
+    )
+    monkeypatch.setattr(
+        ingestion,
+        "normalize_units",
+        lambda _1, canonical_name="", target_base_unit=None: {"base_unit": "count", "base_unit_qty": 1.0, "normalized_qty": 1.0, "normalized_unit": "count"},
+    )
+    monkeypatch.setattr(upload_jobs, "infer_allergens_from_ingredients", lambda names: [])
+    monkeypatch.setattr(upload_jobs, "submit_sku_fetches", lambda jobs: None)
+    # No SKU worker here: stop waiting for SKU coverage as soon as ingestion is done
+    monkeypatch.setattr(upload_jobs, "SKU_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(upload_jobs, "SKU_POLL_TIMEOUT", 0)
+    queued = []
+
+    def apply_async(args, queue=None):
+        queued.append(queue)
+        tasks.ingest_upload(*args)
+
+    monkeypatch.setattr(tasks.ingest_upload, "apply_async", apply_async)
+    return queued
+
+
+def _sse_events(body: str) -> list[tuple[int | None, str, dict]]:
+    out = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        event_id = int(fields["id"]) if "id" in fields else None
+        out.append((event_id, fields["event"], json.loads(fields["data"])))
+    return out
+
+
+def test_store_keeps_files_events_and_progress_per_job(redis):
+    store = UploadJobStore(ttl_s=120)
+    store.create("job", [(b"a recipe", "1.txt"), (b"\xff\x00", "2.txt")], {"files": [], "complete": False})
+    assert store.files("job") == [(b"a recipe", "1.txt"), (b"\xff\x00", "2.txt")]
+
+    store.publish("job", "upload_started", {"files": []})
+    store.publish("job", "stream_complete", {}, {"files": [{"name": "1.txt"}], "complete": True})
+    assert store.events("job") == [("upload_started", {"files": []}), ("stream_complete", {})]
+    assert store.events("job", 1) == [("stream_complete", {})]
+    assert store.progress("job") == {"files": [{"name": "1.txt"}], "complete": True}
+    assert store.progress("other") is None
+    assert set(redis.ttl.values()) == {120}
+
+    store.drop_files("job")
+    assert store.files("job") == []
+
+
+def test_upload_runs_on_ingestion_queue_and_streams_from_redis(client, inline_worker):
+    with RECIPES.open("rb") as handle:
+        response = client.post("/api/recipes/upload", files={"files": ("1.txt", handle, "text/plain")})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert inline_worker == ["ingestion"]
+
+    stream = client.get(f"/api/recipes/upload/stream/{job_id}")
+    assert stream.status_code == 200
+    events = _sse_events(stream.text)
+    names = [event for _, event, _ in events]
+    assert names[0] == "upload_started" and names[-2:] == ["sku_progress", "stream_complete"]
+    # Worker events carry their log index; coverage and completion are computed by the API and carry none
+    logged = [event_id for event_id, _, _ in events if event_id is not None]
+    assert logged == list(range(len(events) - 2))
+    complete = next(data for _, event, data in events if event == "upload_complete")
+    assert complete["recipes_created"] == 3
+    assert client.get(f"/api/progress/{job_id}").json()["complete"] is True
+
+    # A reconnecting client resumes after the last event it saw
+    resumed = client.get(f"/api/recipes/upload/stream/{job_id}", headers={"Last-Event-ID": str(logged[-1])})
+    assert [event for _, event, _ in _sse_events(resumed.text)] == ["sku_progress", "stream_complete"]
+    assert client.get("/api/recipes/upload/stream/unknown").status_code == 404
+
+
+def test_sku_coverage_is_computed_on_read(client, inline_worker, monkeypatch, session):
+    monkeypatch.setattr(upload_jobs, "SKU_POLL_TIMEOUT", 300)
+    with RECIPES.open("rb") as handle:
+        job_id = client.post("/api/recipes/upload", files={"files": ("1.txt", handle, "text/plain")}).json()["job_id"]
+    progress = client.get(f"/api/progress/{job_id}").json()
+    total = progress["sku"]["job_sku_total"]
+    assert total > 0 and progress["sku"]["job_ingredients_with_skus"] == 0
+    assert progress["complete"] is False  # ingested, still waiting for SKUs; the task itself has returned
+
+    ingredients = session.exec(select(Ingredient)).all()
+    upsert_skus(session, ingredients[0].id, [{"name": "x", "price": 1.0, "quantity_in_base_unit": 1}], "safeway", "10001")
+    for ingredient in ingredients[1:]:
+        ingredient.sku_unavailable = True
+        session.add(ingredient)
+    session.commit()
+    progress = client.get(f"/api/progress/{job_id}").json()
+    assert progress["sku"] == {"job_ingredients_with_skus": 1, "job_ingredients_unavailable": total - 1, "job_sku_total": total}
+    assert sum(f["ingredients_with_skus"] for f in progress["files"]) == 1
+    assert progress["complete"] is True
+
+
+def test_stream_ends_when_job_expires(client, redis, monkeypatch):
+    monkeypatch.setattr(upload_jobs, "SKU_POLL_INTERVAL", 0.01)
+    store = UploadJobStore()
+    store.create("lost", [(b"x", "1.txt")], {"files": [], "complete": False})
+    # Task lost: nothing is ever published, and the keys expire
+    threading.Timer(0.1, redis.delete, args=("upload:lost:progress",)).start()
+    events = _sse_events(client.get("/api/recipes/upload/stream/lost").text)
+    assert [event for _, event, _ in events] == ["sku_progress", "stream_complete"]
+
+
+def test_failed_upload_task_publishes_upload_failed(client, inline_worker, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("pipeline exploded")
+
+    monkeypatch.setattr(upload_jobs, "IngestionPipeline", broken)
+    with RECIPES.open("rb") as handle, pytest.raises(RuntimeError):
+        client.post("/api/recipes/upload", files={"files": ("1.txt", handle, "text/plain")})
+    job_id = next(key.split(":")[1] for key in upload_jobs._redis().data if key.endswith(":events"))
+
+    events = _sse_events(client.get(f"/api/recipes/upload/stream/{job_id}").text)
+    assert [(event, data) for _, event, data in events[-2:]] == [
+        ("upload_failed", {"error": "pipeline exploded"}),
+        ("stream_complete", {}),
+    ]
+    assert client.get(f"/api/progress/{job_id}").json()["complete"] is True
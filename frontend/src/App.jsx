@@ -180,6 +180,9 @@ export default function App() {
             })
           );
         }
+        if (event === "upload_failed") {
+          setError(`Upload failed: ${data.error || "unknown error"}`);
+        }
         if (event === "stream_complete") {
           setStreamComplete(true);
           fetchIngredients();
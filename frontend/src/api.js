@@ -27,7 +27,7 @@ export async function uploadRecipes(files, postalCode) {
 /**
  * Subscribe to SSE stream for an upload job.
  * onProgress: (event, data) => void
- * Events: upload_started, ingredient_added, upload_complete, sku_progress, stream_complete
+ * Events: upload_started, ingredient_added, upload_complete, sku_progress, upload_failed, stream_complete
  * Returns a promise that resolves when stream_complete is received.
  *
  * If the SSE connection drops (e.g. during LLM backoff/retry), falls back to polling
@@ -62,7 +62,7 @@ export function subscribeUploadStream(jobId, onProgress) {
 
     const url = `${API_URL}/recipes/upload/stream/${encodeURIComponent(jobId)}`;
     const es = new EventSource(url);
-    const events = ["upload_started", "ingredient_added", "upload_complete", "sku_progress", "stream_complete"];
+    const events = ["upload_started", "ingredient_added", "upload_complete", "sku_progress", "upload_failed", "stream_complete"];
     const handle = (e) => {
       try {
         const data = JSON.parse(e.data || "{}");